@@ -0,0 +1,241 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Orden de columnas que entrega DatabaseRepository.iterar_transacciones_analitica
+COLUMNAS_ANALITICA = (
+    'fecha', 'monto', 'tipo', 'ubicacion', 'metodo_pago', 'cliente_id', 'tipo_cliente', 'fecha_registro'
+)
+DIMENSIONES_CATEGORICAS = ('tipo', 'ubicacion', 'metodo_pago', 'tipo_cliente')
+DIMENSIONES_DISPONIBLES = (*DIMENSIONES_CATEGORICAS, 'hora', 'cohorte')
+PERCENTILES = (50, 90, 99)
+SIN_DATO = '(sin dato)'
+
+_EPOCA = datetime(1970, 1, 1)
+_SEGUNDO = timedelta(seconds=1)
+_MES_EPOCA = 1970 * 12 + 1
+_NAT = np.iinfo(np.int64).min  # NaT al reinterpretarse como datetime64
+
+
+class _Categorias:
+    """Vocabulario incremental que traduce valores de texto a códigos enteros"""
+
+    def __init__(self):
+        self.codigos: Dict[Any, int] = {}
+        self.etiquetas: List[str] = []
+
+    def codificar(self, valores: Sequence[Any]) -> np.ndarray:
+        codigos = self.codigos
+        etiquetas = self.etiquetas
+
+        def codigo(valor):
+            c = codigos.get(valor)
+            if c is None:
+                c = codigos[valor] = len(etiquetas)
+                etiquetas.append(str(valor) if valor not in (None, '') else SIN_DATO)
+            return c
+
+        return np.fromiter((codigo(v) for v in valores), dtype=np.int32, count=len(valores))
+
+
+@dataclass
+class TablaTransacciones:
+    """Transacciones de un período en arreglos columnares tipados"""
+    fecha: np.ndarray          # datetime64[s]
+    monto: np.ndarray          # float64
+    cliente_id: np.ndarray     # int64
+    cohorte: np.ndarray        # datetime64[M], mes de registro del cliente
+    codigos: Dict[str, np.ndarray] = field(default_factory=dict)
+    etiquetas: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.monto)
+
+    @classmethod
+    def desde_bloques(cls, bloques: Iterable[List[tuple]]) -> 'TablaTransacciones':
+        """Convierte bloques de filas en columnas sin retener las filas de Python"""
+        categorias = {dimension: _Categorias() for dimension in DIMENSIONES_CATEGORICAS}
+        partes: Dict[str, List[np.ndarray]] = {
+            nombre: [] for nombre in ('fecha', 'monto', 'cliente_id', 'cohorte', *DIMENSIONES_CATEGORICAS)
+        }
+
+        for filas in bloques:
+            fecha, monto, tipo, ubicacion, metodo_pago, cliente_id, tipo_cliente, fecha_registro = zip(*filas)
+            n = len(filas)
+            # Aritmética entera sobre los datetime: mucho más rápida que el parseo de objetos de NumPy
+            partes['fecha'].append(np.fromiter(
+                ((f - _EPOCA) // _SEGUNDO if f is not None else _NAT for f in fecha), dtype=np.int64, count=n
+            ).astype('datetime64[s]'))
+            partes['monto'].append(np.fromiter(
+                (float(m) if m is not None else 0.0 for m in monto), dtype=np.float64, count=n
+            ))
+            partes['cliente_id'].append(np.fromiter(cliente_id, dtype=np.int64, count=n))
+            partes['cohorte'].append(np.fromiter(
+                (f.year * 12 + f.month - _MES_EPOCA if f is not None else _NAT for f in fecha_registro),
+                dtype=np.int64, count=n
+            ).astype('datetime64[M]'))
+            for dimension, valores in zip(DIMENSIONES_CATEGORICAS, (tipo, ubicacion, metodo_pago, tipo_cliente)):
+                partes[dimension].append(categorias[dimension].codificar(valores))
+
+        def unir(nombre: str, dtype) -> np.ndarray:
+            return np.concatenate(partes[nombre]) if partes[nombre] else np.empty(0, dtype=dtype)
+
+        return cls(
+            fecha=unir('fecha', 'datetime64[s]'),
+            monto=unir('monto', np.float64),
+            cliente_id=unir('cliente_id', np.int64),
+            cohorte=unir('cohorte', 'datetime64[M]'),
+            codigos={d: unir(d, np.int32) for d in DIMENSIONES_CATEGORICAS},
+            etiquetas={d: categorias[d].etiquetas for d in DIMENSIONES_CATEGORICAS}
+        )
+
+
+def _percentiles(montos: np.ndarray) -> Dict[str, float]:
+    if not len(montos):
+        return {f'p{p}': 0.0 for p in PERCENTILES}
+    valores = np.percentile(montos, PERCENTILES)
+    return {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, valores)}
+
+
+def _agrupar(codigos: np.ndarray, montos: np.ndarray, etiquetas: Sequence[str],
+             incluir_vacios: bool = False) -> List[Dict[str, Any]]:
+    """Cantidad, total, promedio y percentiles de monto por código de grupo"""
+    n_grupos = len(etiquetas)
+    cantidades = np.bincount(codigos, minlength=n_grupos)
+    totales = np.bincount(codigos, weights=montos, minlength=n_grupos)
+
+    # Ordenar una sola vez y cortar por grupo en lugar de filtrar el arreglo por cada grupo
+    orden = np.argsort(codigos, kind='stable')
+    por_grupo = np.split(montos[orden], np.cumsum(cantidades)[:-1])
+
+    resultado = []
+    for codigo, etiqueta in enumerate(etiquetas):
+        cantidad = int(cantidades[codigo])
+        if not cantidad and not incluir_vacios:
+            continue
+        total = float(totales[codigo])
+        resultado.append({
+            'grupo': etiqueta,
+            'cantidad': cantidad,
+            'total_monto': round(total, 2),
+            'promedio_monto': round(total / cantidad, 2) if cantidad else 0.0,
+            **_percentiles(por_grupo[codigo])
+        })
+    if not incluir_vacios:
+        resultado.sort(key=lambda g: g['total_monto'], reverse=True)
+    return resultado
+
+
+def _media_movil(valores: np.ndarray, ventana: int) -> np.ndarray:
+    """Media móvil de ventana fija; los primeros días promedian los que haya disponibles"""
+    if not len(valores):
+        return valores
+    sumas = np.convolve(valores, np.ones(ventana), mode='full')[:len(valores)]
+    return sumas / np.minimum(np.arange(1, len(valores) + 1), ventana)
+
+
+class MotorAnalitica:
+    """Analítica de transacciones sobre arreglos NumPy cargados con una sola consulta por bloques"""
+
+    def __init__(self, repository, tamano_lote: Optional[int] = None):
+        self.repository = repository
+        self.tamano_lote = tamano_lote
+        self.logger = logging.getLogger(__name__)
+
+    def cargar(self, fecha_inicio: datetime, fecha_fin: datetime,
+               progreso: Optional[Callable[[int], None]] = None) -> TablaTransacciones:
+        """Lee las transacciones del período en bloques y las pasa a formato columnar"""
+        bloques = self.repository.iterar_transacciones_analitica(fecha_inicio, fecha_fin, self.tamano_lote, progreso)
+        return TablaTransacciones.desde_bloques(bloques)
+
+    def analizar(self, fecha_inicio: datetime, fecha_fin: datetime,
+                 dimensiones: Optional[Sequence[str]] = None, ventana: int = 7,
+                 progreso: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Calcula los desgloses pedidos para el período; progreso(filas_leidas) informa la carga"""
+        dimensiones = list(dimensiones or DIMENSIONES_DISPONIBLES)
+        no_soportadas = [d for d in dimensiones if d not in DIMENSIONES_DISPONIBLES]
+        if no_soportadas:
+            raise ValueError(f"Dimensiones no soportadas: {', '.join(no_soportadas)}")
+
+        inicio = time.monotonic()
+        tabla = self.cargar(fecha_inicio, fecha_fin, progreso)
+        carga_ms = (time.monotonic() - inicio) * 1000
+
+        resultado = {
+            'periodo': {'inicio': fecha_inicio.isoformat(), 'fin': fecha_fin.isoformat()},
+            'total_transacciones': len(tabla),
+            'total_monto': round(float(tabla.monto.sum()), 2),
+            'promedio_monto': round(float(tabla.monto.mean()), 2) if len(tabla) else 0.0,
+            **_percentiles(tabla.monto)
+        }
+
+        for dimension in dimensiones:
+            if dimension in DIMENSIONES_CATEGORICAS:
+                resultado[f'por_{dimension}'] = _agrupar(
+                    tabla.codigos[dimension], tabla.monto, tabla.etiquetas[dimension]
+                )
+            elif dimension == 'hora':
+                resultado['por_hora'] = self.desglose_por_hora(tabla)
+            else:
+                resultado['por_cohorte'] = self.desglose_por_cohorte(tabla)
+
+        resultado['serie_diaria'] = self.serie_diaria(tabla, fecha_inicio, fecha_fin, ventana)
+        resultado['tiempos_ms'] = {
+            'carga': round(carga_ms, 1),
+            'calculo': round((time.monotonic() - inicio) * 1000 - carga_ms, 1)
+        }
+        return resultado
+
+    @staticmethod
+    def desglose_por_hora(tabla: TablaTransacciones) -> List[Dict[str, Any]]:
+        horas = ((tabla.fecha.astype(np.int64) // 3600) % 24).astype(np.int32)
+        return _agrupar(horas, tabla.monto, [f'{h:02d}:00' for h in range(24)], incluir_vacios=True)
+
+    @staticmethod
+    def desglose_por_cohorte(tabla: TablaTransacciones) -> List[Dict[str, Any]]:
+        """Actividad del período agrupada por mes de registro del cliente"""
+        if not len(tabla):
+            return []
+        conocida = ~np.isnat(tabla.cohorte)
+        meses, codigos = np.unique(tabla.cohorte[conocida], return_inverse=True)
+        etiquetas = [str(m) for m in meses]
+        codigos_todos = np.full(len(tabla), len(etiquetas), dtype=np.int64)
+        codigos_todos[conocida] = codigos
+        if not conocida.all():
+            etiquetas.append(SIN_DATO)
+
+        grupos = _agrupar(codigos_todos, tabla.monto, etiquetas)
+        # Clientes distintos por cohorte: pares (cohorte, cliente) únicos empaquetados en un int64
+        pares = np.unique((codigos_todos << 32) | tabla.cliente_id)
+        clientes = np.bincount(pares >> 32, minlength=len(etiquetas))
+        for grupo in grupos:
+            n_clientes = int(clientes[etiquetas.index(grupo['grupo'])])
+            grupo['clientes'] = n_clientes
+            grupo['monto_por_cliente'] = round(grupo['total_monto'] / n_clientes, 2) if n_clientes else 0.0
+        grupos.sort(key=lambda g: g['grupo'])
+        return grupos
+
+    @staticmethod
+    def serie_diaria(tabla: TablaTransacciones, fecha_inicio: datetime, fecha_fin: datetime,
+                     ventana: int = 7) -> List[Dict[str, Any]]:
+        """Totales por día del período, incluidos los días sin movimiento, con media móvil"""
+        primer_dia = np.datetime64(fecha_inicio.date(), 'D')
+        n_dias = (fecha_fin.date() - fecha_inicio.date()).days + 1
+        if n_dias <= 0:
+            return []
+
+        indices = (tabla.fecha.astype('datetime64[D]') - primer_dia).astype(np.int64)
+        cantidades = np.bincount(indices, minlength=n_dias)[:n_dias]
+        totales = np.bincount(indices, weights=tabla.monto, minlength=n_dias)[:n_dias]
+        medias = _media_movil(totales, max(1, ventana))
+
+        return [{
+            'fecha': (fecha_inicio.date() + timedelta(days=i)).isoformat(),
+            'cantidad': int(cantidades[i]),
+            'total_monto': round(float(totales[i]), 2),
+            'media_movil': round(float(medias[i]), 2)
+        } for i in range(n_dias)]
@@ -2,13 +2,16 @@ from fastapi import FastAPI, HTTPException, Depends, status, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field, validator, ValidationError
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, timedelta
+import asyncio
 import logging
-import jwt
+import os
+import uuid
 import hashlib
 import secrets
 from contextlib import asynccontextmanager
@@ -17,7 +20,13 @@ from models import (
     Cliente, Promocion, Transaccion, Ticket,
     TipoCliente, TipoPromocion, TipoTicket, TipoTransaccion
 )
-from repository import DatabaseRepository
+from repository import DatabaseRepository, orden_prioridad_ticket
+from executor import DatabaseExecutor, ColaSaturadaError, CupoExportaciones
+from pagination import codificar_cursor, decodificar_cursor
+from jobs import GestorTrabajosReporte, GestorTareas, ESTADO_COMPLETADO
+from migrations import GestorMigraciones, VERSION_ESQUEMA
+from sweeper import BarredorPromociones
+from cache import CacheAgregados, CLAVE_CLIENTES, CLAVE_TICKETS, CLAVE_TRANSACCIONES_HOY
 from services import ClienteService, PromocionService, TransaccionService, TicketService, ReporteService
 from config import DatabaseConfig, SecurityConfig, APIConfig, ApplicationConfig, CasinoConfig
 
@@ -70,6 +79,49 @@ class PromocionCreate(BaseModel):
             raise ValueError('La fecha de fin debe ser posterior a la fecha de inicio')
         return v
 
+class CampanaCreate(BaseModel):
+    campana_id: Optional[str] = Field(None, min_length=3, max_length=40, pattern="^[A-Za-z0-9_-]+$")
+    # Segmento
+    tipo_cliente: Optional[List[str]] = None
+    ciudad: Optional[str] = Field(None, max_length=100)
+    ultima_visita_desde: Optional[datetime] = None
+    ultima_visita_hasta: Optional[datetime] = None
+    # Plantilla de la promoción
+    titulo: str = Field(..., min_length=5, max_length=200)
+    descripcion: Optional[str] = Field(None, max_length=1000)
+    tipo: str = Field(..., pattern="^(descuento|puntos_bonus|bebida_gratis|entrada_gratis|cashback|torneo_especial)$")
+    valor: float = Field(..., ge=0)
+    fecha_inicio: datetime
+    fecha_fin: datetime
+    usos_maximos: int = Field(default=1, ge=1)
+    condiciones: Optional[str] = Field(None, max_length=1000)
+    
+    @validator('tipo_cliente')
+    def validar_tipos_cliente(cls, v):
+        validos = {t.value for t in TipoCliente}
+        if v and any(t not in validos for t in v):
+            raise ValueError(f"tipo_cliente debe estar en {sorted(validos)}")
+        return v
+    
+    @validator('fecha_fin')
+    def validar_fechas(cls, v, values):
+        if 'fecha_inicio' in values and v <= values['fecha_inicio']:
+            raise ValueError('La fecha de fin debe ser posterior a la fecha de inicio')
+        return v
+    
+    def segmento(self) -> Dict[str, Any]:
+        return {
+            'tipo_cliente': self.tipo_cliente, 'ciudad': self.ciudad,
+            'ultima_visita_desde': self.ultima_visita_desde, 'ultima_visita_hasta': self.ultima_visita_hasta
+        }
+    
+    def plantilla(self) -> Dict[str, Any]:
+        return {
+            'titulo': self.titulo, 'descripcion': self.descripcion, 'tipo': self.tipo, 'valor': self.valor,
+            'fecha_inicio': self.fecha_inicio, 'fecha_fin': self.fecha_fin,
+            'usos_maximos': self.usos_maximos, 'condiciones': self.condiciones
+        }
+
 class TransaccionCreate(BaseModel):
     cliente_id: int = Field(..., gt=0)
     tipo: str = Field(..., pattern="^(ingreso|juego|consumo|canje_promocion|retiro)$")
@@ -82,6 +134,9 @@ class TransaccionCreate(BaseModel):
     empleado_id: Optional[int] = None
     notas: Optional[str] = Field(None, max_length=500)
 
+class TransaccionLoteCreate(BaseModel):
+    transacciones: List[TransaccionCreate] = Field(..., min_length=1, max_length=5000)
+
 class TicketCreate(BaseModel):
     cliente_id: int = Field(..., gt=0)
     tipo: str = Field(..., pattern="^(queja|sugerencia|consulta|reclamo|soporte_tecnico)$")
@@ -108,6 +163,7 @@ class APIResponse(BaseModel):
     success: bool
     message: str
     data: Optional[Any] = None
+    siguiente_cursor: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
 # Configuración global
@@ -119,11 +175,60 @@ casino_config = CasinoConfig()
 
 # Inicialización de servicios
 repository = DatabaseRepository(db_config)
-cliente_service = ClienteService(repository, casino_config)
-promocion_service = PromocionService(repository)
-transaccion_service = TransaccionService(repository, casino_config)
-ticket_service = TicketService(repository)
+migraciones = GestorMigraciones(repository)
+dashboard_cache = CacheAgregados(app_config.DASHBOARD_CACHE_TTL)
+cliente_service = ClienteService(repository, casino_config, dashboard_cache)
+promocion_service = PromocionService(repository, dashboard_cache)
+transaccion_service = TransaccionService(repository, casino_config, dashboard_cache)
+ticket_service = TicketService(repository, dashboard_cache)
 reporte_service = ReporteService(repository)
+trabajos_reporte = GestorTrabajosReporte(
+    repository,
+    app_config.REPORTS_DIRECTORY,
+    max_workers=app_config.REPORT_WORKERS,
+    max_pendientes=app_config.REPORT_MAX_PENDING,
+    retencion_segundos=app_config.REPORT_RETENTION_SECONDS
+)
+campanas_promociones = GestorTareas(
+    repository,
+    'campana',
+    max_pendientes=app_config.CAMPAIGN_MAX_PENDING
+)
+# Una reclasificación a la vez: recorre toda la tabla de clientes
+reclasificaciones_clientes = GestorTareas(repository, 'reclasificacion', max_pendientes=1)
+barredor_promociones = BarredorPromociones(
+    repository,
+    intervalo_segundos=app_config.PROMO_SWEEP_INTERVAL,
+    tamano_lote=app_config.PROMO_SWEEP_BATCH,
+    max_lotes=app_config.PROMO_SWEEP_MAX_BATCHES
+)
+
+# Ejecutor dedicado para que las llamadas a base de datos no bloqueen el event loop
+db_executor = DatabaseExecutor(db_config.EXECUTOR_WORKERS, db_config.EXECUTOR_MAX_QUEUE)
+# Cada exportación retiene una conexión del pool de exportaciones mientras dura la descarga
+cupo_exportaciones = CupoExportaciones(min(app_config.EXPORT_MAX_CONCURRENT, db_config.EXPORT_POOL_SIZE))
+
+async def ejecutar_db(func, *args, **kwargs):
+    """Ejecuta una llamada bloqueante del repositorio o de un servicio en el ejecutor de base de datos"""
+    try:
+        return await db_executor.run(func, *args, **kwargs)
+    except ColaSaturadaError as e:
+        logger.warning(f"Solicitud rechazada: {e}")
+        raise HTTPException(status_code=503, detail="Servidor ocupado, intente nuevamente")
+
+def leer_cursor(after: Optional[str], tipos: tuple):
+    """Decodifica el parámetro ?after= o responde 400 si es inválido"""
+    try:
+        return decodificar_cursor(after, tipos)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def paginar(items: list, limite: int, clave):
+    """Recorta una página leída con limite + 1 filas y genera el cursor de la siguiente"""
+    if len(items) > limite:
+        items = items[:limite]
+        return items, codificar_cursor(*clave(items[-1]))
+    return items, None
 
 # Configuración de seguridad
 security = HTTPBearer()
@@ -133,20 +238,36 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Iniciando API del Casino Atlantic City")
     try:
-        # Probar conexión a base de datos
-        if repository.test_connection():
-            logger.info("Conexión a base de datos exitosa")
-            # Inicializar tablas si es necesario
-            repository.initialize_database()
-        else:
-            logger.error("Error de conexión a base de datos")
+        # Una sola consulta a schema_version prueba la conexión y decide si hace falta el DDL
+        version = await ejecutar_db(migraciones.version_actual)
+        logger.info(f"Conexión a base de datos exitosa (esquema v{version})")
+        if version < VERSION_ESQUEMA:
+            if app_config.AUTO_MIGRATE:
+                await ejecutar_db(repository.initialize_database)
+            else:
+                logger.warning(
+                    f"Esquema en v{version}, se espera v{VERSION_ESQUEMA}; ejecute 'python migrations.py migrar'"
+                )
+        await ejecutar_db(repository.pool.prefill)
     except Exception as e:
         logger.error(f"Error durante el startup: {e}")
     
+    if app_config.PROMO_SWEEP_ENABLED:
+        barredor_promociones.iniciar()
+    trabajos_reporte.iniciar()
+    campanas_promociones.iniciar()
+    reclasificaciones_clientes.iniciar()
+    
     yield
     
     # Shutdown
     logger.info("Cerrando API del Casino Atlantic City")
+    barredor_promociones.detener()
+    campanas_promociones.shutdown()
+    reclasificaciones_clientes.shutdown()
+    trabajos_reporte.shutdown()
+    db_executor.shutdown()
+    repository.close()
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -179,10 +300,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(hours=security_config.JWT_EXPIRATION_HOURS)
     
     to_encode.update({"exp": expire})
+    import jwt
     encoded_jwt = jwt.encode(to_encode, security_config.SECRET_KEY, algorithm=security_config.JWT_ALGORITHM)
     return encoded_jwt
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # PyJWT importa cryptography; se difiere hasta la primera petición autenticada
+    import jwt
     try:
         payload = jwt.decode(credentials.credentials, security_config.SECRET_KEY, algorithms=[security_config.JWT_ALGORITHM])
         username: str = payload.get("sub")
@@ -261,11 +385,12 @@ async def cliente_login(request: ClienteLoginRequest):
     """Autenticación de clientes usando solo número de documento"""
     try:
         # Buscar cliente por número de documento
-        cliente = repository.obtener_cliente_por_documento(request.numero_documento)
+        # Sin caché: un cliente recién desactivado no debe poder entrar con la copia en memoria
+        cliente = await ejecutar_db(repository.obtener_cliente_por_documento, request.numero_documento, False)
         
         if cliente and cliente.activo:
             # Registrar la visita del cliente (actualiza fecha_ultima_visita)
-            cliente_service.registrar_visita(cliente.id, 0.0)
+            await ejecutar_db(cliente_service.registrar_visita, cliente.id, 0.0)
             logger.info(f"Visita registrada para cliente {cliente.id} - {cliente.nombre_completo}")
             
             # Crear token para el cliente
@@ -307,7 +432,7 @@ async def cliente_login(request: ClienteLoginRequest):
 async def crear_cliente(cliente_data: ClienteCreate, current_user: str = Depends(verify_token)):
     """Crear un nuevo cliente (requiere autenticación)"""
     try:
-        success, message, cliente_id = cliente_service.registrar_cliente(cliente_data.dict())
+        success, message, cliente_id = await ejecutar_db(cliente_service.registrar_cliente, cliente_data.dict())
         
         if success:
             return APIResponse(
@@ -340,12 +465,12 @@ async def registro_publico_cliente(cliente_data: ClienteCreate):
             raise HTTPException(status_code=400, detail="Nombres y apellidos son obligatorios")
         
         # Verificar si el cliente ya existe
-        cliente_existente = repository.obtener_cliente_por_documento(cliente_data.numero_documento)
+        cliente_existente = await ejecutar_db(repository.obtener_cliente_por_documento, cliente_data.numero_documento)
         if cliente_existente:
             logger.error(f"Cliente ya existe con documento: {cliente_data.numero_documento}")
             raise HTTPException(status_code=400, detail="Ya existe un cliente con este número de documento")
         
-        success, message, cliente_id = cliente_service.registrar_cliente(cliente_data.dict())
+        success, message, cliente_id = await ejecutar_db(cliente_service.registrar_cliente, cliente_data.dict())
         
         if success:
             logger.info(f"Nuevo cliente registrado públicamente: ID {cliente_id}, Documento: {cliente_data.numero_documento}")
@@ -375,7 +500,7 @@ async def registro_publico_cliente(cliente_data: ClienteCreate):
 async def obtener_cliente(cliente_id: int, current_user: str = Depends(verify_token)):
     """Obtener información de un cliente"""
     try:
-        cliente = repository.obtener_cliente(cliente_id)
+        cliente = await ejecutar_db(repository.obtener_cliente, cliente_id)
         
         if cliente:
             cliente_data = {
@@ -421,10 +546,12 @@ async def listar_clientes(
     tipo_cliente: Optional[str] = None,
     ciudad: Optional[str] = None,
     limite: int = Query(default=100, le=1000),
+    after: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
-    """Listar clientes con filtros opcionales"""
+    """Listar clientes con filtros opcionales (paginación por cursor con ?after=)"""
     try:
+        despues_de = leer_cursor(after, (datetime, int))
         filtros = {}
         if activo is not None:
             filtros['activo'] = activo
@@ -433,7 +560,8 @@ async def listar_clientes(
         if ciudad:
             filtros['ciudad'] = ciudad
         
-        clientes = repository.listar_clientes(filtros, limite)
+        clientes = await ejecutar_db(repository.listar_clientes, filtros, limite + 1, despues_de, True)
+        clientes, siguiente_cursor = paginar(clientes, limite, lambda c: (c.fecha_registro, c.id))
         
         clientes_data = [{
             "id": c.id,
@@ -453,9 +581,12 @@ async def listar_clientes(
         return APIResponse(
             success=True,
             message=f"Se encontraron {len(clientes)} clientes",
-            data=clientes_data
+            data=clientes_data,
+            siguiente_cursor=siguiente_cursor
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al listar clientes: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -468,16 +599,8 @@ async def actualizar_cliente(
 ):
     """Actualizar información de un cliente"""
     try:
-        cliente = repository.obtener_cliente(cliente_id)
-        if not cliente:
-            raise HTTPException(status_code=404, detail="Cliente no encontrado")
-        
-        # Actualizar campos proporcionados
-        update_data = cliente_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(cliente, field, value)
-        
-        success = repository.actualizar_cliente(cliente)
+        # Solo se escriben los campos enviados: saldo y contadores nunca salen de una copia en caché
+        success = await ejecutar_db(repository.actualizar_datos_cliente, cliente_id, cliente_data.dict(exclude_unset=True))
         
         if success:
             return APIResponse(
@@ -485,7 +608,7 @@ async def actualizar_cliente(
                 message="Cliente actualizado exitosamente"
             )
         else:
-            raise HTTPException(status_code=400, detail="Error al actualizar cliente")
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
     except HTTPException:
         raise
@@ -493,12 +616,45 @@ async def actualizar_cliente(
         logger.error(f"Error al actualizar cliente: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.post("/clientes/reclasificar", response_model=APIResponse, status_code=202)
+async def reclasificar_clientes(
+    tamano_lote: int = Query(default=5000, ge=100, le=50000),
+    current_user: str = Depends(verify_token)
+):
+    """Recalcular en segundo plano el tipo de todos los clientes con los umbrales vigentes (p. ej. tras cambiarlos)"""
+    def ejecutar(trabajo_id, informar):
+        success, message, resultado = cliente_service.reclasificar_clientes(tamano_lote, informar)
+        if not success:
+            raise RuntimeError(message)
+        return resultado
+    
+    try:
+        trabajo = await ejecutar_db(reclasificaciones_clientes.enviar, ejecutar)
+        return APIResponse(success=True, message="Reclasificación encolada", data=trabajo.to_dict())
+    
+    except HTTPException:
+        raise
+    except ColaSaturadaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error al reclasificar clientes: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/clientes/reclasificar/{trabajo_id}", response_model=APIResponse)
+async def obtener_reclasificacion(trabajo_id: str, current_user: str = Depends(verify_token)):
+    """Consultar estado, progreso y resultado de una reclasificación"""
+    trabajo = await ejecutar_db(reclasificaciones_clientes.obtener, trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Reclasificación no encontrada")
+    
+    return APIResponse(success=True, message=trabajo['estado'], data=trabajo)
+
 # Endpoints de promociones
 @app.post("/promociones", response_model=APIResponse)
 async def crear_promocion(promocion_data: PromocionCreate, current_user: str = Depends(verify_token)):
     """Crear una nueva promoción"""
     try:
-        success, message, promocion_id = promocion_service.crear_promocion_personalizada(promocion_data.dict())
+        success, message, promocion_id = await ejecutar_db(promocion_service.crear_promocion_personalizada, promocion_data.dict())
         
         if success:
             return APIResponse(
@@ -515,6 +671,59 @@ async def crear_promocion(promocion_data: PromocionCreate, current_user: str = D
         logger.error(f"Error al crear promoción: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.post("/promociones/campanas", response_model=APIResponse, status_code=202)
+async def crear_campana(
+    campana_data: CampanaCreate,
+    simular: bool = False,
+    current_user: str = Depends(verify_token)
+):
+    """Crear una promoción por cliente del segmento; se ejecuta en segundo plano (?simular=true solo cuenta)"""
+    try:
+        if simular:
+            total = await ejecutar_db(repository.contar_clientes_segmento, campana_data.segmento())
+            return APIResponse(
+                success=True,
+                message=f"El segmento tiene {total} clientes",
+                data={"clientes_segmento": total}
+            )
+        
+        segmento, plantilla = campana_data.segmento(), campana_data.plantilla()
+        
+        def ejecutar(campana_id, informar):
+            return promocion_service.crear_campana(
+                campana_id, segmento, plantilla, app_config.CAMPAIGN_BATCH_SIZE, informar
+            )
+        
+        campana = await ejecutar_db(campanas_promociones.enviar, ejecutar, campana_data.campana_id)
+        return APIResponse(
+            success=True,
+            message="Campaña encolada",
+            data=campana.to_dict()
+        )
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ColaSaturadaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error al crear campaña: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/promociones/campanas/{campana_id}", response_model=APIResponse)
+async def obtener_campana(campana_id: str, current_user: str = Depends(verify_token)):
+    """Consultar estado y progreso de una campaña"""
+    campana = await ejecutar_db(campanas_promociones.obtener, campana_id)
+    if not campana:
+        raise HTTPException(status_code=404, detail="Campaña no encontrada")
+    
+    return APIResponse(
+        success=True,
+        message=campana['estado'],
+        data=campana
+    )
+
 @app.get("/promociones/activas", response_model=APIResponse)
 async def obtener_promociones_activas(
     cliente_id: Optional[int] = None,
@@ -522,7 +731,7 @@ async def obtener_promociones_activas(
 ):
     """Obtener promociones activas"""
     try:
-        promociones = repository.obtener_promociones_activas(cliente_id)
+        promociones = await ejecutar_db(repository.obtener_promociones_activas, cliente_id)
         
         promociones_data = [{
             "id": p.id,
@@ -544,6 +753,8 @@ async def obtener_promociones_activas(
             data=promociones_data
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener promociones: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -556,7 +767,7 @@ async def canjear_promocion(
 ):
     """Canjear una promoción"""
     try:
-        success, message, beneficio = promocion_service.canjear_promocion(codigo, cliente_id)
+        success, message, beneficio = await ejecutar_db(promocion_service.canjear_promocion, codigo, cliente_id)
         
         if success:
             return APIResponse(
@@ -578,7 +789,7 @@ async def canjear_promocion(
 async def crear_transaccion(transaccion_data: TransaccionCreate, current_user: str = Depends(verify_token)):
     """Crear una nueva transacción"""
     try:
-        success, message, transaccion_id = transaccion_service.procesar_transaccion(transaccion_data.dict())
+        success, message, transaccion_id = await ejecutar_db(transaccion_service.procesar_transaccion, transaccion_data.dict())
         
         if success:
             return APIResponse(
@@ -595,14 +806,45 @@ async def crear_transaccion(transaccion_data: TransaccionCreate, current_user: s
         logger.error(f"Error al crear transacción: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@app.post("/transacciones/batch", response_model=APIResponse)
+async def crear_transacciones_lote(lote_data: TransaccionLoteCreate, current_user: str = Depends(verify_token)):
+    """Registrar un lote de transacciones (máquinas, bar, POS) en una sola operación"""
+    try:
+        success, message, resultados = await ejecutar_db(
+            transaccion_service.procesar_lote,
+            [t.dict() for t in lote_data.transacciones]
+        )
+        
+        if success:
+            return APIResponse(
+                success=True,
+                message=message,
+                data={
+                    "procesadas": sum(1 for r in resultados if r['success']),
+                    "rechazadas": sum(1 for r in resultados if not r['success']),
+                    "resultados": resultados
+                }
+            )
+        else:
+            raise HTTPException(status_code=400, detail=message)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al procesar lote de transacciones: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
 @app.get("/transacciones", response_model=APIResponse)
 async def obtener_todas_transacciones(
     limite: int = Query(default=100, le=500),
+    after: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
-    """Obtener todas las transacciones"""
+    """Obtener todas las transacciones (paginación por cursor con ?after=)"""
     try:
-        transacciones = repository.obtener_todas_transacciones(limite)
+        despues_de = leer_cursor(after, (datetime, int))
+        transacciones = await ejecutar_db(repository.obtener_todas_transacciones, limite + 1, despues_de)
+        transacciones, siguiente_cursor = paginar(transacciones, limite, lambda t: (t.fecha, t.id))
         
         transacciones_data = [{
             "id": t.id,
@@ -619,9 +861,12 @@ async def obtener_todas_transacciones(
         return APIResponse(
             success=True,
             message=f"Se encontraron {len(transacciones)} transacciones",
-            data=transacciones_data
+            data=transacciones_data,
+            siguiente_cursor=siguiente_cursor
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener transacciones: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -630,11 +875,14 @@ async def obtener_todas_transacciones(
 async def obtener_transacciones_cliente(
     cliente_id: int,
     limite: int = Query(default=50, le=200),
+    after: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
-    """Obtener transacciones de un cliente"""
+    """Obtener transacciones de un cliente (paginación por cursor con ?after=)"""
     try:
-        transacciones = repository.obtener_transacciones_cliente(cliente_id, limite)
+        despues_de = leer_cursor(after, (datetime, int))
+        transacciones = await ejecutar_db(repository.obtener_transacciones_cliente, cliente_id, limite + 1, despues_de)
+        transacciones, siguiente_cursor = paginar(transacciones, limite, lambda t: (t.fecha, t.id))
         
         transacciones_data = [{
             "id": t.id,
@@ -650,9 +898,12 @@ async def obtener_transacciones_cliente(
         return APIResponse(
             success=True,
             message=f"Se encontraron {len(transacciones)} transacciones",
-            data=transacciones_data
+            data=transacciones_data,
+            siguiente_cursor=siguiente_cursor
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener transacciones: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -662,7 +913,7 @@ async def obtener_transacciones_cliente(
 async def crear_ticket(ticket_data: TicketCreate, current_user: str = Depends(verify_token)):
     """Crear un nuevo ticket de atención"""
     try:
-        success, message, ticket_id = ticket_service.crear_ticket(ticket_data.dict())
+        success, message, ticket_id = await ejecutar_db(ticket_service.crear_ticket, ticket_data.dict())
         
         if success:
             return APIResponse(
@@ -682,11 +933,17 @@ async def crear_ticket(ticket_data: TicketCreate, current_user: str = Depends(ve
 @app.get("/tickets/abiertos", response_model=APIResponse)
 async def obtener_tickets_abiertos(
     limite: int = Query(default=100, le=500),
+    after: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
-    """Obtener tickets abiertos"""
+    """Obtener tickets abiertos (paginación por cursor con ?after=)"""
     try:
-        tickets = repository.obtener_tickets_abiertos(limite)
+        despues_de = leer_cursor(after, (int, datetime, int))
+        tickets = await ejecutar_db(repository.obtener_tickets_abiertos, limite + 1, despues_de, True)
+        tickets, siguiente_cursor = paginar(
+            tickets, limite,
+            lambda t: (orden_prioridad_ticket(t.prioridad), t.fecha_creacion, t.id)
+        )
         
         tickets_data = [{
             "id": t.id,
@@ -704,9 +961,12 @@ async def obtener_tickets_abiertos(
         return APIResponse(
             success=True,
             message=f"Se encontraron {len(tickets)} tickets abiertos",
-            data=tickets_data
+            data=tickets_data,
+            siguiente_cursor=siguiente_cursor
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener tickets: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -715,17 +975,21 @@ async def obtener_tickets_abiertos(
 async def obtener_tickets_cliente(
     cliente_id: int,
     limite: int = Query(default=50, le=200),
+    after: Optional[str] = None,
     current_user: str = Depends(verify_token)
 ):
-    """Obtener tickets de un cliente específico"""
+    """Obtener tickets de un cliente específico (paginación por cursor con ?after=)"""
     try:
+        despues_de = leer_cursor(after, (datetime, int))
+        
         # Verificar que el cliente existe
-        cliente = repository.obtener_cliente(cliente_id)
+        cliente = await ejecutar_db(repository.obtener_cliente, cliente_id)
         if not cliente:
             raise HTTPException(status_code=404, detail="Cliente no encontrado")
         
         # Obtener tickets del cliente
-        tickets = repository.obtener_tickets_por_cliente(cliente_id, limite)
+        tickets = await ejecutar_db(repository.obtener_tickets_por_cliente, cliente_id, limite + 1, despues_de)
+        tickets, siguiente_cursor = paginar(tickets, limite, lambda t: (t.fecha_creacion, t.id))
         
         tickets_data = [{
             "id": t.id,
@@ -745,7 +1009,8 @@ async def obtener_tickets_cliente(
         return APIResponse(
             success=True,
             message=f"Se encontraron {len(tickets)} tickets para el cliente",
-            data=tickets_data
+            data=tickets_data,
+            siguiente_cursor=siguiente_cursor
         )
     
     except HTTPException:
@@ -772,7 +1037,7 @@ async def generar_reporte_clientes(
         if request.get('activo') is not None:
             parametros['filtros']['activo'] = request['activo']
         
-        reporte = reporte_service.generar_reporte_clientes(parametros)
+        reporte = await ejecutar_db(reporte_service.generar_reporte_clientes, parametros)
         
         return APIResponse(
             success=True,
@@ -780,6 +1045,8 @@ async def generar_reporte_clientes(
             data=reporte
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al generar reporte: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -806,7 +1073,7 @@ async def generar_reporte_transacciones(
         fecha_inicio_dt = datetime.combine(fecha_inicio, datetime.min.time())
         fecha_fin_dt = datetime.combine(fecha_fin, datetime.max.time())
         
-        reporte = reporte_service.generar_reporte_transacciones(fecha_inicio_dt, fecha_fin_dt)
+        reporte = await ejecutar_db(reporte_service.generar_reporte_transacciones, fecha_inicio_dt, fecha_fin_dt)
         
         return APIResponse(
             success=True,
@@ -820,14 +1087,257 @@ async def generar_reporte_transacciones(
         logger.error(f"Error al generar reporte: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+def leer_periodo_reporte(request: dict) -> tuple:
+    """Valida fecha_inicio/fecha_fin del cuerpo y retorna el período de días completos"""
+    fecha_inicio_str = request.get('fecha_inicio')
+    fecha_fin_str = request.get('fecha_fin')
+    
+    if not fecha_inicio_str or not fecha_fin_str:
+        raise HTTPException(status_code=400, detail="Las fechas de inicio y fin son requeridas")
+    
+    try:
+        fecha_inicio = datetime.fromisoformat(fecha_inicio_str).date()
+        fecha_fin = datetime.fromisoformat(fecha_fin_str).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido (use YYYY-MM-DD)")
+    
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="La fecha de fin debe ser posterior a la fecha de inicio")
+    
+    return datetime.combine(fecha_inicio, datetime.min.time()), datetime.combine(fecha_fin, datetime.max.time())
+
+def leer_parametros_analitica(request: dict) -> tuple:
+    """Valida las dimensiones y la ventana de media móvil del reporte analítico"""
+    dimensiones = request.get('dimensiones') or None
+    if isinstance(dimensiones, str):
+        dimensiones = [d.strip() for d in dimensiones.split(',') if d.strip()]
+    if dimensiones is not None:
+        from analytics import DIMENSIONES_DISPONIBLES
+        no_soportadas = [d for d in dimensiones if d not in DIMENSIONES_DISPONIBLES]
+        if no_soportadas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Dimensiones no soportadas: {', '.join(map(str, no_soportadas))}. "
+                       f"Disponibles: {', '.join(DIMENSIONES_DISPONIBLES)}"
+            )
+    
+    try:
+        ventana = int(request.get('ventana_media_movil', 7))
+    except (TypeError, ValueError):
+        ventana = 0
+    if not 1 <= ventana <= 90:
+        raise HTTPException(status_code=400, detail="La ventana de media móvil debe estar entre 1 y 90 días")
+    
+    return dimensiones, ventana
+
+@app.post("/reportes/analitica", response_model=APIResponse)
+async def generar_reporte_analitica(
+    request: dict,
+    current_user: str = Depends(verify_token)
+):
+    """Generar analítica de transacciones: desgloses por dimensión, percentiles y media móvil diaria"""
+    try:
+        fecha_inicio_dt, fecha_fin_dt = leer_periodo_reporte(request)
+        
+        dimensiones, ventana = leer_parametros_analitica(request)
+        
+        reporte = await ejecutar_db(
+            reporte_service.generar_reporte_analitica, fecha_inicio_dt, fecha_fin_dt, dimensiones, ventana
+        )
+        
+        return APIResponse(
+            success=True,
+            message="Reporte analítico generado exitosamente",
+            data=reporte
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al generar reporte analítico: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.post("/reportes/jobs", response_model=APIResponse, status_code=202)
+async def enviar_trabajo_reporte(
+    request: dict,
+    current_user: str = Depends(verify_token)
+):
+    """Encolar la generación de un reporte (clientes, transacciones, analitica o extracto_transacciones) en segundo plano"""
+    try:
+        tipo = request.get('tipo')
+        formato = str(request.get('formato', 'JSON')).upper()
+        if formato not in ('JSON', 'CSV', 'PARQUET'):
+            raise HTTPException(status_code=400, detail="Formato no soportado (use JSON, CSV o PARQUET)")
+        
+        if tipo == 'clientes':
+            parametros = {'filtros': {}, 'limite': request.get('limite', 1000)}
+            if request.get('tipo_cliente'):
+                parametros['filtros']['tipo_cliente'] = request['tipo_cliente']
+            if request.get('activo') is not None:
+                parametros['filtros']['activo'] = request['activo']
+        elif tipo in ('transacciones', 'analitica'):
+            fecha_inicio, fecha_fin = leer_periodo_reporte(request)
+            parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+            if tipo == 'analitica':
+                if formato != 'JSON':
+                    raise HTTPException(status_code=400, detail="El reporte analítico solo se exporta en JSON")
+                parametros['dimensiones'], parametros['ventana'] = leer_parametros_analitica(request)
+        elif tipo == 'extracto_transacciones':
+            if formato != 'PARQUET':
+                raise HTTPException(status_code=400, detail="El extracto de transacciones se exporta en PARQUET")
+            fecha_inicio, fecha_fin = leer_periodo_reporte(request)
+            parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'cliente_id': request.get('cliente_id')}
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Tipo de reporte no soportado (clientes, transacciones, analitica o extracto_transacciones)"
+            )
+        
+        trabajo = await ejecutar_db(trabajos_reporte.enviar, tipo, formato, parametros)
+        
+        return APIResponse(
+            success=True,
+            message="Reporte encolado",
+            data=trabajo.to_dict()
+        )
+    
+    except HTTPException:
+        raise
+    except ColaSaturadaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error al encolar reporte: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/reportes/jobs/{trabajo_id}")
+async def obtener_trabajo_reporte(
+    trabajo_id: str,
+    descargar: bool = False,
+    current_user: str = Depends(verify_token)
+):
+    """Consultar estado y progreso de un reporte; con ?descargar=true entrega el archivo generado"""
+    trabajo = await ejecutar_db(trabajos_reporte.obtener, trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo de reporte no encontrado")
+    
+    if descargar:
+        if trabajo['estado'] != ESTADO_COMPLETADO or not trabajo.get('archivo'):
+            raise HTTPException(status_code=409, detail=f"El reporte no está listo (estado: {trabajo['estado']})")
+        # El estado es compartido, pero el archivo vive en el directorio de reportes de la instancia que lo generó
+        ruta = os.path.join(app_config.REPORTS_DIRECTORY, os.path.basename(trabajo['archivo']))
+        if not os.path.exists(ruta):
+            raise HTTPException(status_code=410, detail="El archivo del reporte ya no está disponible en este servidor")
+        return FileResponse(ruta, filename=os.path.basename(ruta))
+    
+    return APIResponse(
+        success=True,
+        message=trabajo.get('mensaje') or trabajo['estado'],
+        data=trabajo
+    )
+
+# Endpoints de exportación masiva
+TIPOS_CONTENIDO_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+def tomar_cupo_exportacion():
+    """Reserva un cupo de exportación o responde 503 si ya están todos en uso"""
+    try:
+        cupo_exportaciones.tomar()
+    except ColaSaturadaError as e:
+        logger.warning(f"Exportación rechazada: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+def responder_stream(bloques, formato: str, nombre: str) -> StreamingResponse:
+    """Emite la exportación dentro de un cupo, que se libera al terminar o cortarse la descarga"""
+    # bloques es perezoso: nada toca la base hasta que el stream pide el primer bloque
+    tomar_cupo_exportacion()
+    return StreamingResponse(
+        cupo_exportaciones.envolver(bloques),
+        media_type=TIPOS_CONTENIDO_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    )
+
+async def responder_parquet(exportar, nombre: str, *args) -> FileResponse:
+    """Escribe la exportación Parquet en un archivo temporal y lo entrega, borrándolo al terminar"""
+    # Parquet escribe su índice al final del archivo, así que no puede emitirse como stream
+    os.makedirs(app_config.REPORTS_DIRECTORY, exist_ok=True)
+    ruta = os.path.join(app_config.REPORTS_DIRECTORY, f"export_{nombre}_{uuid.uuid4().hex}.parquet")
+    tomar_cupo_exportacion()
+    try:
+        await ejecutar_db(exportar, ruta, *args)
+    except Exception:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    finally:
+        cupo_exportaciones.liberar()
+    return FileResponse(
+        ruta,
+        media_type=TIPOS_CONTENIDO_EXPORTACION['parquet'],
+        filename=f"{nombre}.parquet",
+        background=BackgroundTask(os.remove, ruta)
+    )
+
+@app.get("/export/clientes")
+async def exportar_clientes(
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv|parquet)$"),
+    activo: Optional[bool] = None,
+    tipo_cliente: Optional[str] = None,
+    ciudad: Optional[str] = None,
+    current_user: str = Depends(verify_token)
+):
+    """Exportar clientes en streaming (NDJSON o CSV) o como archivo Parquet, sin cargar la tabla en memoria"""
+    filtros = {}
+    if activo is not None:
+        filtros['activo'] = activo
+    if tipo_cliente:
+        filtros['tipo_cliente'] = tipo_cliente
+    if ciudad:
+        filtros['ciudad'] = ciudad
+    
+    if formato == 'parquet':
+        return await responder_parquet(reporte_service.exportar_clientes_parquet, 'clientes', filtros)
+    
+    return responder_stream(reporte_service.exportar_clientes_stream(filtros, formato), formato, 'clientes')
+
+@app.get("/export/transacciones")
+async def exportar_transacciones(
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv|parquet)$"),
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    cliente_id: Optional[int] = None,
+    current_user: str = Depends(verify_token)
+):
+    """Exportar transacciones en streaming (NDJSON o CSV) o como archivo Parquet, sin cargar la tabla en memoria"""
+    if fecha_inicio and fecha_fin and fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="La fecha de fin debe ser posterior a la fecha de inicio")
+    
+    fecha_inicio_dt = datetime.combine(fecha_inicio, datetime.min.time()) if fecha_inicio else None
+    fecha_fin_dt = datetime.combine(fecha_fin, datetime.max.time()) if fecha_fin else None
+    
+    if formato == 'parquet':
+        return await responder_parquet(
+            reporte_service.exportar_transacciones_parquet, 'transacciones', fecha_inicio_dt, fecha_fin_dt, cliente_id
+        )
+    
+    return responder_stream(
+        reporte_service.exportar_transacciones_stream(fecha_inicio_dt, fecha_fin_dt, cliente_id, formato),
+        formato, 'transacciones'
+    )
+
 # Endpoints de estadísticas
 @app.get("/estadisticas/dashboard", response_model=APIResponse)
 async def obtener_estadisticas_dashboard(current_user: str = Depends(verify_token)):
     """Obtener estadísticas para el dashboard"""
     try:
-        estadisticas_clientes = repository.obtener_estadisticas_clientes()
-        metricas_tickets = ticket_service.obtener_metricas_atencion()
-        resumen_diario = transaccion_service.obtener_resumen_diario()
+        estadisticas_clientes, metricas_tickets, resumen_diario = await asyncio.gather(
+            ejecutar_db(dashboard_cache.obtener, CLAVE_CLIENTES, repository.obtener_estadisticas_clientes),
+            ejecutar_db(dashboard_cache.obtener, CLAVE_TICKETS, ticket_service.obtener_metricas_atencion),
+            ejecutar_db(dashboard_cache.obtener, CLAVE_TRANSACCIONES_HOY, transaccion_service.obtener_resumen_diario)
+        )
         
         dashboard = {
             'clientes': estadisticas_clientes,
@@ -842,6 +1352,8 @@ async def obtener_estadisticas_dashboard(current_user: str = Depends(verify_toke
             data=dashboard
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener estadísticas: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
@@ -851,12 +1363,23 @@ async def obtener_estadisticas_dashboard(current_user: str = Depends(verify_toke
 async def health_check():
     """Verificar el estado de la API"""
     try:
-        db_status = repository.test_connection()
+        db_status = await ejecutar_db(repository.test_connection)
         
         return {
             "status": "healthy" if db_status else "unhealthy",
             "timestamp": datetime.now().isoformat(),
             "database": "connected" if db_status else "disconnected",
+            "pool": repository.obtener_estadisticas_pool(),
+            "pool_exportaciones": repository.obtener_estadisticas_pool_exportaciones(),
+            "exportaciones": cupo_exportaciones.stats(),
+            "cache_clientes": repository.obtener_estadisticas_cache_clientes(),
+            "generador_codigos": repository.obtener_estadisticas_generador_codigos(),
+            "executor": db_executor.stats(),
+            "dashboard_cache": dashboard_cache.stats(),
+            "reportes": trabajos_reporte.stats(),
+            "barredor_promociones": barredor_promociones.stats(),
+            "campanas": campanas_promociones.stats(),
+            "reclasificaciones": reclasificaciones_clientes.stats(),
             "version": "1.0.0"
         }
     except Exception as e:
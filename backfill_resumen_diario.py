@@ -0,0 +1,42 @@
+import argparse
+from datetime import date, datetime, timedelta
+
+from repository import DatabaseRepository, DatabaseConfig
+
+
+def backfill_resumen_diario(desde: date, hasta: date, dias_por_lote: int = 31):
+    config = DatabaseConfig()
+    repo = DatabaseRepository(config)
+
+    print(f"Reconstruyendo resumen diario del {desde} al {hasta}...")
+    total_filas = 0
+
+    try:
+        # Un lote por transacción para no retener bloqueos sobre todo el histórico
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=dias_por_lote - 1), hasta)
+            filas = repo.reconstruir_resumen_diario(inicio, fin)
+            total_filas += filas
+            print(f"  {inicio} -> {fin}: {filas} filas")
+            inicio = fin + timedelta(days=1)
+
+        print(f"Resumen diario reconstruido: {total_filas} filas")
+    except Exception as e:
+        print(f"Error al reconstruir resumen diario: {e}")
+    finally:
+        repo.close()
+
+
+def _fecha(valor: str) -> date:
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye transacciones_resumen_diario desde transacciones")
+    parser.add_argument('--desde', type=_fecha, required=True, help="Primer día (YYYY-MM-DD)")
+    parser.add_argument('--hasta', type=_fecha, default=date.today(), help="Último día, inclusive (YYYY-MM-DD)")
+    parser.add_argument('--dias-por-lote', type=int, default=31, help="Días reconstruidos por transacción")
+    args = parser.parse_args()
+
+    backfill_resumen_diario(args.desde, args.hasta, max(1, args.dias_por_lote))
@@ -0,0 +1,96 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Presupuesto de arranque en frío de `uvicorn api:app`
+PRESUPUESTO_IMPORT_MS = 800
+PRESUPUESTO_ARRANQUE_MS = 2500
+
+# Módulos pesados que solo deben cargarse con su primer uso
+MODULOS_DIFERIDOS = ('numpy', 'pandas', 'pyarrow', 'cryptography', 'jwt', 'pymysql', 'pyodbc')
+
+_LINEA_IMPORTTIME = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def medir_importacion(modulo: str = 'api'):
+    """Importa el módulo en un intérprete nuevo con -X importtime; retorna (total_ms, tiempos por módulo)"""
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{resultado.stderr[-2000:]}")
+
+    tiempos = {}
+    total_us = 0
+    for linea in resultado.stderr.splitlines():
+        coincidencia = _LINEA_IMPORTTIME.match(linea)
+        if not coincidencia:
+            continue
+        propio, acumulado, sangria, nombre = coincidencia.groups()
+        tiempos[nombre] = (int(propio) / 1000, int(acumulado) / 1000)
+        # Los módulos de primer nivel tienen la sangría mínima; su acumulado suma el total
+        if len(sangria) == 1:
+            total_us += int(acumulado)
+    return total_us / 1000, tiempos
+
+
+def medir_arranque(puerto: int, timeout: float = 30.0) -> float:
+    """Arranca uvicorn y mide cuánto tarda /health en responder; retorna milisegundos"""
+    inicio = time.monotonic()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(puerto)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.monotonic() - inicio < timeout:
+            if proceso.poll() is not None:
+                raise RuntimeError("uvicorn terminó antes de responder")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{puerto}/health", timeout=1)
+                return (time.monotonic() - inicio) * 1000
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"/health no respondió en {timeout:.0f} s")
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mide el costo de importación y arranque en frío de la API")
+    parser.add_argument('--modulo', default='api', help="Módulo a importar (por defecto api)")
+    parser.add_argument('--top', type=int, default=15, help="Cantidad de módulos más lentos a listar")
+    parser.add_argument('--uvicorn', action='store_true', help="Además, medir el arranque real de uvicorn hasta /health")
+    parser.add_argument('--puerto', type=int, default=8765, help="Puerto para la medición con uvicorn")
+    args = parser.parse_args()
+
+    total_ms, tiempos = medir_importacion(args.modulo)
+    print(f"Importación de {args.modulo}: {total_ms:.0f} ms (presupuesto {PRESUPUESTO_IMPORT_MS} ms)")
+
+    print("\nMódulos más costosos (acumulado):")
+    for nombre, (propio, acumulado) in sorted(tiempos.items(), key=lambda t: t[1][1], reverse=True)[:args.top]:
+        print(f"  {acumulado:8.1f} ms  {propio:8.1f} ms propio  {nombre}")
+
+    cargados = sorted(m for m in MODULOS_DIFERIDOS if m in tiempos)
+    if cargados:
+        print(f"\nMódulos que deberían cargarse en diferido: {', '.join(cargados)}")
+
+    ok = total_ms <= PRESUPUESTO_IMPORT_MS and not cargados
+
+    if args.uvicorn:
+        arranque_ms = medir_arranque(args.puerto)
+        print(f"\nArranque de uvicorn hasta /health: {arranque_ms:.0f} ms (presupuesto {PRESUPUESTO_ARRANQUE_MS} ms)")
+        ok = ok and arranque_ms <= PRESUPUESTO_ARRANQUE_MS
+
+    print("\nDentro del presupuesto" if ok else "\nFuera del presupuesto")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
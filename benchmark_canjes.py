@@ -0,0 +1,79 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import Promocion, TipoPromocion
+from repository import DatabaseRepository, DatabaseConfig
+from services import PromocionService
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def benchmark_canjes(cliente_id: int, usos: int, intentos: int, hilos: int) -> bool:
+    """Canjea concurrentemente un mismo código y verifica que nunca se exceda usos_maximos"""
+    config = DatabaseConfig()
+    repo = DatabaseRepository(config)
+    servicio = PromocionService(repo)
+
+    try:
+        promocion = Promocion(
+            titulo="Benchmark de canjes concurrentes",
+            tipo=TipoPromocion.BEBIDA_GRATIS,
+            fecha_inicio=datetime.now() - timedelta(minutes=1),
+            fecha_fin=datetime.now() + timedelta(hours=1),
+            usos_maximos=usos,
+            creado_por='BENCHMARK'
+        )
+        repo.crear_promocion(promocion)
+        print(f"Promoción {promocion.codigo}: {usos} usos, {intentos} intentos desde {hilos} hilos "
+              f"(pool de {config.POOL_MAX_SIZE} conexiones)")
+
+        def canjear(_):
+            inicio = time.perf_counter()
+            exito, mensaje, _beneficio = servicio.canjear_promocion(promocion.codigo, cliente_id)
+            return exito, mensaje, (time.perf_counter() - inicio) * 1000
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            resultados = list(executor.map(canjear, range(intentos)))
+        duracion = time.perf_counter() - inicio
+
+        exitos = sum(1 for exito, _, _ in resultados if exito)
+        errores = sorted({mensaje for exito, mensaje, _ in resultados if not exito})
+        latencias = [ms for _, _, ms in resultados]
+
+        persistida = repo.obtener_promocion_por_codigo(promocion.codigo)
+
+        print(f"  {intentos / duracion:.0f} canjes/s en {duracion:.2f} s")
+        print(f"  latencia p50 {_percentil(latencias, 50):.1f} ms, p95 {_percentil(latencias, 95):.1f} ms, "
+              f"p99 {_percentil(latencias, 99):.1f} ms")
+        print(f"  exitosos: {exitos}, rechazados: {intentos - exitos}")
+        for mensaje in errores:
+            print(f"    - {mensaje}")
+        print(f"  usos_actuales en base: {persistida.usos_actuales}, estado: {persistida.estado.value}")
+
+        esperado = min(usos, intentos)
+        consistente = exitos == esperado and persistida.usos_actuales == esperado
+        print("Consistente: ningún uso perdido ni excedido" if consistente
+              else f"INCONSISTENTE: se esperaban {esperado} canjes")
+        return consistente
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide canjes concurrentes de un mismo código de promoción")
+    parser.add_argument('--cliente-id', type=int, required=True, help="Cliente existente que realiza los canjes")
+    parser.add_argument('--usos', type=int, default=100, help="usos_maximos de la promoción de prueba")
+    parser.add_argument('--intentos', type=int, default=500, help="Canjes intentados en total")
+    parser.add_argument('--hilos', type=int, default=32, help="Cajas concurrentes")
+    args = parser.parse_args()
+
+    sys.exit(0 if benchmark_canjes(args.cliente_id, args.usos, args.intentos, args.hilos) else 1)
@@ -0,0 +1,52 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from codes import codigo_valido
+from repository import DatabaseRepository, DatabaseConfig
+
+
+def benchmark_codigos(cantidad: int, lote: int, hilos: int) -> bool:
+    """Genera códigos por lotes y de a uno desde varios hilos; verifica que no se repita ninguno"""
+    config = DatabaseConfig()
+    repo = DatabaseRepository(config)
+    generador = repo.generador_codigos
+
+    try:
+        print(f"Bloques de {config.PROMO_CODE_BLOCK_SIZE} códigos; {cantidad} por lotes de {lote}, "
+              f"{cantidad // 10} de a uno desde {hilos} hilos")
+
+        inicio = time.perf_counter()
+        codigos = []
+        for _ in range(0, cantidad, lote):
+            codigos.extend(generador.generar(min(lote, cantidad - len(codigos))))
+        duracion = time.perf_counter() - inicio
+        print(f"  por lotes: {len(codigos) / duracion:.0f} códigos/s en {duracion:.2f} s")
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            sueltos = list(executor.map(lambda _: generador.siguiente(), range(cantidad // 10)))
+        duracion = time.perf_counter() - inicio
+        print(f"  de a uno: {len(sueltos) / duracion:.0f} códigos/s en {duracion:.2f} s")
+
+        stats = generador.stats()
+        print(f"  bloques reservados: {stats['bloques_reservados']}, esperas por reserva: {stats['reservas_en_espera']}")
+
+        todos = codigos + sueltos
+        unicos = len(set(todos))
+        validos = all(codigo_valido(c) for c in todos)
+        print("Sin colisiones" if unicos == len(todos) else f"COLISIONES: {len(todos) - unicos}")
+        return unicos == len(todos) and validos
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide la generación de códigos de promoción por bloques")
+    parser.add_argument('--cantidad', type=int, default=1_000_000, help="Códigos a generar por lotes")
+    parser.add_argument('--lote', type=int, default=10_000, help="Tamaño de cada lote")
+    parser.add_argument('--hilos', type=int, default=16, help="Hilos que piden códigos de a uno")
+    args = parser.parse_args()
+
+    sys.exit(0 if benchmark_codigos(args.cantidad, args.lote, args.hilos) else 1)
@@ -0,0 +1,185 @@
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from models import Cliente
+
+# Claves de los agregados del dashboard
+CLAVE_CLIENTES = 'clientes'
+CLAVE_TICKETS = 'tickets'
+CLAVE_TRANSACCIONES_HOY = 'transacciones_hoy'
+
+
+class CacheAgregados:
+    """Caché de agregados con TTL, recálculo de un solo vuelo por clave e invalidación explícita"""
+
+    def __init__(self, ttl_segundos: float = 30.0):
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._valores: Dict[str, tuple] = {}
+        self._locks_clave: Dict[str, threading.Lock] = {}
+        self._generaciones: Dict[str, int] = {}
+        self._estadisticas = {
+            'aciertos': 0,
+            'fallos': 0,
+            'esperas_recalculo': 0,
+            'invalidaciones': 0
+        }
+
+    def obtener(self, clave: str, calcular: Callable[[], Any]) -> Any:
+        """Retorna el valor vigente o lo recalcula; solo un hilo recalcula cada clave a la vez.
+
+        Si calcular lanza una excepción no se guarda nada y la excepción llega al llamador.
+        """
+        with self._lock:
+            valor = self._vigente(clave)
+            if valor is not None:
+                self._estadisticas['aciertos'] += 1
+                return valor[0]
+            lock_clave = self._locks_clave.setdefault(clave, threading.Lock())
+
+        with lock_clave:
+            with self._lock:
+                # Otro hilo pudo recalcular la clave mientras esperábamos
+                valor = self._vigente(clave)
+                if valor is not None:
+                    self._estadisticas['esperas_recalculo'] += 1
+                    return valor[0]
+                self._estadisticas['fallos'] += 1
+                generacion = self._generaciones.get(clave, 0)
+
+            resultado = calcular()
+
+            with self._lock:
+                # Si hubo una invalidación durante el cálculo el resultado ya nace obsoleto
+                if self._generaciones.get(clave, 0) == generacion:
+                    self._valores[clave] = (resultado, time.monotonic() + self.ttl_segundos)
+            return resultado
+
+    def _vigente(self, clave: str):
+        entrada = self._valores.get(clave)
+        if entrada and entrada[1] > time.monotonic():
+            return entrada
+        return None
+
+    def invalidar(self, *claves: str):
+        """Descarta las claves indicadas, o todas si no se indica ninguna"""
+        with self._lock:
+            for clave in claves or list(self._valores):
+                self._valores.pop(clave, None)
+                self._generaciones[clave] = self._generaciones.get(clave, 0) + 1
+                self._estadisticas['invalidaciones'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna estadísticas de uso de la caché"""
+        with self._lock:
+            return {
+                'ttl_segundos': self.ttl_segundos,
+                'claves': len(self._valores),
+                **self._estadisticas
+            }
+
+
+class CacheClientes:
+    """Caché LRU de clientes con TTL, accesible por id y por número de documento"""
+
+    def __init__(self, max_entradas: int = 5000, ttl_segundos: float = 60.0):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._por_id: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._id_por_documento: Dict[str, int] = {}
+        self._version = 0
+        self._estadisticas = {
+            'aciertos': 0,
+            'fallos': 0,
+            'expulsiones': 0,
+            'invalidaciones': 0
+        }
+
+    def version(self) -> int:
+        """Versión vigente; se toma antes de leer de la base para poder descartar lecturas obsoletas"""
+        with self._lock:
+            return self._version
+
+    def obtener_por_id(self, cliente_id: int) -> Optional[Cliente]:
+        with self._lock:
+            return self._obtener(cliente_id)
+
+    def obtener_por_documento(self, numero_documento: str) -> Optional[Cliente]:
+        with self._lock:
+            cliente_id = self._id_por_documento.get(numero_documento)
+            if cliente_id is None:
+                self._estadisticas['fallos'] += 1
+                return None
+            return self._obtener(cliente_id)
+
+    def _obtener(self, cliente_id: int) -> Optional[Cliente]:
+        entrada = self._por_id.get(cliente_id)
+        if entrada is None:
+            self._estadisticas['fallos'] += 1
+            return None
+        if entrada[1] <= time.monotonic():
+            self._quitar(cliente_id)
+            self._estadisticas['fallos'] += 1
+            return None
+        self._por_id.move_to_end(cliente_id)
+        self._estadisticas['aciertos'] += 1
+        return self._copiar(entrada[0])
+
+    def guardar(self, cliente: Cliente, version: int):
+        """Guarda una copia del cliente si ninguna invalidación ocurrió desde que se tomó version"""
+        if cliente.id is None or self.max_entradas <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._quitar(cliente.id)
+            self._por_id[cliente.id] = (self._copiar(cliente), time.monotonic() + self.ttl_segundos)
+            self._id_por_documento[cliente.numero_documento] = cliente.id
+            while len(self._por_id) > self.max_entradas:
+                cliente_id, entrada = self._por_id.popitem(last=False)
+                self._quitar_documento(cliente_id, entrada[0].numero_documento)
+                self._estadisticas['expulsiones'] += 1
+
+    def invalidar(self, cliente_id: Optional[int] = None, numero_documento: Optional[str] = None):
+        """Descarta el cliente indicado, o toda la caché si no se indica ninguna clave"""
+        with self._lock:
+            self._version += 1
+            self._estadisticas['invalidaciones'] += 1
+            if cliente_id is None and numero_documento is None:
+                self._por_id.clear()
+                self._id_por_documento.clear()
+                return
+            if numero_documento is not None:
+                cliente_id_documento = self._id_por_documento.get(numero_documento)
+                if cliente_id_documento is not None:
+                    self._quitar(cliente_id_documento)
+            if cliente_id is not None:
+                self._quitar(cliente_id)
+
+    def _quitar(self, cliente_id: int):
+        entrada = self._por_id.pop(cliente_id, None)
+        if entrada is not None:
+            self._quitar_documento(cliente_id, entrada[0].numero_documento)
+
+    def _quitar_documento(self, cliente_id: int, numero_documento: str):
+        if self._id_por_documento.get(numero_documento) == cliente_id:
+            del self._id_por_documento[numero_documento]
+
+    @staticmethod
+    def _copiar(cliente: Cliente) -> Cliente:
+        # Los llamadores mutan los clientes que reciben; la caché nunca comparte su instancia
+        return dataclasses.replace(cliente, preferencias=dict(cliente.preferencias or {}))
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna estadísticas de uso de la caché"""
+        with self._lock:
+            return {
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl_segundos,
+                'entradas': len(self._por_id),
+                **self._estadisticas
+            }
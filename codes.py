@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+# Base32 de Crockford: sin I, L, O ni U para evitar confusiones al dictar o tipear el código
+ALFABETO = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_VALORES = {c: i for i, c in enumerate(ALFABETO)}
+
+# 40 bits de secuencia -> 8 caracteres, más un dígito verificador
+BITS_SECUENCIA = 40
+LONGITUD_CODIGO = BITS_SECUENCIA // 5 + 1
+MAX_SECUENCIA = 1 << BITS_SECUENCIA
+
+_BITS_MITAD = BITS_SECUENCIA // 2
+_MASCARA_MITAD = (1 << _BITS_MITAD) - 1
+_RONDAS = 4
+
+
+def _digito_verificador(cuerpo: str) -> str:
+    """Luhn mod 32: detecta cualquier carácter errado y casi todas las transposiciones adyacentes"""
+    factor, suma = 2, 0
+    for caracter in reversed(cuerpo):
+        sumando = factor * _VALORES[caracter]
+        suma += sumando // 32 + sumando % 32
+        factor = 3 - factor
+    return ALFABETO[-suma % 32]
+
+
+def _suma_par(valor: int) -> int:
+    """Aporte Luhn de un par de caracteres: el cuerpo tiene largo par, así que el segundo va duplicado"""
+    duplicado = 2 * (valor & 31)
+    return (valor >> 5) + duplicado // 32 + duplicado % 32
+
+
+# Tablas por par de caracteres (10 bits) para codificar sin recorrer carácter por carácter
+_PARES = [ALFABETO[v >> 5] + ALFABETO[v & 31] for v in range(1024)]
+_SUMAS_PARES = [_suma_par(v) for v in range(1024)]
+
+
+def codigo_valido(codigo: str) -> bool:
+    """Indica si el código tiene el formato del generador y su dígito verificador cuadra"""
+    if len(codigo) != LONGITUD_CODIGO or any(c not in _VALORES for c in codigo):
+        return False
+    return _digito_verificador(codigo[:-1]) == codigo[-1]
+
+
+class GeneradorCodigos:
+    """Entrega códigos de promoción únicos desde bloques de una secuencia reservados en la base.
+
+    Cada valor de la secuencia pasa por una permutación Feistel de 40 bits con clave, así que los códigos
+    no son correlativos pero sí distintos entre sí. La clave no debe cambiar una vez emitidos códigos.
+    """
+
+    def __init__(self, reservar: Callable[[int], int], clave: str, tamano_bloque: int = 1000,
+                 umbral_reposicion: float = 0.2):
+        # reservar(cantidad) avanza la secuencia y retorna el primer valor del bloque [inicio, inicio + cantidad)
+        self._reservar = reservar
+        self.tamano_bloque = tamano_bloque
+        self.umbral = max(1, int(tamano_bloque * umbral_reposicion))
+        self.logger = logging.getLogger(__name__)
+        semilla = hashlib.blake2b(clave.encode('utf-8'), digest_size=4 * _RONDAS).digest()
+        self._claves_ronda = [int.from_bytes(semilla[i * 4:(i + 1) * 4], 'big') for i in range(_RONDAS)]
+        self._lock = threading.Lock()
+        self._lock_reserva = threading.Lock()
+        self._bloques = deque()
+        self._disponibles = 0
+        self._reponiendo = False
+        self._estadisticas = {
+            'codigos_entregados': 0,
+            'bloques_reservados': 0,
+            'reservas_en_espera': 0,
+            'errores_reposicion': 0
+        }
+
+    def siguiente(self) -> str:
+        return self.generar(1)[0]
+
+    def generar(self, cantidad: int) -> List[str]:
+        """Retorna cantidad códigos nuevos; los lotes de un bloque o más reservan su propio tramo"""
+        if cantidad <= 0:
+            return []
+        if cantidad >= self.tamano_bloque:
+            inicio = self._reservar_tramo(cantidad)
+            valores = range(inicio, inicio + cantidad)
+        else:
+            valores = self._tomar(cantidad)
+        with self._lock:
+            self._estadisticas['codigos_entregados'] += cantidad
+        return [self.codificar(n) for n in valores]
+
+    def codificar(self, valor: int) -> str:
+        """Permuta el valor de la secuencia y lo escribe en base32 con dígito verificador"""
+        if not 0 <= valor < MAX_SECUENCIA:
+            raise ValueError(f"Secuencia de códigos agotada o inválida: {valor}")
+        izquierda, derecha = valor >> _BITS_MITAD, valor & _MASCARA_MITAD
+        for clave in self._claves_ronda:
+            x = ((derecha ^ clave) * 0x9E3779B1) & 0xFFFFFFFF
+            x ^= x >> 15
+            x = (x * 0x2C1B3C6D) & 0xFFFFFFFF
+            x ^= x >> 12
+            izquierda, derecha = derecha, izquierda ^ (x & _MASCARA_MITAD)
+
+        a, b = izquierda >> 10, izquierda & 1023
+        c, d = derecha >> 10, derecha & 1023
+        suma = _SUMAS_PARES[a] + _SUMAS_PARES[b] + _SUMAS_PARES[c] + _SUMAS_PARES[d]
+        return _PARES[a] + _PARES[b] + _PARES[c] + _PARES[d] + ALFABETO[-suma % 32]
+
+    def _tomar(self, cantidad: int) -> List[int]:
+        valores: List[int] = []
+        while True:
+            with self._lock:
+                while len(valores) < cantidad and self._bloques:
+                    inicio, fin = self._bloques[0]
+                    tomados = min(cantidad - len(valores), fin - inicio)
+                    valores.extend(range(inicio, inicio + tomados))
+                    self._disponibles -= tomados
+                    if inicio + tomados == fin:
+                        self._bloques.popleft()
+                    else:
+                        self._bloques[0] = (inicio + tomados, fin)
+                completo = len(valores) == cantidad
+                if completo and self._disponibles < self.umbral and not self._reponiendo:
+                    # Reponer antes de agotar: las siguientes solicitudes no esperan a la base
+                    self._reponiendo = True
+                    threading.Thread(target=self._reponer_en_segundo_plano, name='codigos-reposicion',
+                                     daemon=True).start()
+            if completo:
+                return valores
+            with self._lock:
+                self._estadisticas['reservas_en_espera'] += 1
+            self._reponer(1)
+
+    def _reponer_en_segundo_plano(self):
+        try:
+            self._reponer(self.umbral)
+        except Exception as e:
+            with self._lock:
+                self._estadisticas['errores_reposicion'] += 1
+            self.logger.error(f"Error al reponer bloque de códigos: {e}")
+        finally:
+            with self._lock:
+                self._reponiendo = False
+
+    def _reponer(self, minimo: int):
+        """Reserva un bloque si quedan menos de minimo códigos; una sola reserva en vuelo a la vez"""
+        with self._lock_reserva:
+            with self._lock:
+                if self._disponibles >= minimo:
+                    return
+            inicio = self._reservar_tramo(self.tamano_bloque)
+            with self._lock:
+                self._bloques.append((inicio, inicio + self.tamano_bloque))
+                self._disponibles += self.tamano_bloque
+
+    def _reservar_tramo(self, cantidad: int) -> int:
+        inicio = self._reservar(cantidad)
+        if inicio + cantidad > MAX_SECUENCIA:
+            raise ValueError("Secuencia de códigos de promoción agotada")
+        with self._lock:
+            self._estadisticas['bloques_reservados'] += 1
+        return inicio
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna códigos disponibles en memoria y contadores de reservas"""
+        with self._lock:
+            return {
+                'tamano_bloque': self.tamano_bloque,
+                'disponibles': self._disponibles,
+                **self._estadisticas
+            }
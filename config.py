@@ -1,29 +1,74 @@
 import os
 from dataclasses import dataclass, field
 from typing import Optional, List
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
+
+# Variables definidas fuera de .env: tienen prioridad y una recarga no las pisa
+_ENTORNO_EXTERNO = frozenset(os.environ)
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+
+def recargar_entorno():
+    """Vuelve a leer .env para que las próximas instancias de configuración tomen sus cambios"""
+    for nombre, valor in dotenv_values().items():
+        if nombre not in _ENTORNO_EXTERNO and valor is not None:
+            os.environ[nombre] = valor
+
 @dataclass
 class DatabaseConfig:
-    """Configuración de base de datos"""
+    """Configuración de base de datos; cada instancia lee el entorno vigente al crearse"""
     # Configuración para producción (MySQL/PlanetScale)
-    DATABASE_URL: Optional[str] = os.getenv('DATABASE_URL')
+    DATABASE_URL: Optional[str] = field(default_factory=lambda: os.getenv('DATABASE_URL'))
     
     # Configuración para desarrollo local (SQL Server)
-    SERVER: str = os.getenv('DB_SERVER', 'localhost\\NESTOR23')
-    DATABASE: str = os.getenv('DB_NAME', 'atlantic_city_casino')
-    USERNAME: Optional[str] = os.getenv('DB_USERNAME')
-    PASSWORD: Optional[str] = os.getenv('DB_PASSWORD')
-    DRIVER: str = os.getenv('DB_DRIVER', 'ODBC Driver 17 for SQL Server')
-    TRUSTED_CONNECTION: bool = os.getenv('DB_TRUSTED_CONNECTION', 'true').lower() == 'true'
-    CONNECTION_TIMEOUT: int = int(os.getenv('DB_CONNECTION_TIMEOUT', '30'))
-    COMMAND_TIMEOUT: int = int(os.getenv('DB_COMMAND_TIMEOUT', '30'))
+    SERVER: str = field(default_factory=lambda: os.getenv('DB_SERVER', 'localhost\\NESTOR23'))
+    DATABASE: str = field(default_factory=lambda: os.getenv('DB_NAME', 'atlantic_city_casino'))
+    USERNAME: Optional[str] = field(default_factory=lambda: os.getenv('DB_USERNAME'))
+    PASSWORD: Optional[str] = field(default_factory=lambda: os.getenv('DB_PASSWORD'))
+    DRIVER: str = field(default_factory=lambda: os.getenv('DB_DRIVER', 'ODBC Driver 17 for SQL Server'))
+    TRUSTED_CONNECTION: bool = field(
+        default_factory=lambda: os.getenv('DB_TRUSTED_CONNECTION', 'true').lower() == 'true'
+    )
+    # TLS hacia MySQL siempre activo; verificar el certificado del servidor es opcional
+    SSL_VERIFY: bool = field(default_factory=lambda: os.getenv('DB_SSL_VERIFY', 'false').lower() == 'true')
+    SSL_CA: Optional[str] = field(default_factory=lambda: os.getenv('DB_SSL_CA'))
+    CONNECTION_TIMEOUT: int = field(default_factory=lambda: int(os.getenv('DB_CONNECTION_TIMEOUT', '30')))
+    COMMAND_TIMEOUT: int = field(default_factory=lambda: int(os.getenv('DB_COMMAND_TIMEOUT', '30')))
+    
+    # Pool de conexiones
+    POOL_MIN_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_POOL_MIN_SIZE', '2')))
+    POOL_MAX_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_POOL_MAX_SIZE', '10')))
+    POOL_TIMEOUT: float = field(default_factory=lambda: float(os.getenv('DB_POOL_TIMEOUT', '10')))
+    POOL_MAX_LIFETIME: int = field(default_factory=lambda: int(os.getenv('DB_POOL_MAX_LIFETIME', '1800')))
+    POOL_PRE_PING: bool = field(default_factory=lambda: os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true')
+    
+    # Inserciones masivas
+    BULK_CHUNK_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_BULK_CHUNK_SIZE', '1000')))
+    EXPORT_FETCH_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_EXPORT_FETCH_SIZE', '1000')))
+    # Pool aparte para lecturas largas (exportaciones, reportes, campañas): no consumen el pool de requests
+    EXPORT_POOL_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_EXPORT_POOL_SIZE', '4')))
+    ANALYTICS_FETCH_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_ANALYTICS_FETCH_SIZE', '10000')))
+    
+    # Ejecutor de llamadas bloqueantes para la API asíncrona
+    EXECUTOR_WORKERS: int = field(
+        default_factory=lambda: int(os.getenv('DB_EXECUTOR_WORKERS', os.getenv('DB_POOL_MAX_SIZE', '10')))
+    )
+    EXECUTOR_MAX_QUEUE: int = field(default_factory=lambda: int(os.getenv('DB_EXECUTOR_MAX_QUEUE', '200')))
+    
+    # Caché en proceso de clientes
+    CLIENT_CACHE_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_CLIENT_CACHE_SIZE', '5000')))
+    CLIENT_CACHE_TTL: float = field(default_factory=lambda: float(os.getenv('DB_CLIENT_CACHE_TTL', '60')))
+    
+    # Generación de códigos de promoción por bloques de la secuencia; la clave no debe cambiar tras emitir códigos
+    PROMO_CODE_BLOCK_SIZE: int = field(default_factory=lambda: int(os.getenv('DB_PROMO_CODE_BLOCK_SIZE', '1000')))
+    PROMO_CODE_KEY: str = field(default_factory=lambda: os.getenv('DB_PROMO_CODE_KEY', 'atlantic-city-promociones'))
     
     # Detectar entorno
-    IS_PRODUCTION: bool = os.getenv('RENDER') is not None or os.getenv('DATABASE_URL') is not None
+    IS_PRODUCTION: bool = field(
+        default_factory=lambda: os.getenv('RENDER') is not None or os.getenv('DATABASE_URL') is not None
+    )
 
 @dataclass
 class SecurityConfig:
@@ -47,6 +92,20 @@ class ApplicationConfig:
     BACKUP_DIRECTORY: str = os.getenv('BACKUP_DIR', 'backups')
     REPORTS_DIRECTORY: str = os.getenv('REPORTS_DIR', 'reports')
     QR_CODES_DIRECTORY: str = os.getenv('QR_DIR', 'qr_codes')
+    DASHBOARD_CACHE_TTL: int = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+    REPORT_WORKERS: int = int(os.getenv('REPORT_WORKERS', '2'))
+    REPORT_MAX_PENDING: int = int(os.getenv('REPORT_MAX_PENDING', '20'))
+    REPORT_RETENTION_SECONDS: int = int(os.getenv('REPORT_RETENTION_SECONDS', '3600'))
+    EXPORT_MAX_CONCURRENT: int = int(os.getenv('EXPORT_MAX_CONCURRENT', '2'))
+    PARQUET_COMPRESSION: str = os.getenv('PARQUET_COMPRESSION', 'zstd')
+    PARQUET_ROW_GROUP_SIZE: int = int(os.getenv('PARQUET_ROW_GROUP_SIZE', '100000'))
+    AUTO_MIGRATE: bool = os.getenv('AUTO_MIGRATE', 'true').lower() == 'true'
+    PROMO_SWEEP_ENABLED: bool = os.getenv('PROMO_SWEEP_ENABLED', 'true').lower() == 'true'
+    PROMO_SWEEP_INTERVAL: float = float(os.getenv('PROMO_SWEEP_INTERVAL', '60'))
+    PROMO_SWEEP_BATCH: int = int(os.getenv('PROMO_SWEEP_BATCH', '500'))
+    PROMO_SWEEP_MAX_BATCHES: int = int(os.getenv('PROMO_SWEEP_MAX_BATCHES', '20'))
+    CAMPAIGN_BATCH_SIZE: int = int(os.getenv('CAMPAIGN_BATCH_SIZE', '1000'))
+    CAMPAIGN_MAX_PENDING: int = int(os.getenv('CAMPAIGN_MAX_PENDING', '5'))
 
 @dataclass
 class CasinoConfig:
@@ -83,29 +142,31 @@ app_config = ApplicationConfig()
 casino_config = CasinoConfig()
 api_config = APIConfig()
 
-def get_connection_string() -> str:
+def get_connection_string(config: Optional[DatabaseConfig] = None) -> str:
     """Genera la cadena de conexión a la base de datos"""
+    config = config or db_config
+    
     # Si estamos en producción, usar DATABASE_URL (MySQL/PlanetScale)
-    if db_config.IS_PRODUCTION and db_config.DATABASE_URL:
-        return db_config.DATABASE_URL
+    if config.IS_PRODUCTION and config.DATABASE_URL:
+        return config.DATABASE_URL
     
     # Si estamos en desarrollo local, usar SQL Server
-    if db_config.TRUSTED_CONNECTION:
+    if config.TRUSTED_CONNECTION:
         return (
-            f"DRIVER={{{db_config.DRIVER}}};"
-            f"SERVER={db_config.SERVER};"
-            f"DATABASE={db_config.DATABASE};"
+            f"DRIVER={{{config.DRIVER}}};"
+            f"SERVER={config.SERVER};"
+            f"DATABASE={config.DATABASE};"
             f"Trusted_Connection=yes;"
-            f"Connection Timeout={db_config.CONNECTION_TIMEOUT};"
+            f"Connection Timeout={config.CONNECTION_TIMEOUT};"
         )
     else:
         return (
-            f"DRIVER={{{db_config.DRIVER}}};"
-            f"SERVER={db_config.SERVER};"
-            f"DATABASE={db_config.DATABASE};"
-            f"UID={db_config.USERNAME};"
-            f"PWD={db_config.PASSWORD};"
-            f"Connection Timeout={db_config.CONNECTION_TIMEOUT};"
+            f"DRIVER={{{config.DRIVER}}};"
+            f"SERVER={config.SERVER};"
+            f"DATABASE={config.DATABASE};"
+            f"UID={config.USERNAME};"
+            f"PWD={config.PASSWORD};"
+            f"Connection Timeout={config.CONNECTION_TIMEOUT};"
         )
 
 def validate_config() -> bool:
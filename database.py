@@ -0,0 +1,299 @@
+import logging
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import deque
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from config import DatabaseConfig, get_connection_string
+
+DIALECTO_MYSQL = 'mysql'
+DIALECTO_SQLSERVER = 'sqlserver'
+
+
+class PoolTimeoutError(Exception):
+    """Se agotó el tiempo de espera para obtener una conexión del pool"""
+
+
+@dataclass(frozen=True)
+class ConnectionDescriptor:
+    """Parámetros de conexión precalculados e inmutables, compartidos por todas las conexiones"""
+    dialecto: str
+    driver_kwargs: Mapping[str, Any]
+    connection_string: Optional[str] = None
+
+    @property
+    def es_mysql(self) -> bool:
+        return self.dialecto == DIALECTO_MYSQL
+
+
+def _contexto_ssl(config: DatabaseConfig) -> ssl.SSLContext:
+    """Contexto TLS para MySQL; solo con DB_SSL_VERIFY se valida el certificado del servidor"""
+    if config.SSL_VERIFY:
+        return ssl.create_default_context(cafile=config.SSL_CA)
+    # Cifrado sin verificación, como el ssl_disabled=False original
+    contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    contexto.check_hostname = False
+    contexto.verify_mode = ssl.CERT_NONE
+    return contexto
+
+
+class ConnectionFactory:
+    """Fábrica de conexiones para SQL Server (pyodbc) y MySQL (pymysql)"""
+
+    def __init__(self, config: DatabaseConfig):
+        self.descriptor = self.construir_descriptor(config)
+
+    @staticmethod
+    def construir_descriptor(config: DatabaseConfig) -> ConnectionDescriptor:
+        """Parsea la configuración una sola vez y arma los argumentos del driver"""
+        if config.IS_PRODUCTION and config.DATABASE_URL:
+            url = urllib.parse.urlparse(config.DATABASE_URL)
+            return ConnectionDescriptor(
+                dialecto=DIALECTO_MYSQL,
+                driver_kwargs=MappingProxyType({
+                    'host': url.hostname,
+                    'port': url.port or 3306,
+                    'user': urllib.parse.unquote(url.username) if url.username else None,
+                    'password': urllib.parse.unquote(url.password) if url.password else None,
+                    'database': url.path[1:],  # Remover el '/' inicial
+                    'ssl': _contexto_ssl(config),
+                    'connect_timeout': config.CONNECTION_TIMEOUT,
+                    'autocommit': False
+                })
+            )
+
+        return ConnectionDescriptor(
+            dialecto=DIALECTO_SQLSERVER,
+            driver_kwargs=MappingProxyType({'autocommit': False, 'timeout': config.CONNECTION_TIMEOUT}),
+            connection_string=get_connection_string(config)
+        )
+
+    def refresh(self, config: DatabaseConfig):
+        """Recalcula el descriptor tras un cambio explícito de configuración"""
+        self.descriptor = self.construir_descriptor(config)
+
+    def connect(self):
+        """Abre una conexión física nueva con el descriptor vigente"""
+        descriptor = self.descriptor
+        if descriptor.es_mysql:
+            import pymysql
+            return pymysql.connect(**descriptor.driver_kwargs)
+
+        import pyodbc
+        return pyodbc.connect(descriptor.connection_string, **descriptor.driver_kwargs)
+
+    def validate(self, conexion):
+        """Verifica que una conexión siga viva antes de prestarla"""
+        if self.descriptor.es_mysql:
+            conexion.ping(reconnect=False)
+            return
+
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+class _ConexionAgrupada:
+    """Conexión física administrada por el pool junto con sus metadatos"""
+
+    __slots__ = ('conexion', 'creada', 'ultimo_uso')
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones a base de datos reutilizables entre requests"""
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 10.0, max_lifetime: float = 1800.0, pre_ping: bool = True,
+                 validate: Optional[Callable[[Any], None]] = None):
+        if max_size < 1:
+            raise ValueError("max_size debe ser al menos 1")
+        self.connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.validate = validate or self._validar_por_defecto
+        self.logger = logging.getLogger(__name__)
+
+        self._inactivas = deque()
+        self._tamano = 0
+        self._en_uso = 0
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self._estadisticas = {
+            'creadas': 0,
+            'descartadas': 0,
+            'prestamos': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'fallos_validacion': 0,
+            'espera_maxima_ms': 0.0
+        }
+
+    @staticmethod
+    def _validar_por_defecto(conexion):
+        cursor = conexion.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def acquire(self) -> _ConexionAgrupada:
+        """Obtiene una conexión del pool, creando una nueva si hay capacidad"""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+
+        while True:
+            entrada = self._reservar(limite)
+
+            if entrada is None:
+                try:
+                    entrada = _ConexionAgrupada(self.connect())
+                except Exception:
+                    with self._cond:
+                        self._tamano -= 1
+                        self._en_uso -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._estadisticas['creadas'] += 1
+            elif self._expirada(entrada) or not self._es_valida(entrada):
+                self._descartar(entrada)
+                continue
+
+            espera_ms = (time.monotonic() - inicio) * 1000
+            with self._cond:
+                self._estadisticas['prestamos'] += 1
+                if espera_ms > self._estadisticas['espera_maxima_ms']:
+                    self._estadisticas['espera_maxima_ms'] = round(espera_ms, 3)
+            return entrada
+
+    def _reservar(self, limite: float) -> Optional[_ConexionAgrupada]:
+        """Reserva un cupo del pool; retorna None si el llamador debe crear la conexión"""
+        with self._cond:
+            espero = False
+            while True:
+                if self._cerrado:
+                    raise RuntimeError("El pool de conexiones está cerrado")
+
+                if self._inactivas:
+                    self._en_uso += 1
+                    return self._inactivas.pop()
+
+                if self._tamano < self.max_size:
+                    self._tamano += 1
+                    self._en_uso += 1
+                    return None
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._estadisticas['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No hay conexiones disponibles tras {self.timeout}s "
+                        f"({self._en_uso}/{self.max_size} en uso)"
+                    )
+
+                if not espero:
+                    self._estadisticas['esperas'] += 1
+                    espero = True
+                self._cond.wait(restante)
+
+    def _expirada(self, entrada: _ConexionAgrupada) -> bool:
+        return self.max_lifetime > 0 and time.monotonic() - entrada.creada > self.max_lifetime
+
+    def _es_valida(self, entrada: _ConexionAgrupada) -> bool:
+        if not self.pre_ping:
+            return True
+        try:
+            self.validate(entrada.conexion)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Conexión del pool descartada por fallo de validación: {e}")
+            with self._cond:
+                self._estadisticas['fallos_validacion'] += 1
+            return False
+
+    def _descartar(self, entrada: _ConexionAgrupada):
+        """Cierra una conexión prestada y libera su cupo en el pool"""
+        try:
+            entrada.conexion.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._tamano -= 1
+            self._en_uso -= 1
+            self._estadisticas['descartadas'] += 1
+            self._cond.notify()
+
+    def release(self, entrada: _ConexionAgrupada, descartar: bool = False):
+        """Devuelve una conexión al pool dejando su transacción limpia"""
+        if not descartar and not self._cerrado and not self._expirada(entrada):
+            try:
+                # Ninguna transacción ni snapshot abierto debe sobrevivir al préstamo
+                entrada.conexion.rollback()
+            except Exception as e:
+                self.logger.warning(f"No se pudo reiniciar la conexión, se descarta: {e}")
+                descartar = True
+        else:
+            descartar = True
+
+        if descartar:
+            self._descartar(entrada)
+            return
+
+        entrada.ultimo_uso = time.monotonic()
+        with self._cond:
+            self._en_uso -= 1
+            self._inactivas.append(entrada)
+            self._cond.notify()
+
+    def prefill(self):
+        """Abre conexiones hasta alcanzar el tamaño mínimo configurado"""
+        entradas = []
+        try:
+            for _ in range(self.min_size):
+                entradas.append(self.acquire())
+        finally:
+            for entrada in entradas:
+                self.release(entrada)
+
+    def close(self):
+        """Cierra todas las conexiones inactivas e impide nuevos préstamos"""
+        with self._cond:
+            self._cerrado = True
+            inactivas = list(self._inactivas)
+            self._inactivas.clear()
+            self._tamano -= len(inactivas)
+            self._cond.notify_all()
+
+        for entrada in inactivas:
+            try:
+                entrada.conexion.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna estadísticas de uso del pool"""
+        with self._cond:
+            return {
+                'tamano': self._tamano,
+                'en_uso': self._en_uso,
+                'inactivas': len(self._inactivas),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._estadisticas
+            }
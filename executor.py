@@ -0,0 +1,159 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+
+class ColaSaturadaError(Exception):
+    """La cola del ejecutor de base de datos alcanzó su límite"""
+
+
+class DatabaseExecutor:
+    """Ejecuta llamadas bloqueantes del repositorio en un pool de hilos dedicado"""
+
+    def __init__(self, max_workers: int = 10, max_cola: int = 200):
+        self.max_workers = max_workers
+        self.max_cola = max_cola
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._en_ejecucion = 0
+        self._estadisticas = {
+            'completadas': 0,
+            'errores': 0,
+            'rechazadas': 0,
+            'espera_maxima_ms': 0.0,
+            'espera_total_ms': 0.0
+        }
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Despacha func al pool de hilos sin bloquear el event loop"""
+        with self._lock:
+            if self._en_cola + self._en_ejecucion >= self.max_workers + self.max_cola:
+                self._estadisticas['rechazadas'] += 1
+                raise ColaSaturadaError(
+                    f"Ejecutor de base de datos saturado ({self._en_cola} llamadas en cola)"
+                )
+            self._en_cola += 1
+
+        loop = asyncio.get_running_loop()
+        # [iniciada, abandonada]: evita fugas del contador si la espera se cancela antes de arrancar
+        control = [False, False]
+        llamada = functools.partial(self._ejecutar, func, args, kwargs, time.monotonic(), control)
+        try:
+            return await loop.run_in_executor(self._executor, llamada)
+        except BaseException:
+            with self._lock:
+                self._estadisticas['errores'] += 1
+                if not control[0]:
+                    control[1] = True
+                    self._en_cola -= 1
+            raise
+
+    def _ejecutar(self, func, args, kwargs, encolada: float, control: list):
+        espera_ms = (time.monotonic() - encolada) * 1000
+        with self._lock:
+            if control[1]:
+                return None
+            control[0] = True
+            self._en_cola -= 1
+            self._en_ejecucion += 1
+            self._estadisticas['espera_total_ms'] += espera_ms
+            if espera_ms > self._estadisticas['espera_maxima_ms']:
+                self._estadisticas['espera_maxima_ms'] = round(espera_ms, 3)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._en_ejecucion -= 1
+                self._estadisticas['completadas'] += 1
+
+    def shutdown(self, wait: bool = True):
+        """Detiene el pool de hilos"""
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna la profundidad de cola y estadísticas de ejecución"""
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+            completadas = estadisticas['completadas']
+            estadisticas['espera_promedio_ms'] = round(estadisticas.pop('espera_total_ms') / completadas, 3) if completadas else 0.0
+            return {
+                'max_workers': self.max_workers,
+                'max_cola': self.max_cola,
+                'en_cola': self._en_cola,
+                'en_ejecucion': self._en_ejecucion,
+                **estadisticas
+            }
+
+
+class CupoExportaciones:
+    """Limita las exportaciones simultáneas; el cupo se libera al terminar o abandonar el stream"""
+
+    def __init__(self, maximo: int = 2):
+        self.maximo = maximo
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self._estadisticas = {
+            'completadas': 0,
+            'rechazadas': 0
+        }
+
+    def tomar(self):
+        """Reserva un cupo o lanza ColaSaturadaError si ya hay maximo exportaciones en curso"""
+        with self._lock:
+            if self._en_curso >= self.maximo:
+                self._estadisticas['rechazadas'] += 1
+                raise ColaSaturadaError(f"Hay {self._en_curso} exportaciones en curso; intente más tarde")
+            self._en_curso += 1
+
+    def liberar(self):
+        with self._lock:
+            self._en_curso -= 1
+            self._estadisticas['completadas'] += 1
+
+    def envolver(self, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Iterador que libera el cupo ya tomado una sola vez: al agotarse, al cerrarse o al descartarse"""
+        return _IteradorConCupo(self, iterable)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'maximo': self.maximo, 'en_curso': self._en_curso, **self._estadisticas}
+
+
+class _IteradorConCupo:
+    # Clase y no generador: un generador que nunca arrancó no ejecuta su finally al cerrarse,
+    # y el stream puede abandonarse antes de pedir el primer bloque
+    def __init__(self, cupo: CupoExportaciones, iterable: Iterable[Any]):
+        self._cupo = cupo
+        self._iterador = iter(iterable)
+        self._liberado = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterador)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._liberado:
+            return
+        self._liberado = True
+        try:
+            cerrar = getattr(self._iterador, 'close', None)
+            if cerrar:
+                cerrar()
+        finally:
+            self._cupo.liberar()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,501 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from executor import ColaSaturadaError
+
+TIPOS_TRABAJO_REPORTE = ('clientes', 'transacciones', 'analitica', 'extracto_transacciones')
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_EN_EJECUCION = 'en_ejecucion'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_FALLIDO = 'fallido'
+
+
+@dataclass
+class TrabajoReporte:
+    """Estado de un trabajo de generación de reporte"""
+    id: str
+    tipo: str
+    formato: str
+    parametros: Dict[str, Any]
+    estado: str = ESTADO_PENDIENTE
+    progreso: int = 0
+    mensaje: str = "En cola"
+    archivo: Optional[str] = None
+    error: Optional[str] = None
+    fecha_creacion: datetime = field(default_factory=datetime.now)
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in (ESTADO_COMPLETADO, ESTADO_FALLIDO)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'formato': self.formato,
+            'estado': self.estado,
+            'progreso': self.progreso,
+            'mensaje': self.mensaje,
+            'archivo': os.path.basename(self.archivo) if self.archivo else None,
+            'error': self.error,
+            'fecha_creacion': self.fecha_creacion.isoformat(),
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
+
+
+# Un trabajo en curso sin latido por este tiempo se da por abandonado (su proceso terminó)
+ABANDONO_SEGUNDOS = 900.0
+LATIDO_SEGUNDOS = 60.0
+# Las actualizaciones de avance se guardan como mucho una vez por este intervalo
+INTERVALO_GUARDADO_SEGUNDOS = 1.0
+
+ESTADOS_EN_CURSO = (ESTADO_PENDIENTE, ESTADO_EN_EJECUCION)
+
+
+class RegistroTrabajos:
+    """Estado de los trabajos de un tipo en la tabla trabajos, consultable desde cualquier worker.
+
+    Un hilo renueva cada LATIDO_SEGUNDOS el estado de los trabajos que corren en este proceso y borra los
+    que superan la retención junto con sus archivos.
+    """
+
+    def __init__(self, repository, tipo: str, retencion_segundos: float = 3600.0):
+        self.repository = repository
+        self.tipo = tipo
+        self.retencion_segundos = retencion_segundos
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._locales: Dict[str, Any] = {}
+        self._ultimo_guardado: Dict[str, float] = {}
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        if self._hilo is not None:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name=f'trabajos-{self.tipo}', daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo.join(timeout=timeout)
+        self._hilo = None
+
+    def guardar(self, trabajo, forzar: bool = True, reiniciar: bool = False):
+        """Guarda el estado de trabajo (id, estado, terminado, to_dict(), archivo); sin forzar se espacia.
+
+        Un trabajo ya terminado en la base no vuelve a estar en curso, salvo con reiniciar (reenvío del mismo id).
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if trabajo.terminado:
+                self._locales.pop(trabajo.id, None)
+                self._ultimo_guardado.pop(trabajo.id, None)
+            else:
+                self._locales[trabajo.id] = trabajo
+                if not forzar and ahora - self._ultimo_guardado.get(trabajo.id, 0.0) < INTERVALO_GUARDADO_SEGUNDOS:
+                    return
+                self._ultimo_guardado[trabajo.id] = ahora
+        # El estado sale de la misma foto que los datos: otro hilo puede finalizar el trabajo entretanto
+        datos = trabajo.to_dict()
+        self.repository.guardar_trabajo(
+            self.tipo, trabajo.id, datos['estado'], datos, getattr(trabajo, 'archivo', None), reiniciar
+        )
+
+    def guardar_avance(self, trabajo, forzar: bool = False):
+        """Como guardar, pero un fallo al escribir el avance no interrumpe el trabajo"""
+        try:
+            self.guardar(trabajo, forzar)
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar el estado del trabajo {trabajo.id}: {e}")
+
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Estado público del trabajo; uno en curso sin latido reciente se informa como fallido"""
+        fila = self.repository.obtener_trabajo(self.tipo, trabajo_id)
+        if fila is None:
+            return None
+        datos = fila['datos']
+        datos['estado'] = fila['estado']
+        limite = datetime.now() - timedelta(seconds=ABANDONO_SEGUNDOS)
+        if fila['estado'] in ESTADOS_EN_CURSO and fila['fecha_actualizacion'] < limite:
+            datos['estado'] = ESTADO_FALLIDO
+            datos['error'] = "El proceso que ejecutaba el trabajo dejó de responder"
+        return datos
+
+    def en_curso(self) -> int:
+        """Trabajos pendientes o en ejecución en todos los workers"""
+        limite = datetime.now() - timedelta(seconds=ABANDONO_SEGUNDOS)
+        return self.repository.contar_trabajos(self.tipo, ESTADOS_EN_CURSO, limite)
+
+    def _ciclo(self):
+        while not self._detener.wait(LATIDO_SEGUNDOS):
+            with self._lock:
+                locales = list(self._locales.values())
+            for trabajo in locales:
+                self.guardar_avance(trabajo, forzar=True)
+            try:
+                self._purgar()
+            except Exception as e:
+                self.logger.error(f"Error al purgar trabajos {self.tipo}: {e}")
+
+    def _purgar(self):
+        """Borra los trabajos vencidos y, si están en este equipo, sus archivos"""
+        limite = datetime.now() - timedelta(seconds=self.retencion_segundos)
+        for archivo in self.repository.purgar_trabajos(self.tipo, limite):
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'en_ejecucion_local': len(self._locales), 'retencion_segundos': self.retencion_segundos}
+
+
+# Estado de cada proceso trabajador: un repositorio propio y la cola de progreso compartida
+_repositorio_proceso = None
+_cola_progreso_proceso = None
+
+
+def _iniciar_proceso(cola_progreso):
+    """Inicializa un proceso trabajador; las conexiones no se comparten entre procesos"""
+    global _repositorio_proceso, _cola_progreso_proceso
+    from config import DatabaseConfig
+    from repository import DatabaseRepository
+
+    _cola_progreso_proceso = cola_progreso
+    _repositorio_proceso = DatabaseRepository(DatabaseConfig())
+
+
+def _informar(trabajo_id: str, progreso: int, mensaje: str):
+    _cola_progreso_proceso.put((trabajo_id, progreso, mensaje))
+
+
+def _avance_filas(trabajo_id: str, total: int, desde: int, hasta: int, mensaje: str):
+    """Callback de filas leídas que reparte el avance entre desde y hasta; informa solo al subir un punto"""
+    ultimo = [desde]
+
+    def informar(filas: int):
+        progreso = desde + (hasta - desde) * min(filas, total) // total if total else hasta
+        if progreso > ultimo[0]:
+            ultimo[0] = progreso
+            _informar(trabajo_id, progreso, f"{mensaje}: {filas} de {total} filas")
+
+    return informar
+
+
+def _generar_reporte(trabajo_id: str, tipo: str, formato: str, parametros: Dict[str, Any], directorio: str) -> str:
+    """Genera y escribe un reporte dentro del proceso trabajador; retorna la ruta del archivo"""
+    from services import ReporteService
+
+    servicio = ReporteService(_repositorio_proceso)
+
+    if tipo == 'extracto_transacciones':
+        # Extracto fila a fila: se escribe directo desde el cursor, sin armar el reporte en memoria
+        _informar(trabajo_id, 1, "Contando filas")
+        total = _repositorio_proceso.contar_transacciones(
+            parametros['fecha_inicio'], parametros['fecha_fin'], parametros.get('cliente_id')
+        )
+        ruta = os.path.join(directorio, f"extracto_transacciones_{trabajo_id}.parquet")
+        servicio.exportar_transacciones_parquet(
+            ruta, parametros['fecha_inicio'], parametros['fecha_fin'], parametros.get('cliente_id'),
+            progreso=_avance_filas(trabajo_id, total, 2, 99, "Escribiendo extracto")
+        )
+        return ruta
+
+    if tipo == 'analitica':
+        _informar(trabajo_id, 1, "Contando filas")
+        total = _repositorio_proceso.contar_transacciones(parametros['fecha_inicio'], parametros['fecha_fin'])
+        reporte = servicio.generar_reporte_analitica(
+            parametros['fecha_inicio'], parametros['fecha_fin'],
+            parametros.get('dimensiones'), parametros.get('ventana', 7),
+            progreso=_avance_filas(trabajo_id, total, 2, 80, "Leyendo transacciones")
+        )
+    else:
+        # Reportes de una sola consulta agregada: no hay filas que recorrer para medir el avance
+        _informar(trabajo_id, 10, "Consultando datos")
+        if tipo == 'clientes':
+            reporte = servicio.generar_reporte_clientes(parametros)
+        else:
+            reporte = servicio.generar_reporte_transacciones(parametros['fecha_inicio'], parametros['fecha_fin'])
+
+    if not reporte:
+        raise RuntimeError("No se pudo generar el reporte; revise el log del servidor")
+
+    _informar(trabajo_id, 90, "Escribiendo archivo")
+    exito, mensaje, ruta = servicio.exportar_reporte(reporte, formato, directorio, nombre=f"reporte_{tipo}_{trabajo_id}")
+    if not exito:
+        raise RuntimeError(mensaje)
+    return ruta
+
+
+class GestorTrabajosReporte:
+    """Cola acotada de trabajos de reporte ejecutados en un pool de procesos.
+
+    El estado se guarda en la tabla trabajos, así que cualquier worker puede informarlo; los archivos quedan
+    en el directorio de reportes, que debe ser compartido si hay varias instancias.
+    """
+
+    def __init__(self, repository, directorio: str, max_workers: int = 2, max_pendientes: int = 20,
+                 retencion_segundos: float = 3600.0):
+        self.directorio = directorio
+        self.max_workers = max_workers
+        self.max_pendientes = max_pendientes
+        self.registro = RegistroTrabajos(repository, 'reporte', retencion_segundos)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Solo los trabajos que corren en este proceso; el resto se consulta en el registro
+        self._trabajos: Dict[str, TrabajoReporte] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cola_progreso = None
+        self._hilo_progreso: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        """Arranca el latido y la purga de trabajos vencidos"""
+        self.registro.iniciar()
+
+    def _asegurar_pool(self):
+        """Crea el pool de procesos con el primer trabajo, no al importar la API"""
+        if self._executor is not None:
+            return
+        # spawn: el proceso API tiene hilos y conexiones abiertas que no deben heredarse con fork
+        contexto = multiprocessing.get_context('spawn')
+        self._cola_progreso = contexto.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=contexto,
+            initializer=_iniciar_proceso,
+            initargs=(self._cola_progreso,)
+        )
+        self._hilo_progreso = threading.Thread(
+            target=self._consumir_progreso, name='reportes-progreso', daemon=True
+        )
+        self._hilo_progreso.start()
+
+    def enviar(self, tipo: str, formato: str, parametros: Dict[str, Any]) -> TrabajoReporte:
+        """Encola un trabajo y retorna su estado inicial"""
+        if tipo not in TIPOS_TRABAJO_REPORTE:
+            raise ValueError(f"Tipo de reporte no soportado: {tipo}")
+
+        pendientes = self.registro.en_curso()
+        if pendientes >= self.max_pendientes:
+            raise ColaSaturadaError(f"Hay {pendientes} reportes en curso; intente más tarde")
+
+        trabajo = TrabajoReporte(id=uuid.uuid4().hex, tipo=tipo, formato=formato.upper(), parametros=parametros)
+        self.registro.guardar(trabajo)
+        with self._lock:
+            self._asegurar_pool()
+            os.makedirs(self.directorio, exist_ok=True)
+            self._trabajos[trabajo.id] = trabajo
+
+        futuro = self._executor.submit(
+            _generar_reporte, trabajo.id, tipo, trabajo.formato, parametros, os.path.abspath(self.directorio)
+        )
+        futuro.add_done_callback(lambda f, trabajo_id=trabajo.id: self._finalizar(trabajo_id, f))
+        self.logger.info(f"Trabajo de reporte encolado: {trabajo.id} ({tipo})")
+        return trabajo
+
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del trabajo según el registro compartido, sin importar qué worker lo ejecuta"""
+        return self.registro.obtener(trabajo_id)
+
+    def _consumir_progreso(self):
+        while True:
+            mensaje = self._cola_progreso.get()
+            if mensaje is None:
+                return
+            trabajo_id, progreso, texto = mensaje
+            with self._lock:
+                trabajo = self._trabajos.get(trabajo_id)
+                if trabajo is None or trabajo.terminado:
+                    continue
+                if trabajo.estado == ESTADO_PENDIENTE:
+                    trabajo.estado = ESTADO_EN_EJECUCION
+                    trabajo.fecha_inicio = datetime.now()
+                trabajo.progreso = max(trabajo.progreso, progreso)
+                trabajo.mensaje = texto
+            self.registro.guardar_avance(trabajo)
+
+    def _finalizar(self, trabajo_id: str, futuro: Future):
+        with self._lock:
+            trabajo = self._trabajos.pop(trabajo_id, None)
+            if trabajo is None:
+                return
+            trabajo.fecha_fin = datetime.now()
+            if futuro.cancelled():
+                trabajo.estado, trabajo.mensaje, trabajo.error = ESTADO_FALLIDO, "Cancelado", "Trabajo cancelado"
+            elif futuro.exception() is not None:
+                error = futuro.exception()
+                trabajo.estado, trabajo.mensaje, trabajo.error = ESTADO_FALLIDO, "Error", str(error)
+                self.logger.error(f"Trabajo de reporte {trabajo_id} falló: {error}")
+            else:
+                trabajo.estado, trabajo.progreso, trabajo.mensaje = ESTADO_COMPLETADO, 100, "Reporte listo"
+                trabajo.archivo = futuro.result()
+        self.registro.guardar_avance(trabajo, forzar=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna la cantidad de trabajos de este proceso por estado"""
+        with self._lock:
+            por_estado = {estado: 0 for estado in ESTADOS_EN_CURSO}
+            for trabajo in self._trabajos.values():
+                por_estado[trabajo.estado] += 1
+            return {'max_workers': self.max_workers, 'max_pendientes': self.max_pendientes,
+                    **por_estado, **self.registro.stats()}
+
+    def shutdown(self):
+        """Detiene el pool de procesos, el hilo de progreso y el latido"""
+        self.registro.detener()
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._cola_progreso.put(None)
+        self._hilo_progreso.join(timeout=5)
+
+
+@dataclass
+class TrabajoTarea:
+    """Estado de una tarea larga ejecutada en un hilo: campañas, reclasificaciones"""
+    id: str
+    tipo: str
+    estado: str = ESTADO_PENDIENTE
+    total: int = 0
+    procesados: int = 0
+    resultado: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    fecha_creacion: datetime = field(default_factory=datetime.now)
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in (ESTADO_COMPLETADO, ESTADO_FALLIDO)
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.estado == ESTADO_COMPLETADO:
+            progreso = 100
+        else:
+            progreso = int(self.procesados * 100 / self.total) if self.total else 0
+        duracion = ((self.fecha_fin or datetime.now()) - self.fecha_inicio).total_seconds() if self.fecha_inicio else 0
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'total': self.total,
+            'procesados': self.procesados,
+            'progreso': progreso,
+            'por_segundo': round(self.procesados / duracion, 1) if duracion else 0.0,
+            'resultado': self.resultado,
+            'error': self.error,
+            'fecha_creacion': self.fecha_creacion.isoformat(),
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
+
+
+class GestorTareas:
+    """Ejecuta de a una, en un hilo aparte del ejecutor de la API, tareas largas que informan su avance.
+
+    El estado se guarda en la tabla trabajos con el tipo indicado, así que cualquier worker puede informarlo.
+    """
+
+    def __init__(self, repository, tipo: str, max_pendientes: int = 5, retencion_segundos: float = 86400.0):
+        self.tipo = tipo
+        self.max_pendientes = max_pendientes
+        self.registro = RegistroTrabajos(repository, tipo, retencion_segundos)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._trabajos: Dict[str, TrabajoTarea] = {}
+        # Un solo hilo: son escrituras masivas y no deben competir entre sí por el pool
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=tipo)
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        """Arranca el latido y la purga de tareas vencidas"""
+        self.registro.iniciar()
+
+    def enviar(self, funcion: Callable[[str, Callable[[int, int], None]], Dict[str, Any]],
+               trabajo_id: Optional[str] = None) -> TrabajoTarea:
+        """Encola funcion(trabajo_id, informar), que retorna el resultado; informar(procesados, total).
+
+        Reenviar el id de una tarea terminada la vuelve a ejecutar; si sigue en curso se rechaza.
+        """
+        if trabajo_id:
+            existente = self.registro.obtener(trabajo_id)
+            if existente is not None and existente['estado'] in ESTADOS_EN_CURSO:
+                raise ValueError(f"El trabajo {trabajo_id} ya está en curso")
+        pendientes = self.registro.en_curso()
+        if pendientes >= self.max_pendientes:
+            raise ColaSaturadaError(f"Hay {pendientes} trabajos de {self.tipo} en curso; intente más tarde")
+
+        trabajo = TrabajoTarea(id=trabajo_id or uuid.uuid4().hex[:12], tipo=self.tipo)
+        self.registro.guardar(trabajo, reiniciar=True)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+
+        futuro = self._executor.submit(self._ejecutar, trabajo, funcion)
+        futuro.add_done_callback(lambda f, trabajo_id=trabajo.id: self._finalizar(trabajo_id, f))
+        self.logger.info(f"Trabajo de {self.tipo} encolado: {trabajo.id}")
+        return trabajo
+
+    def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        return self.registro.obtener(trabajo_id)
+
+    def _ejecutar(self, trabajo: TrabajoTarea, funcion) -> Dict[str, Any]:
+        with self._lock:
+            trabajo.estado = ESTADO_EN_EJECUCION
+            trabajo.fecha_inicio = datetime.now()
+        self.registro.guardar_avance(trabajo, forzar=True)
+
+        def informar(procesados: int, total: int):
+            with self._lock:
+                trabajo.procesados, trabajo.total = procesados, total
+            self.registro.guardar_avance(trabajo)
+            if self._detener.is_set():
+                raise RuntimeError("Trabajo interrumpido por cierre del servidor; reenvíelo para reanudar")
+
+        return funcion(trabajo.id, informar)
+
+    def _finalizar(self, trabajo_id: str, futuro: Future):
+        with self._lock:
+            trabajo = self._trabajos.pop(trabajo_id, None)
+            if trabajo is None:
+                return
+            trabajo.fecha_fin = datetime.now()
+            if futuro.cancelled():
+                trabajo.estado, trabajo.error = ESTADO_FALLIDO, "Trabajo cancelado"
+            elif futuro.exception() is not None:
+                error = futuro.exception()
+                trabajo.estado, trabajo.error = ESTADO_FALLIDO, str(error)
+                self.logger.error(f"Trabajo de {self.tipo} {trabajo_id} falló tras {trabajo.procesados} filas: {error}")
+            else:
+                trabajo.estado, trabajo.resultado = ESTADO_COMPLETADO, futuro.result()
+        self.registro.guardar_avance(trabajo, forzar=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna la cantidad de tareas de este proceso por estado"""
+        with self._lock:
+            por_estado = {estado: 0 for estado in ESTADOS_EN_CURSO}
+            for trabajo in self._trabajos.values():
+                por_estado[trabajo.estado] += 1
+            return {'max_pendientes': self.max_pendientes, **por_estado, **self.registro.stats()}
+
+    def shutdown(self):
+        """Cancela las tareas en cola; la que está en curso se detiene en su próximo aviso de avance"""
+        self._detener.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.registro.detener()
@@ -0,0 +1,387 @@
+import argparse
+import logging
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import db_config
+
+TABLA_VERSION = 'schema_version'
+LOCK_MIGRACIONES = 'casino_schema_migraciones'
+LOCK_TIMEOUT_SEGUNDOS = 60
+
+
+@dataclass(frozen=True)
+class Indice:
+    """Índice secundario; en MySQL las columnas incluidas pasan a ser parte de la clave"""
+    nombre: str
+    tabla: str
+    columnas: Tuple[str, ...]
+    incluidas: Tuple[str, ...] = ()
+
+    def sql_mysql(self) -> str:
+        return f"CREATE INDEX {self.nombre} ON {self.tabla} ({', '.join(self.columnas + self.incluidas)})"
+
+    def sql_sqlserver(self) -> str:
+        sql = f"CREATE INDEX {self.nombre} ON {self.tabla} ({', '.join(self.columnas)})"
+        if self.incluidas:
+            sql += f" INCLUDE ({', '.join(self.incluidas)})"
+        return f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{self.nombre}' AND object_id = OBJECT_ID('{self.tabla}'))
+        {sql}
+        """
+
+
+@dataclass(frozen=True)
+class Tabla:
+    """Tabla nueva con sus columnas en cada dialecto"""
+    nombre: str
+    columnas_mysql: str
+    columnas_sqlserver: str
+
+    def sql_mysql(self) -> str:
+        return f"CREATE TABLE IF NOT EXISTS {self.nombre} ({self.columnas_mysql})"
+
+    def sql_sqlserver(self) -> str:
+        return f"""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{self.nombre}' AND xtype='U')
+        CREATE TABLE {self.nombre} ({self.columnas_sqlserver})
+        """
+
+
+@dataclass(frozen=True)
+class Migracion:
+    """Paso versionado del esquema"""
+    version: int
+    descripcion: str
+    indices: Tuple[Indice, ...] = ()
+    tablas: Tuple[Tabla, ...] = ()
+    # Sentencias de datos válidas en ambos dialectos; se confirman junto con la versión
+    sentencias: Tuple[str, ...] = ()
+
+
+# Índices de las rutas calientes del repositorio. El id final replica el desempate de la paginación por cursor.
+MIGRACIONES: Tuple[Migracion, ...] = (
+    Migracion(1, "Índices para consultas frecuentes de clientes, transacciones, tickets y promociones", (
+        # listar_clientes: filtros por tipo_cliente/activo ordenados por fecha_registro
+        Indice('ix_clientes_tipo_activo_registro', 'clientes', ('tipo_cliente', 'activo', 'fecha_registro', 'id')),
+        Indice('ix_clientes_activo_registro', 'clientes', ('activo', 'fecha_registro', 'id')),
+        Indice('ix_clientes_registro', 'clientes', ('fecha_registro', 'id')),
+        # obtener_transacciones_cliente
+        Indice('ix_transacciones_cliente_fecha', 'transacciones', ('cliente_id', 'fecha', 'id')),
+        # Rangos de fecha: listado general, resumen diario, exportaciones y analítica sin leer la tabla base
+        Indice('ix_transacciones_fecha', 'transacciones', ('fecha',),
+               ('tipo', 'ubicacion', 'monto', 'metodo_pago', 'cliente_id')),
+        # obtener_tickets_abiertos y contar_tickets_abiertos
+        Indice('ix_tickets_estado_prioridad', 'tickets', ('estado', 'prioridad', 'fecha_creacion', 'id')),
+        # obtener_tickets_por_cliente
+        Indice('ix_tickets_cliente_fecha', 'tickets', ('cliente_id', 'fecha_creacion', 'id')),
+        # obtener_promociones_activas
+        Indice('ix_promociones_estado_vigencia', 'promociones', ('estado', 'fecha_fin', 'fecha_inicio'), ('cliente_id',)),
+        Indice('ix_promociones_cliente_estado', 'promociones', ('cliente_id', 'estado', 'fecha_fin')),
+    )),
+    # reservar_bloque_secuencia: los códigos de promoción salen de bloques de esta secuencia
+    Migracion(2, "Tabla de secuencias para la generación de códigos de promoción", tablas=(
+        Tabla('secuencias',
+              "nombre VARCHAR(50) PRIMARY KEY, valor BIGINT NOT NULL",
+              "nombre NVARCHAR(50) PRIMARY KEY, valor BIGINT NOT NULL"),
+    )),
+    # obtener_transacciones_periodo lee los días completos solo del resumen: debe cubrir todo el histórico
+    Migracion(3, "Resumen diario de transacciones reconstruido desde el histórico", tablas=(
+        Tabla('transacciones_resumen_diario',
+              "fecha DATE NOT NULL, tipo VARCHAR(50) NOT NULL, ubicacion VARCHAR(100) NOT NULL DEFAULT '', "
+              "cantidad INT NOT NULL DEFAULT 0, total_monto DECIMAL(18,2) NOT NULL DEFAULT 0, "
+              "monto_minimo DECIMAL(15,2), monto_maximo DECIMAL(15,2), PRIMARY KEY (fecha, tipo, ubicacion)",
+              "fecha DATE NOT NULL, tipo NVARCHAR(50) NOT NULL, ubicacion NVARCHAR(100) NOT NULL DEFAULT '', "
+              "cantidad INTEGER NOT NULL DEFAULT 0, total_monto DECIMAL(18,2) NOT NULL DEFAULT 0, "
+              "monto_minimo DECIMAL(15,2), monto_maximo DECIMAL(15,2), PRIMARY KEY (fecha, tipo, ubicacion)"),
+    ), sentencias=(
+        # Reconstrucción completa: también corrige lo acumulado antes de que existiera esta migración
+        "DELETE FROM transacciones_resumen_diario",
+        """
+        INSERT INTO transacciones_resumen_diario
+            (fecha, tipo, ubicacion, cantidad, total_monto, monto_minimo, monto_maximo)
+        SELECT CAST(fecha AS DATE), tipo, COALESCE(ubicacion, ''),
+               COUNT(*), SUM(monto), MIN(monto), MAX(monto)
+        FROM transacciones
+        GROUP BY CAST(fecha AS DATE), tipo, COALESCE(ubicacion, '')
+        """,
+    )),
+    # Estado de reportes, campañas y reclasificaciones visible desde cualquier worker de la API
+    Migracion(4, "Tabla de estado de trabajos en segundo plano", tablas=(
+        Tabla('trabajos',
+              "tipo VARCHAR(40) NOT NULL, id VARCHAR(64) NOT NULL, estado VARCHAR(20) NOT NULL, datos TEXT, "
+              "archivo VARCHAR(500), fecha_actualizacion DATETIME NOT NULL, PRIMARY KEY (tipo, id)",
+              "tipo NVARCHAR(40) NOT NULL, id NVARCHAR(64) NOT NULL, estado NVARCHAR(20) NOT NULL, "
+              "datos NVARCHAR(MAX), archivo NVARCHAR(500), fecha_actualizacion DATETIME NOT NULL, "
+              "PRIMARY KEY (tipo, id)"),
+    ), indices=(
+        Indice('ix_trabajos_tipo_actualizacion', 'trabajos', ('tipo', 'fecha_actualizacion')),
+    )),
+)
+
+VERSION_ESQUEMA = MIGRACIONES[-1].version
+
+
+@dataclass(frozen=True)
+class ConsultaVerificacion:
+    """Consulta representativa de una ruta caliente y el índice que debería usar"""
+    nombre: str
+    sql: str
+    indice: str
+
+
+def _consultas_verificacion() -> List[ConsultaVerificacion]:
+    """Consultas con literales: SHOWPLAN y EXPLAIN no necesitan ejecutar la sentencia"""
+    ahora = datetime.now().replace(microsecond=0)
+    desde = (ahora - timedelta(days=7)).isoformat(sep=' ')
+    hasta = ahora.isoformat(sep=' ')
+    limite = "LIMIT 50" if db_config.IS_PRODUCTION else "OFFSET 0 ROWS FETCH NEXT 50 ROWS ONLY"
+
+    return [
+        ConsultaVerificacion(
+            'clientes por tipo y estado',
+            f"SELECT id, fecha_registro FROM clientes WHERE tipo_cliente = 'vip' AND activo = 1 "
+            f"ORDER BY fecha_registro DESC, id DESC {limite}",
+            'ix_clientes_tipo_activo_registro'
+        ),
+        ConsultaVerificacion(
+            'clientes activos',
+            f"SELECT id, fecha_registro FROM clientes WHERE activo = 1 ORDER BY fecha_registro DESC, id DESC {limite}",
+            'ix_clientes_activo_registro'
+        ),
+        ConsultaVerificacion(
+            'transacciones de un cliente',
+            f"SELECT id, fecha FROM transacciones WHERE cliente_id = 1 ORDER BY fecha DESC, id DESC {limite}",
+            'ix_transacciones_cliente_fecha'
+        ),
+        ConsultaVerificacion(
+            'transacciones por período',
+            f"SELECT tipo, ubicacion, COUNT(*), SUM(monto) FROM transacciones "
+            f"WHERE fecha >= '{desde}' AND fecha < '{hasta}' GROUP BY tipo, ubicacion",
+            'ix_transacciones_fecha'
+        ),
+        ConsultaVerificacion(
+            'tickets abiertos',
+            "SELECT COUNT(*), COUNT(CASE WHEN prioridad = 'CRITICA' THEN 1 END) FROM tickets "
+            "WHERE estado IN ('abierto', 'en_proceso')",
+            'ix_tickets_estado_prioridad'
+        ),
+        ConsultaVerificacion(
+            'tickets de un cliente',
+            f"SELECT id, fecha_creacion FROM tickets WHERE cliente_id = 1 ORDER BY fecha_creacion DESC, id DESC {limite}",
+            'ix_tickets_cliente_fecha'
+        ),
+        ConsultaVerificacion(
+            'promociones vigentes',
+            f"SELECT id, cliente_id FROM promociones WHERE estado = 'activa' "
+            f"AND fecha_fin >= '{hasta}' AND fecha_inicio <= '{hasta}'",
+            'ix_promociones_estado_vigencia'
+        ),
+        ConsultaVerificacion(
+            'promociones de un cliente',
+            f"SELECT id FROM promociones WHERE cliente_id = 1 AND estado = 'activa' AND fecha_fin >= '{hasta}'",
+            'ix_promociones_cliente_estado'
+        ),
+    ]
+
+
+class GestorMigraciones:
+    """Aplica las migraciones pendientes del esquema y verifica los planes de las rutas calientes"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.logger = logging.getLogger(__name__)
+
+    def version_actual(self) -> int:
+        """Versión aplicada del esquema con una sola consulta; 0 si la tabla de versiones aún no existe.
+
+        Los errores de conexión se propagan: solo una consulta fallida se interpreta como esquema sin versionar.
+        """
+        with self.repository.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT MAX(version) FROM {TABLA_VERSION}")
+                row = cursor.fetchone()
+            except Exception:
+                conn.rollback()
+                return 0
+            return (row[0] or 0) if row else 0
+
+    def esta_al_dia(self) -> bool:
+        """Chequeo barato de arranque: indica si hay que correr el DDL"""
+        return self.version_actual() >= VERSION_ESQUEMA
+
+    def pendientes(self, version: Optional[int] = None) -> List[Migracion]:
+        version = self.version_actual() if version is None else version
+        return [m for m in MIGRACIONES if m.version > version]
+
+    def migrar(self) -> List[int]:
+        """Aplica en orden las migraciones pendientes; retorna las versiones aplicadas"""
+        aplicadas = []
+        with self.repository.get_connection() as conn:
+            cursor = conn.cursor()
+            self._crear_tabla_version(cursor)
+            conn.commit()
+
+            # Varios workers pueden arrancar a la vez: solo uno migra y los demás esperan el lock
+            self._tomar_lock(cursor)
+            try:
+                cursor.execute(f"SELECT MAX(version) FROM {TABLA_VERSION}")
+                version = cursor.fetchone()[0] or 0
+                for migracion in MIGRACIONES:
+                    if migracion.version <= version:
+                        continue
+                    self.logger.info(f"Aplicando migración {migracion.version}: {migracion.descripcion}")
+                    for tabla in migracion.tablas:
+                        cursor.execute(tabla.sql_mysql() if db_config.IS_PRODUCTION else tabla.sql_sqlserver())
+                    for indice in migracion.indices:
+                        self._crear_indice(cursor, indice)
+                    for sentencia in migracion.sentencias:
+                        cursor.execute(sentencia)
+                    cursor.execute(
+                        f"INSERT INTO {TABLA_VERSION} (version, descripcion) VALUES (?, ?)",
+                        (migracion.version, migracion.descripcion)
+                    )
+                    conn.commit()
+                    aplicadas.append(migracion.version)
+            finally:
+                self._liberar_lock(cursor)
+                conn.commit()
+
+        if aplicadas:
+            self.logger.info(f"Esquema migrado a la versión {aplicadas[-1]}")
+        return aplicadas
+
+    def _crear_tabla_version(self, cursor):
+        if db_config.IS_PRODUCTION:
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLA_VERSION} (
+                version INT PRIMARY KEY,
+                descripcion VARCHAR(255) NOT NULL,
+                fecha_aplicacion DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+        else:
+            cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{TABLA_VERSION}' AND xtype='U')
+            CREATE TABLE {TABLA_VERSION} (
+                version INTEGER PRIMARY KEY,
+                descripcion NVARCHAR(255) NOT NULL,
+                fecha_aplicacion DATETIME DEFAULT GETDATE()
+            )
+            """)
+
+    def _crear_indice(self, cursor, indice: Indice):
+        """Crea el índice si no existe; en MySQL el DDL confirma implícitamente, así que debe ser repetible"""
+        if db_config.IS_PRODUCTION:
+            cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND INDEX_NAME = ?
+            """, (indice.tabla, indice.nombre))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(indice.sql_mysql())
+        else:
+            cursor.execute(indice.sql_sqlserver())
+
+    def _tomar_lock(self, cursor):
+        if db_config.IS_PRODUCTION:
+            cursor.execute("SELECT GET_LOCK(?, ?)", (LOCK_MIGRACIONES, LOCK_TIMEOUT_SEGUNDOS))
+            obtenido = cursor.fetchone()[0] == 1
+        else:
+            cursor.execute("""
+            SET NOCOUNT ON;
+            DECLARE @resultado INT;
+            EXEC @resultado = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                            @LockOwner = 'Session', @LockTimeout = ?;
+            SELECT @resultado;
+            """, (LOCK_MIGRACIONES, LOCK_TIMEOUT_SEGUNDOS * 1000))
+            obtenido = cursor.fetchone()[0] >= 0
+        if not obtenido:
+            raise RuntimeError("No se obtuvo el lock de migraciones; otra instancia está migrando el esquema")
+
+    def _liberar_lock(self, cursor):
+        try:
+            if db_config.IS_PRODUCTION:
+                cursor.execute("SELECT RELEASE_LOCK(?)", (LOCK_MIGRACIONES,))
+                cursor.fetchone()
+            else:
+                cursor.execute("EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'", (LOCK_MIGRACIONES,))
+        except Exception as e:
+            self.logger.warning(f"No se pudo liberar el lock de migraciones: {e}")
+
+    def verificar(self) -> List[Dict[str, Any]]:
+        """Obtiene el plan de cada ruta caliente e indica si usa el índice esperado"""
+        resultados = []
+        with self.repository.get_connection() as conn:
+            cursor = conn.cursor()
+            for consulta in _consultas_verificacion():
+                if db_config.IS_PRODUCTION:
+                    indices = self._indices_explain_mysql(cursor, consulta.sql)
+                else:
+                    indices = self._indices_showplan_sqlserver(cursor, consulta.sql)
+                resultados.append({
+                    'consulta': consulta.nombre,
+                    'indice_esperado': consulta.indice,
+                    'indices_usados': sorted(indices),
+                    'ok': consulta.indice in indices
+                })
+        return resultados
+
+    @staticmethod
+    def _indices_explain_mysql(cursor, sql: str) -> set:
+        cursor.execute(f"EXPLAIN {sql}")
+        columnas = [d[0] for d in cursor.description]
+        posicion = columnas.index('key')
+        return {row[posicion] for row in cursor.fetchall() if row[posicion]}
+
+    @staticmethod
+    def _indices_showplan_sqlserver(cursor, sql: str) -> set:
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(sql)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+        return set(re.findall(r'Index="\[([^\]]+)\]"', plan))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migraciones versionadas del esquema del casino")
+    parser.add_argument('comando', choices=('migrar', 'estado', 'verificar'),
+                        help="migrar: aplica lo pendiente; estado: muestra la versión; verificar: revisa planes con EXPLAIN")
+    args = parser.parse_args(argv)
+
+    from repository import DatabaseRepository, DatabaseConfig
+
+    repo = DatabaseRepository(DatabaseConfig())
+    gestor = GestorMigraciones(repo)
+    try:
+        if args.comando == 'migrar':
+            # Crea las tablas base si faltan y luego aplica las migraciones pendientes
+            aplicadas = repo.initialize_database()
+            print(f"Migraciones aplicadas: {aplicadas}" if aplicadas else "El esquema ya está al día")
+            return 0
+
+        if args.comando == 'estado':
+            version = gestor.version_actual()
+            print(f"Versión del esquema: {version} (última disponible: {VERSION_ESQUEMA})")
+            for migracion in gestor.pendientes(version):
+                print(f"  pendiente {migracion.version}: {migracion.descripcion}")
+            return 0
+
+        resultados = gestor.verificar()
+        for resultado in resultados:
+            marca = "OK " if resultado['ok'] else "FALLA"
+            usados = ', '.join(resultado['indices_usados']) or 'ninguno (scan)'
+            print(f"[{marca}] {resultado['consulta']}: esperado {resultado['indice_esperado']}, usa {usados}")
+        # En tablas casi vacías el optimizador puede preferir un scan aunque el índice exista
+        return 0 if all(r['ok'] for r in resultados) else 1
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,6 @@ from dataclasses import dataclass, field
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from enum import Enum
-import uuid
 
 class TipoCliente(Enum):
     """Tipos de cliente del casino"""
@@ -52,8 +51,29 @@ class TipoTransaccion(Enum):
     CANJE_PROMOCION = "canje_promocion"
     RETIRO = "retiro"
 
+class _ComportamientoCliente:
+    """Propiedades derivadas compartidas por Cliente y su variante de lectura"""
+    __slots__ = ()
+    
+    @property
+    def nombre_completo(self) -> str:
+        return f"{self.nombres} {self.apellidos}".strip()
+    
+    @property
+    def edad(self) -> Optional[int]:
+        if self.fecha_nacimiento:
+            today = date.today()
+            return today.year - self.fecha_nacimiento.year - ((today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day))
+        return None
+    
+    def es_cliente_frecuente(self, min_visitas: int = 10) -> bool:
+        return self.total_visitas >= min_visitas
+    
+    def puede_recibir_promocion(self) -> bool:
+        return self.activo and self.tipo_cliente != TipoCliente.INACTIVO
+
 @dataclass
-class Cliente:
+class Cliente(_ComportamientoCliente):
     """Modelo de datos para clientes del casino"""
     id: Optional[int] = None
     numero_documento: str = ""
@@ -79,29 +99,27 @@ class Cliente:
     def __post_init__(self):
         if self.fecha_nacimiento and isinstance(self.fecha_nacimiento, str):
             self.fecha_nacimiento = datetime.strptime(self.fecha_nacimiento, '%Y-%m-%d').date()
+
+class _ComportamientoPromocion:
+    """Propiedades derivadas compartidas por Promocion y su variante de lectura"""
+    __slots__ = ()
     
     @property
-    def nombre_completo(self) -> str:
-        return f"{self.nombres} {self.apellidos}".strip()
+    def esta_vigente(self) -> bool:
+        now = datetime.now()
+        return self.fecha_inicio <= now <= self.fecha_fin
     
     @property
-    def edad(self) -> Optional[int]:
-        if self.fecha_nacimiento:
-            today = date.today()
-            return today.year - self.fecha_nacimiento.year - ((today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day))
-        return None
-    
-    def es_cliente_frecuente(self, min_visitas: int = 10) -> bool:
-        return self.total_visitas >= min_visitas
-    
-    def puede_recibir_promocion(self) -> bool:
-        return self.activo and self.tipo_cliente != TipoCliente.INACTIVO
+    def puede_canjearse(self) -> bool:
+        return (self.estado == EstadoPromocion.ACTIVA and 
+                self.esta_vigente and 
+                self.usos_actuales < self.usos_maximos)
 
 @dataclass
-class Promocion:
+class Promocion(_ComportamientoPromocion):
     """Modelo de datos para promociones"""
     id: Optional[int] = None
-    codigo: str = field(default_factory=lambda: str(uuid.uuid4())[:8].upper())
+    codigo: str = ""  # Vacío: el repositorio asigna uno del generador de códigos al insertar
     titulo: str = ""
     descripcion: str = ""
     tipo: TipoPromocion = TipoPromocion.DESCUENTO
@@ -117,17 +135,6 @@ class Promocion:
     fecha_creacion: datetime = field(default_factory=datetime.now)
     creado_por: Optional[str] = None
     
-    @property
-    def esta_vigente(self) -> bool:
-        now = datetime.now()
-        return self.fecha_inicio <= now <= self.fecha_fin
-    
-    @property
-    def puede_canjearse(self) -> bool:
-        return (self.estado == EstadoPromocion.ACTIVA and 
-                self.esta_vigente and 
-                self.usos_actuales < self.usos_maximos)
-    
     def canjear(self) -> bool:
         if self.puede_canjearse:
             self.usos_actuales += 1
@@ -159,8 +166,21 @@ class Transaccion:
             return int(self.monto * puntos_por_peso)
         return 0
 
+class _ComportamientoTicket:
+    """Propiedades derivadas compartidas por Ticket y sus variantes de lectura"""
+    __slots__ = ()
+    
+    @property
+    def esta_abierto(self) -> bool:
+        return self.estado in [EstadoTicket.ABIERTO, EstadoTicket.EN_PROCESO]
+    
+    @property
+    def tiempo_transcurrido_horas(self) -> float:
+        delta = datetime.now() - self.fecha_creacion
+        return delta.total_seconds() / 3600
+
 @dataclass
-class Ticket:
+class Ticket(_ComportamientoTicket):
     """Modelo de datos para tickets de atención al cliente"""
     id: Optional[int] = None
     numero_ticket: str = field(default_factory=lambda: f"TK{datetime.now().strftime('%Y%m%d%H%M%S')}")
@@ -204,15 +224,124 @@ class Ticket:
             self.tiempo_resolucion_horas = delta.total_seconds() / 3600
         
         self.agregar_seguimiento(f"Ticket resuelto: {resolucion}", usuario)
+
+@dataclass(slots=True)
+class ClienteResumen:
+    """Proyección de cliente para listados: solo las columnas que se serializan"""
+    id: int
+    numero_documento: str
+    nombres: str
+    apellidos: str
+    email: str
+    tipo_cliente: TipoCliente
+    fecha_registro: datetime
+    total_visitas: int = 0
+    total_gastado: float = 0.0
+    saldo: float = 0.0
+    puntos_acumulados: int = 0
+    activo: bool = True
     
     @property
-    def esta_abierto(self) -> bool:
-        return self.estado in [EstadoTicket.ABIERTO, EstadoTicket.EN_PROCESO]
-    
-    @property
-    def tiempo_transcurrido_horas(self) -> float:
-        delta = datetime.now() - self.fecha_creacion
-        return delta.total_seconds() / 3600
+    def nombre_completo(self) -> str:
+        return f"{self.nombres} {self.apellidos}".strip()
+
+@dataclass(slots=True)
+class TicketResumen(_ComportamientoTicket):
+    """Proyección de ticket para listados: sin descripción, resolución ni seguimientos"""
+    id: int
+    numero_ticket: str
+    cliente_id: int
+    tipo: TipoTicket
+    estado: EstadoTicket
+    prioridad: str
+    asunto: str
+    fecha_creacion: datetime
+    asignado_a: Optional[str] = None
+
+# Variantes de solo lectura para listados y reportes: sin __dict__, sin default_factory
+# ni __post_init__; los campos siguen el orden de las proyecciones del repositorio
+@dataclass(slots=True)
+class ClienteLectura(_ComportamientoCliente):
+    """Cliente hidratado desde una fila, para listados"""
+    id: int
+    numero_documento: str
+    tipo_documento: str
+    nombres: str
+    apellidos: str
+    email: str
+    telefono: str
+    fecha_nacimiento: Optional[date]
+    direccion: str
+    ciudad: str
+    tipo_cliente: TipoCliente
+    fecha_registro: datetime
+    fecha_ultima_visita: Optional[datetime]
+    total_visitas: int
+    total_gastado: float
+    saldo: float
+    puntos_acumulados: int
+    activo: bool
+    preferencias: Dict[str, Any]
+    notas: str
+
+@dataclass(slots=True)
+class PromocionLectura(_ComportamientoPromocion):
+    """Promoción hidratada desde una fila, para listados"""
+    id: int
+    codigo: str
+    titulo: str
+    descripcion: str
+    tipo: TipoPromocion
+    valor: float
+    fecha_inicio: datetime
+    fecha_fin: datetime
+    estado: EstadoPromocion
+    cliente_id: Optional[int]
+    usos_maximos: int
+    usos_actuales: int
+    condiciones: str
+    qr_code: Optional[str]
+    fecha_creacion: datetime
+    creado_por: Optional[str]
+
+@dataclass(slots=True)
+class TransaccionLectura:
+    """Transacción hidratada desde una fila, para listados"""
+    id: int
+    cliente_id: int
+    tipo: TipoTransaccion
+    monto: float
+    descripcion: str
+    fecha: datetime
+    ubicacion: str
+    promocion_id: Optional[int]
+    puntos_ganados: int
+    metodo_pago: str
+    numero_referencia: Optional[str]
+    empleado_id: Optional[int]
+    notas: str
+
+@dataclass(slots=True)
+class TicketLectura(_ComportamientoTicket):
+    """Ticket hidratado desde una fila, para listados"""
+    id: int
+    numero_ticket: str
+    cliente_id: int
+    tipo: TipoTicket
+    estado: EstadoTicket
+    prioridad: str
+    asunto: str
+    descripcion: str
+    fecha_creacion: datetime
+    fecha_actualizacion: datetime
+    fecha_resolucion: Optional[datetime]
+    asignado_a: Optional[str]
+    categoria: str
+    subcategoria: str
+    resolucion: str
+    satisfaccion_cliente: Optional[int]
+    tiempo_resolucion_horas: Optional[float]
+    seguimientos: List[Dict[str, Any]]
 
 @dataclass
 class Empleado:
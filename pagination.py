@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+
+def codificar_cursor(*valores: Any) -> str:
+    """Codifica la clave de orden del último elemento de una página como cursor opaco"""
+    serializables = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    crudo = json.dumps(serializables, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: Optional[str], tipos: Sequence[type]) -> Optional[Tuple[Any, ...]]:
+    """Decodifica un cursor validando que coincida con la clave de orden esperada.
+
+    Las fechas pueden venir nulas: el último elemento de la página puede no tener fecha en la base.
+    """
+    if not cursor:
+        return None
+
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+    if not isinstance(valores, list) or len(valores) != len(tipos):
+        raise ValueError("Cursor inválido: estructura inesperada")
+
+    resultado = []
+    for valor, tipo in zip(valores, tipos):
+        if tipo is datetime and (valor is None or isinstance(valor, str)):
+            resultado.append(datetime.fromisoformat(valor) if valor is not None else None)
+        elif tipo is int and isinstance(valor, int) and not isinstance(valor, bool):
+            resultado.append(valor)
+        else:
+            raise ValueError("Cursor inválido: tipo de valor inesperado")
+    return tuple(resultado)
@@ -0,0 +1,43 @@
+import argparse
+
+from config import CasinoConfig
+from repository import DatabaseRepository, DatabaseConfig
+from services import ClienteService
+
+
+def reclasificar_clientes(tamano_lote: int = 5000):
+    config = DatabaseConfig()
+    repo = DatabaseRepository(config)
+    casino_config = CasinoConfig()
+    servicio = ClienteService(repo, casino_config)
+
+    print(f"Reclasificando clientes (VIP >= {casino_config.umbral_vip}, frecuente >= {casino_config.umbral_frecuente} "
+          f"visitas, regular >= {casino_config.umbral_regular} visitas)...")
+
+    try:
+        def informar(recorridos: int, total: int):
+            print(f"  {recorridos} de {total} ids recorridos", end='\r', flush=True)
+
+        exito, mensaje, resultado = servicio.reclasificar_clientes(tamano_lote, informar)
+        print()
+        if not exito:
+            print(f"Error al reclasificar clientes: {mensaje}")
+            return
+
+        for cambio in resultado['cambios']:
+            print(f"  cliente {cambio['cliente_id']}: {cambio['tipo_anterior']} -> {cambio['tipo_nuevo']}")
+        if resultado['cambios_omitidos']:
+            print(f"  ... y {resultado['cambios_omitidos']} cambios más")
+        for tipo, cantidad in resultado['por_tipo_nuevo'].items():
+            print(f"  {tipo}: {cantidad}")
+        print(f"{mensaje}; promociones automáticas creadas: {resultado['promociones_creadas']}")
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula el tipo de todos los clientes con los umbrales de CasinoConfig")
+    parser.add_argument('--tamano-lote', type=int, default=5000, help="Clientes (rango de ids) por transacción")
+    args = parser.parse_args()
+
+    reclasificar_clientes(max(1, args.tamano_lote))
@@ -1,69 +1,377 @@
+import json
 import logging
+import threading
 from contextlib import contextmanager
-from typing import List, Optional, Dict, Any
-from datetime import datetime, date
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Union, Callable
+from datetime import datetime, date, timedelta
 from models import (
-    Cliente, Promocion, Transaccion, Ticket, Empleado, Reporte,
+    Cliente, Promocion, Transaccion, Ticket, Empleado, Reporte, ClienteResumen, TicketResumen,
+    ClienteLectura, PromocionLectura, TransaccionLectura, TicketLectura,
     TipoCliente, EstadoPromocion, TipoPromocion, EstadoTicket, TipoTicket, TipoTransaccion
 )
-from config import DatabaseConfig, get_connection_string, db_config
+from config import DatabaseConfig, db_config, recargar_entorno
+from database import ConnectionPool, ConnectionFactory
+from cache import CacheClientes
+from codes import GeneradorCodigos
+from migrations import GestorMigraciones
 
-# Importar el driver apropiado según el entorno
-if db_config.IS_PRODUCTION:
-    import pymysql
-    pymysql.install_as_MySQLdb()
-else:
-    import pyodbc
+SECUENCIA_CODIGOS_PROMOCION = 'codigos_promocion'
+
+# Proyecciones explícitas: el mapeo de filas se hace por nombre de columna, no por posición
+COLUMNAS_CLIENTE = (
+    'id', 'numero_documento', 'tipo_documento', 'nombres', 'apellidos', 'email', 'telefono',
+    'fecha_nacimiento', 'direccion', 'ciudad', 'tipo_cliente', 'fecha_registro',
+    'fecha_ultima_visita', 'total_visitas', 'total_gastado', 'saldo', 'puntos_acumulados',
+    'activo', 'preferencias', 'notas'
+)
+# Columnas que PUT /clientes/{id} puede modificar; el resto solo cambia con operaciones atómicas propias
+COLUMNAS_EDITABLES_CLIENTE = ('nombres', 'apellidos', 'email', 'telefono', 'direccion', 'ciudad', 'activo', 'notas')
+COLUMNAS_CLIENTE_RESUMEN = (
+    'id', 'numero_documento', 'nombres', 'apellidos', 'email', 'tipo_cliente', 'fecha_registro',
+    'total_visitas', 'total_gastado', 'saldo', 'puntos_acumulados', 'activo'
+)
+COLUMNAS_PROMOCION = (
+    'id', 'codigo', 'titulo', 'descripcion', 'tipo', 'valor', 'fecha_inicio', 'fecha_fin',
+    'estado', 'cliente_id', 'usos_maximos', 'usos_actuales', 'condiciones', 'qr_code',
+    'fecha_creacion', 'creado_por'
+)
+COLUMNAS_TRANSACCION = (
+    'id', 'cliente_id', 'tipo', 'monto', 'descripcion', 'fecha', 'ubicacion', 'promocion_id',
+    'puntos_ganados', 'metodo_pago', 'numero_referencia', 'empleado_id', 'notas'
+)
+COLUMNAS_TICKET = (
+    'id', 'numero_ticket', 'cliente_id', 'tipo', 'estado', 'prioridad', 'asunto', 'descripcion',
+    'fecha_creacion', 'fecha_actualizacion', 'fecha_resolucion', 'asignado_a', 'categoria',
+    'subcategoria', 'resolucion', 'satisfaccion_cliente', 'tiempo_resolucion_horas', 'seguimientos'
+)
+COLUMNAS_TICKET_RESUMEN = (
+    'id', 'numero_ticket', 'cliente_id', 'tipo', 'estado', 'prioridad', 'asunto',
+    'fecha_creacion', 'asignado_a'
+)
+
+def _proyeccion(columnas: Tuple[str, ...]) -> str:
+    """Lista de columnas para la cláusula SELECT"""
+    return ", ".join(columnas)
+
+def _despues_de(columna: str, valor: Optional[datetime], id_: int, descendente: bool = True) -> Tuple[str, list]:
+    """Condición de paginación por (columna, id) cuando columna admite NULL.
+    
+    Ambos motores ordenan NULL como el menor valor: al final en DESC y al principio en ASC.
+    """
+    if descendente:
+        if valor is None:
+            return f"({columna} IS NULL AND id < ?)", [id_]
+        return f"({columna} < ? OR ({columna} = ? AND id < ?) OR {columna} IS NULL)", [valor, valor, id_]
+    if valor is None:
+        return f"(({columna} IS NULL AND id > ?) OR {columna} IS NOT NULL)", [id_]
+    return f"({columna} > ? OR ({columna} = ? AND id > ?))", [valor, valor, id_]
+
+def _cargar_json(valor, vacio):
+    """Decodifica una columna JSON; retorna vacio si no hay valor o no es JSON válido"""
+    if not valor or not isinstance(valor, str):
+        return vacio
+    try:
+        return json.loads(valor)
+    except ValueError:
+        return vacio
+
+# Búsqueda directa de enums al hidratar listados, sin pasar por EnumMeta.__call__
+_TIPOS_CLIENTE = {t.value: t for t in TipoCliente}
+_TIPOS_PROMOCION = {t.value: t for t in TipoPromocion}
+_ESTADOS_PROMOCION = {e.value: e for e in EstadoPromocion}
+_TIPOS_TRANSACCION = {t.value: t for t in TipoTransaccion}
+_TIPOS_TICKET = {t.value: t for t in TipoTicket}
+_ESTADOS_TICKET = {e.value: e for e in EstadoTicket}
+
+# Columnas publicadas por las exportaciones masivas
+COLUMNAS_EXPORTACION_CLIENTES = (
+    'id', 'numero_documento', 'tipo_documento', 'nombres', 'apellidos', 'email', 'telefono',
+    'ciudad', 'tipo_cliente', 'fecha_registro', 'fecha_ultima_visita', 'total_visitas',
+    'total_gastado', 'saldo', 'puntos_acumulados', 'activo'
+)
+COLUMNAS_EXPORTACION_TRANSACCIONES = (
+    'id', 'cliente_id', 'tipo', 'monto', 'descripcion', 'fecha', 'ubicacion', 'promocion_id',
+    'puntos_ganados', 'metodo_pago', 'numero_referencia', 'empleado_id'
+)
+
+# Orden de atención de los tickets según su prioridad
+ORDEN_PRIORIDAD_TICKET = {'CRITICA': 1, 'ALTA': 2, 'MEDIA': 3, 'BAJA': 4}
+
+def orden_prioridad_ticket(prioridad: Optional[str]) -> int:
+    """Posición de atención de una prioridad, sin distinguir mayúsculas, como el CASE de las consultas"""
+    return ORDEN_PRIORIDAD_TICKET.get((prioridad or '').upper(), 5)
+
+class TransaccionAbortadaError(Exception):
+    """La unidad de trabajo se revirtió porque una de sus operaciones falló"""
+
+class CanjeRechazadoError(Exception):
+    """El canje de una promoción no procede; el mensaje indica el motivo"""
+
+class _ConexionUnidadDeTrabajo:
+    """Conexión compartida por una unidad de trabajo: commit y rollback se difieren al cierre"""
+    
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self.fallida = False
+        self.al_confirmar = []
+    
+    def commit(self):
+        # El commit real lo hace la unidad de trabajo al terminar
+        pass
+    
+    def rollback(self):
+        self.fallida = True
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
 
 class DatabaseRepository:
     """Repositorio principal para operaciones de base de datos del casino"""
     
     def __init__(self, config: DatabaseConfig):
         self.config = config
-        self.connection_string = get_connection_string()
         self.logger = logging.getLogger(__name__)
+        self.connection_factory = ConnectionFactory(config)
+        self.pool = self._crear_pool()
+        self.pool_exportaciones = self._crear_pool(config.EXPORT_POOL_SIZE, min_size=0)
+        self.cache_clientes = CacheClientes(config.CLIENT_CACHE_SIZE, config.CLIENT_CACHE_TTL)
+        self.generador_codigos = GeneradorCodigos(
+            lambda cantidad: self.reservar_bloque_secuencia(SECUENCIA_CODIGOS_PROMOCION, cantidad),
+            config.PROMO_CODE_KEY,
+            tamano_bloque=config.PROMO_CODE_BLOCK_SIZE
+        )
+        self._local = threading.local()
+    
+    def _crear_pool(self, max_size: Optional[int] = None, min_size: Optional[int] = None) -> ConnectionPool:
+        """Crea un pool de conexiones sobre la fábrica de conexiones; por defecto con el tamaño configurado"""
+        return ConnectionPool(
+            self.connection_factory.connect,
+            min_size=self.config.POOL_MIN_SIZE if min_size is None else min_size,
+            max_size=max_size or self.config.POOL_MAX_SIZE,
+            timeout=self.config.POOL_TIMEOUT,
+            max_lifetime=self.config.POOL_MAX_LIFETIME,
+            pre_ping=self.config.POOL_PRE_PING,
+            validate=self.connection_factory.validate
+        )
+    
+    def refresh_config(self, config: Optional[DatabaseConfig] = None):
+        """Reemplaza la configuración de conexión y los pools; sin config vuelve a leer .env y el entorno.
+        
+        El dialecto de las consultas se fija al importar: cambiar entre MySQL y SQL Server requiere reiniciar.
+        """
+        if config is None:
+            recargar_entorno()
+            config = DatabaseConfig()
+        self.config = config
+        self.connection_factory.refresh(self.config)
+        pool_anterior, exportaciones_anterior = self.pool, self.pool_exportaciones
+        self.pool = self._crear_pool()
+        self.pool_exportaciones = self._crear_pool(self.config.EXPORT_POOL_SIZE, min_size=0)
+        pool_anterior.close()
+        exportaciones_anterior.close()
+        self.cache_clientes.invalidar()
+        self.logger.info(f"Configuración de conexión recargada (dialecto: {self.connection_factory.descriptor.dialecto})")
         
     @contextmanager
     def get_connection(self):
-        """Context manager para conexiones de base de datos"""
-        conn = None
+        """Context manager que presta una conexión del pool"""
+        unidad = getattr(self._local, 'unidad', None)
+        if unidad is not None:
+            # Dentro de una unidad de trabajo todas las operaciones comparten conexión
+            try:
+                yield unidad
+            except Exception as e:
+                unidad.fallida = True
+                self.logger.error(f"Error de conexión a base de datos: {e}")
+                raise
+            return
+        
+        entrada = None
+        pool = self.pool
         try:
-            if db_config.IS_PRODUCTION:
-                # Usar pymysql para MySQL/PlanetScale
-                import pymysql
-                conn = pymysql.connect(
-                    host=self._parse_mysql_url()['host'],
-                    user=self._parse_mysql_url()['user'],
-                    password=self._parse_mysql_url()['password'],
-                    database=self._parse_mysql_url()['database'],
-                    port=self._parse_mysql_url()['port'],
-                    ssl={'ssl_disabled': False},
-                    autocommit=False
-                )
-            else:
-                # Usar pyodbc para SQL Server local
-                conn = pyodbc.connect(self.connection_string)
-            yield conn
+            entrada = pool.acquire()
+            yield entrada.conexion
         except Exception as e:
-            if conn:
-                conn.rollback()
+            if entrada:
+                try:
+                    entrada.conexion.rollback()
+                except Exception:
+                    pass
             self.logger.error(f"Error de conexión a base de datos: {e}")
             raise
         finally:
-            if conn:
-                conn.close()
+            if entrada:
+                pool.release(entrada)
     
-    def _parse_mysql_url(self) -> dict:
-        """Parsea la URL de MySQL para extraer componentes"""
-        import urllib.parse as urlparse
-        url = urlparse.urlparse(self.connection_string)
-        return {
-            'host': url.hostname,
-            'port': url.port or 3306,
-            'user': url.username,
-            'password': url.password,
-            'database': url.path[1:]  # Remover el '/' inicial
-        }
+    @contextmanager
+    def unidad_de_trabajo(self):
+        """Ejecuta varias operaciones del repositorio en una sola conexión y un único commit"""
+        unidad = getattr(self._local, 'unidad', None)
+        if unidad is not None:
+            # Una unidad anidada se suma a la transacción exterior
+            try:
+                yield unidad
+            except Exception:
+                unidad.fallida = True
+                raise
+            return
+        
+        pool = self.pool
+        entrada = pool.acquire()
+        unidad = _ConexionUnidadDeTrabajo(entrada.conexion)
+        self._local.unidad = unidad
+        try:
+            yield unidad
+            if unidad.fallida:
+                raise TransaccionAbortadaError("Una operación de la unidad de trabajo falló; cambios revertidos")
+            entrada.conexion.commit()
+        except Exception:
+            try:
+                entrada.conexion.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._local.unidad = None
+            pool.release(entrada)
+        
+        for accion in unidad.al_confirmar:
+            accion()
+    
+    def _en_unidad_de_trabajo(self) -> bool:
+        return getattr(self._local, 'unidad', None) is not None
+    
+    def _invalidar_cliente_cache(self, cliente_id: Optional[int] = None, numero_documento: Optional[str] = None):
+        """Invalida el cliente en caché ahora y, dentro de una unidad de trabajo, otra vez tras el commit"""
+        self.cache_clientes.invalidar(cliente_id, numero_documento)
+        unidad = getattr(self._local, 'unidad', None)
+        if unidad is not None:
+            # Una lectura concurrente previa al commit pudo volver a guardar el valor anterior
+            unidad.al_confirmar.append(lambda: self.cache_clientes.invalidar(cliente_id, numero_documento))
+    
+    def _tras_commit(self, accion):
+        """Ejecuta la acción ahora o, dentro de una unidad de trabajo, cuando esta confirme"""
+        unidad = getattr(self._local, 'unidad', None)
+        if unidad is None:
+            accion()
+        else:
+            unidad.al_confirmar.append(accion)
+    
+    def obtener_estadisticas_cache_clientes(self) -> Dict[str, Any]:
+        """Retorna estadísticas de la caché de clientes"""
+        return self.cache_clientes.stats()
+    
+    def obtener_estadisticas_generador_codigos(self) -> Dict[str, Any]:
+        """Retorna estadísticas del generador de códigos de promoción"""
+        return self.generador_codigos.stats()
+    
+    def reservar_bloque_secuencia(self, nombre: str, cantidad: int) -> int:
+        """Avanza la secuencia en cantidad con una sentencia atómica y retorna el primer valor del bloque.
+        
+        Usa una conexión propia y confirma de inmediato, aun dentro de una unidad de trabajo: un bloque ya
+        entregado no debe volver a la secuencia si la operación que lo pidió se revierte.
+        """
+        pool = self.pool
+        entrada = pool.acquire()
+        conn = entrada.conexion
+        try:
+            cursor = conn.cursor()
+            for _ in range(2):
+                if db_config.IS_PRODUCTION:
+                    cursor.execute(
+                        "UPDATE secuencias SET valor = LAST_INSERT_ID(valor + ?) WHERE nombre = ?", (cantidad, nombre)
+                    )
+                    fin = None
+                    if cursor.rowcount:
+                        cursor.execute("SELECT LAST_INSERT_ID()")
+                        fin = cursor.fetchone()[0]
+                else:
+                    cursor.execute(
+                        "UPDATE secuencias SET valor = valor + ? OUTPUT inserted.valor WHERE nombre = ?", (cantidad, nombre)
+                    )
+                    row = cursor.fetchone()
+                    fin = row[0] if row else None
+                
+                if fin is not None:
+                    conn.commit()
+                    return fin - cantidad
+                
+                # Primera reserva de la secuencia; si otra instancia la crea a la vez, el reintento la encuentra
+                try:
+                    cursor.execute("INSERT INTO secuencias (nombre, valor) VALUES (?, 0)", (nombre,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+            raise RuntimeError(f"No se pudo reservar un bloque de la secuencia {nombre}")
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.logger.error(f"Error al reservar bloque de la secuencia {nombre}: {e}")
+            raise
+        finally:
+            pool.release(entrada)
+    
+    @contextmanager
+    def lock_exclusivo(self, nombre: str):
+        """Intenta tomar sin esperar un lock con nombre de la base (GET_LOCK / sp_getapplock).
+        
+        Entrega True si se obtuvo. El lock es de sesión, así que se toma y libera en una conexión
+        propia del pool, fuera de cualquier unidad de trabajo.
+        """
+        pool = self.pool
+        entrada = pool.acquire()
+        conn = entrada.conexion
+        obtenido = False
+        descartar = False
+        try:
+            cursor = conn.cursor()
+            if db_config.IS_PRODUCTION:
+                cursor.execute("SELECT GET_LOCK(?, 0)", (nombre,))
+                obtenido = cursor.fetchone()[0] == 1
+            else:
+                cursor.execute("""
+                SET NOCOUNT ON;
+                DECLARE @resultado INT;
+                EXEC @resultado = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                                @LockOwner = 'Session', @LockTimeout = 0;
+                SELECT @resultado;
+                """, (nombre,))
+                obtenido = cursor.fetchone()[0] >= 0
+            conn.commit()
+            yield obtenido
+        finally:
+            if obtenido:
+                try:
+                    cursor = conn.cursor()
+                    if db_config.IS_PRODUCTION:
+                        cursor.execute("SELECT RELEASE_LOCK(?)", (nombre,))
+                        cursor.fetchone()
+                    else:
+                        cursor.execute("EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'", (nombre,))
+                    conn.commit()
+                except Exception as e:
+                    # Cerrar la sesión libera el lock: la conexión no vuelve al pool
+                    descartar = True
+                    self.logger.warning(f"No se pudo liberar el lock {nombre}: {e}")
+            pool.release(entrada, descartar=descartar)
+    
+    def obtener_estadisticas_pool(self) -> Dict[str, Any]:
+        """Retorna estadísticas del pool de conexiones"""
+        return self.pool.stats()
+    
+    def obtener_estadisticas_pool_exportaciones(self) -> Dict[str, Any]:
+        """Retorna estadísticas del pool de lecturas largas"""
+        return self.pool_exportaciones.stats()
+    
+    def close(self):
+        """Cierra las conexiones abiertas de los pools"""
+        self.pool.close()
+        self.pool_exportaciones.close()
     
     def test_connection(self) -> bool:
         """Prueba la conexión a la base de datos"""
@@ -76,8 +384,12 @@ class DatabaseRepository:
             self.logger.error(f"Error al probar conexión: {e}")
             return False
     
-    def initialize_database(self):
-        """Inicializa las tablas de la base de datos"""
+    def initialize_database(self) -> List[int]:
+        """Inicializa las tablas y aplica las migraciones pendientes; retorna las versiones aplicadas.
+        
+        Es el punto de entrada explícito de migración (python migrations.py migrar); al arrancar,
+        la API solo lo llama si schema_version está atrasada.
+        """
         if db_config.IS_PRODUCTION:
             # Tablas para MySQL/PlanetScale
             tables_sql = [
@@ -356,7 +668,11 @@ class DatabaseRepository:
                     self.logger.warning(f"Error en migración de saldo: {migration_error}")
                 
                 conn.commit()
-                self.logger.info("Base de datos inicializada correctamente")
+            
+            # Índices y demás cambios versionados del esquema
+            aplicadas = GestorMigraciones(self).migrar()
+            self.logger.info("Base de datos inicializada correctamente")
+            return aplicadas
         except Exception as e:
             self.logger.error(f"Error al inicializar base de datos: {e}")
             raise
@@ -389,6 +705,7 @@ class DatabaseRepository:
                 else:
                     cursor.execute("SELECT @@IDENTITY")
                 cliente_id = cursor.fetchone()[0]
+                self._invalidar_cliente_cache(cliente_id, cliente.numero_documento)
                 self.logger.info(f"Cliente creado con ID: {cliente_id}")
                 return cliente_id
         except Exception as e:
@@ -397,7 +714,15 @@ class DatabaseRepository:
     
     def obtener_cliente(self, cliente_id: int) -> Optional[Cliente]:
         """Obtiene un cliente por ID"""
-        sql = "SELECT * FROM clientes WHERE id = ?"
+        sql = f"SELECT {_proyeccion(COLUMNAS_CLIENTE)} FROM clientes WHERE id = ?"
+        
+        # Dentro de una unidad de trabajo se lee siempre de la base para ver los cambios propios
+        usar_cache = not self._en_unidad_de_trabajo()
+        if usar_cache:
+            cliente = self.cache_clientes.obtener_por_id(cliente_id)
+            if cliente is not None:
+                return cliente
+            version = self.cache_clientes.version()
         
         try:
             with self.get_connection() as conn:
@@ -406,15 +731,25 @@ class DatabaseRepository:
                 row = cursor.fetchone()
                 
                 if row:
-                    return self._row_to_cliente(row)
+                    cliente = self._row_to_cliente(row)
+                    if usar_cache:
+                        self.cache_clientes.guardar(cliente, version)
+                    return cliente
                 return None
         except Exception as e:
             self.logger.error(f"Error al obtener cliente: {e}")
             raise
     
-    def obtener_cliente_por_documento(self, numero_documento: str) -> Optional[Cliente]:
-        """Obtiene un cliente por número de documento"""
-        sql = "SELECT * FROM clientes WHERE numero_documento = ?"
+    def obtener_cliente_por_documento(self, numero_documento: str, usar_cache: bool = True) -> Optional[Cliente]:
+        """Obtiene un cliente por número de documento; con usar_cache=False siempre lee de la base"""
+        sql = f"SELECT {_proyeccion(COLUMNAS_CLIENTE)} FROM clientes WHERE numero_documento = ?"
+        
+        usar_cache = usar_cache and not self._en_unidad_de_trabajo()
+        if usar_cache:
+            cliente = self.cache_clientes.obtener_por_documento(numero_documento)
+            if cliente is not None:
+                return cliente
+            version = self.cache_clientes.version()
         
         try:
             with self.get_connection() as conn:
@@ -423,15 +758,25 @@ class DatabaseRepository:
                 row = cursor.fetchone()
                 
                 if row:
-                    return self._row_to_cliente(row)
+                    cliente = self._row_to_cliente(row)
+                    if usar_cache:
+                        self.cache_clientes.guardar(cliente, version)
+                    return cliente
                 return None
         except Exception as e:
             self.logger.error(f"Error al obtener cliente por documento: {e}")
             raise
     
-    def listar_clientes(self, filtros: Dict[str, Any] = None, limite: int = 100) -> List[Cliente]:
-        """Lista clientes con filtros opcionales"""
-        sql = "SELECT * FROM clientes WHERE 1=1"
+    def listar_clientes(self, filtros: Dict[str, Any] = None, limite: int = 100,
+                        despues_de: Optional[Tuple[datetime, int]] = None,
+                        resumen: bool = False) -> List[Union[ClienteLectura, ClienteResumen]]:
+        """Lista clientes con filtros opcionales, paginando por (fecha_registro, id).
+        
+        Con resumen=True solo se leen las columnas de listado y se retornan ClienteResumen.
+        """
+        columnas = COLUMNAS_CLIENTE_RESUMEN if resumen else COLUMNAS_CLIENTE
+        mapear = self._row_to_cliente_resumen if resumen else self._row_to_cliente_lectura
+        sql = f"SELECT {_proyeccion(columnas)} FROM clientes WHERE 1=1"
         params = []
         
         if filtros:
@@ -445,7 +790,12 @@ class DatabaseRepository:
                 sql += " AND ciudad LIKE ?"
                 params.append(f"%{filtros['ciudad']}%")
         
-        sql += f" ORDER BY fecha_registro DESC OFFSET 0 ROWS FETCH NEXT {limite} ROWS ONLY"
+        if despues_de:
+            condicion, params_condicion = _despues_de('fecha_registro', *despues_de)
+            sql += f" AND {condicion}"
+            params.extend(params_condicion)
+        
+        sql += f" ORDER BY fecha_registro DESC, id DESC OFFSET 0 ROWS FETCH NEXT {int(limite)} ROWS ONLY"
         
         try:
             with self.get_connection() as conn:
@@ -453,7 +803,7 @@ class DatabaseRepository:
                 cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_cliente(row) for row in rows]
+                return [mapear(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al listar clientes: {e}")
             raise
@@ -482,11 +832,34 @@ class DatabaseRepository:
                     cliente.notas, cliente.id
                 ))
                 conn.commit()
+                self._invalidar_cliente_cache(cliente.id, cliente.numero_documento)
                 return cursor.rowcount > 0
         except Exception as e:
             self.logger.error(f"Error al actualizar cliente: {e}")
             raise
     
+    def actualizar_datos_cliente(self, cliente_id: int, datos: Dict[str, Any]) -> bool:
+        """Actualiza solo las columnas de perfil indicadas; saldo, puntos y contadores no se tocan"""
+        columnas = [c for c in COLUMNAS_EDITABLES_CLIENTE if c in datos]
+        if not columnas:
+            return self.obtener_cliente(cliente_id) is not None
+        
+        asignaciones = ', '.join(f"{c} = ?" for c in columnas)
+        sql = f"UPDATE clientes SET {asignaciones}, fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = ?"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, [datos[c] for c in columnas] + [cliente_id])
+                conn.commit()
+                actualizadas = cursor.rowcount
+                self._invalidar_cliente_cache(cliente_id)
+        except Exception as e:
+            self.logger.error(f"Error al actualizar datos del cliente: {e}")
+            raise
+        # MySQL cuenta 0 filas si los valores no cambiaron; eso no significa que el cliente no exista
+        return actualizadas > 0 or self.obtener_cliente(cliente_id) is not None
+    
     # CRUD para Promociones
     def crear_promocion(self, promocion: Promocion) -> int:
         """Crea una nueva promoción"""
@@ -496,6 +869,9 @@ class DatabaseRepository:
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         
+        if not promocion.codigo:
+            promocion.codigo = self.generador_codigos.siguiente()
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -509,18 +885,194 @@ class DatabaseRepository:
                 
                 cursor.execute("SELECT @@IDENTITY")
                 promocion_id = cursor.fetchone()[0]
+                promocion.id = promocion_id
                 self.logger.info(f"Promoción creada con ID: {promocion_id}")
                 return promocion_id
         except Exception as e:
             self.logger.error(f"Error al crear promoción: {e}")
             raise
     
-    def obtener_promociones_activas(self, cliente_id: Optional[int] = None) -> List[Promocion]:
+    def crear_promociones_bulk(self, promociones: List[Promocion]) -> int:
+        """Inserta un lote de promociones con executemany por bloques"""
+        sql = """
+        INSERT INTO promociones (codigo, titulo, descripcion, tipo, valor, fecha_inicio,
+                               fecha_fin, cliente_id, usos_maximos, condiciones, creado_por)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        sin_codigo = [p for p in promociones if not p.codigo]
+        for promocion, codigo in zip(sin_codigo, self.generador_codigos.generar(len(sin_codigo))):
+            promocion.codigo = codigo
+        
+        filas = [(
+            p.codigo, p.titulo, p.descripcion, p.tipo.value, p.valor, p.fecha_inicio,
+            p.fecha_fin, p.cliente_id, p.usos_maximos, p.condiciones, p.creado_por
+        ) for p in promociones]
+        
+        if not filas:
+            return 0
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if not db_config.IS_PRODUCTION:
+                    cursor.fast_executemany = True
+                
+                tamano_bloque = self.config.BULK_CHUNK_SIZE
+                for inicio in range(0, len(filas), tamano_bloque):
+                    cursor.executemany(sql, filas[inicio:inicio + tamano_bloque])
+                conn.commit()
+                
+                self.logger.info(f"Lote de {len(filas)} promociones insertado")
+                return len(filas)
+        except Exception as e:
+            self.logger.error(f"Error al crear lote de promociones: {e}")
+            raise
+    
+    def obtener_promocion_por_codigo(self, codigo: str) -> Optional[Promocion]:
+        """Obtiene una promoción por su código, con una lectura puntual por el índice único de codigo"""
+        sql = f"SELECT {_proyeccion(COLUMNAS_PROMOCION)} FROM promociones WHERE codigo = ?"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (codigo,))
+                row = cursor.fetchone()
+                return self._row_to_promocion(row) if row else None
+        except Exception as e:
+            self.logger.error(f"Error al obtener promoción por código: {e}")
+            raise
+    
+    def registrar_canje_promocion(self, codigo: str, cliente_id: int) -> Promocion:
+        """Consume un uso de la promoción con un único UPDATE condicional y retorna su estado posterior.
+        
+        Dos cajas que canjean el mismo código compiten por la fila en la base, no en Python: solo los
+        UPDATE que encuentran usos disponibles, promoción vigente y cliente válido afectan la fila.
+        Lanza CanjeRechazadoError con el motivo si el canje no procede.
+        """
+        # estado se asigna antes que usos_actuales: MySQL evalúa el SET de izquierda a derecha
+        # con los valores ya actualizados, SQL Server con los originales
+        sql = """
+        UPDATE promociones SET
+            estado = CASE WHEN usos_actuales + 1 >= usos_maximos THEN 'canjeada' ELSE estado END,
+            usos_actuales = usos_actuales + 1
+        {output}
+        WHERE codigo = ? AND estado = 'activa' AND usos_actuales < usos_maximos
+          AND CURRENT_TIMESTAMP BETWEEN fecha_inicio AND fecha_fin
+          AND (cliente_id IS NULL OR cliente_id = ?)
+        """
+        params = (codigo, cliente_id)
+        motivo = None
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if db_config.IS_PRODUCTION:
+                    cursor.execute(sql.format(output=""), params)
+                    promocion = None
+                    if cursor.rowcount > 0:
+                        # MySQL no tiene OUTPUT: se relee la fila, que esta transacción ya tiene bloqueada
+                        cursor.execute(
+                            f"SELECT {_proyeccion(COLUMNAS_PROMOCION)} FROM promociones WHERE codigo = ?", (codigo,)
+                        )
+                        promocion = self._row_to_promocion(cursor.fetchone())
+                else:
+                    output = "OUTPUT " + ", ".join(f"inserted.{c}" for c in COLUMNAS_PROMOCION)
+                    cursor.execute(sql.format(output=output), params)
+                    row = cursor.fetchone()
+                    promocion = self._row_to_promocion(row) if row else None
+                
+                if promocion is None:
+                    motivo = self._motivo_canje_rechazado(cursor, codigo, cliente_id)
+                else:
+                    conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error al canjear promoción: {e}")
+            raise
+        
+        if motivo:
+            raise CanjeRechazadoError(motivo)
+        return promocion
+    
+    @staticmethod
+    def _motivo_canje_rechazado(cursor, codigo: str, cliente_id: int) -> str:
+        """Explica por qué el UPDATE condicional no afectó ninguna fila"""
+        cursor.execute("SELECT cliente_id FROM promociones WHERE codigo = ?", (codigo,))
+        row = cursor.fetchone()
+        if not row:
+            return "Código de promoción no válido"
+        if row[0] and row[0] != cliente_id:
+            return "Esta promoción no está disponible para este cliente"
+        return "La promoción no puede canjearse (expirada o agotada)"
+    
+    def expirar_promociones_vencidas(self, limite: int = 500) -> List[str]:
+        """Pasa a 'expirada' hasta limite promociones activas con fecha_fin vencida; retorna sus códigos.
+        
+        Recorre ix_promociones_estado_vigencia (estado, fecha_fin) desde la más antigua, en una
+        transacción corta por lote para no retener bloqueos sobre la tabla.
+        """
+        ahora = datetime.now()
+        limite = int(limite)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if db_config.IS_PRODUCTION:
+                    cursor.execute(f"""
+                    SELECT id, codigo FROM promociones
+                    WHERE estado = 'activa' AND fecha_fin < ?
+                    ORDER BY fecha_fin LIMIT {limite}
+                    """, (ahora,))
+                    filas = cursor.fetchall()
+                    codigos = []
+                    if filas:
+                        marcadores = ", ".join("?" * len(filas))
+                        ids = [fila[0] for fila in filas]
+                        # estado = 'activa' de nuevo: un canje pudo agotarla entre la lectura y el UPDATE
+                        cursor.execute(
+                            f"UPDATE promociones SET estado = 'expirada' WHERE estado = 'activa' AND id IN ({marcadores})",
+                            ids
+                        )
+                        if cursor.rowcount:
+                            # Sin OUTPUT en MySQL: se releen las que quedaron expiradas, bloqueadas por el UPDATE
+                            cursor.execute(
+                                f"SELECT codigo FROM promociones WHERE estado = 'expirada' AND id IN ({marcadores})",
+                                ids
+                            )
+                            codigos = [fila[0] for fila in cursor.fetchall()]
+                else:
+                    cursor.execute(f"""
+                    UPDATE TOP ({limite}) promociones SET estado = 'expirada'
+                    OUTPUT inserted.codigo
+                    WHERE estado = 'activa' AND fecha_fin < ?
+                    """, (ahora,))
+                    codigos = [fila[0] for fila in cursor.fetchall()]
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error al expirar promociones: {e}")
+            raise
+        
+        return codigos
+    
+    def obtener_pendientes_expiracion(self) -> Tuple[int, Optional[datetime]]:
+        """Cantidad de promociones activas ya vencidas y fecha_fin de la más antigua"""
+        sql = "SELECT COUNT(*), MIN(fecha_fin) FROM promociones WHERE estado = 'activa' AND fecha_fin < ?"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (datetime.now(),))
+                row = cursor.fetchone()
+                return (row[0] or 0, row[1]) if row else (0, None)
+        except Exception as e:
+            self.logger.error(f"Error al contar promociones vencidas: {e}")
+            raise
+    
+    def obtener_promociones_activas(self, cliente_id: Optional[int] = None) -> List[PromocionLectura]:
         """Obtiene promociones activas, opcionalmente para un cliente específico"""
         sql = """
-        SELECT * FROM promociones 
+        SELECT {columnas} FROM promociones 
         WHERE estado = 'activa' AND fecha_inicio <= GETDATE() AND fecha_fin >= GETDATE()
-        """
+        """.format(columnas=_proyeccion(COLUMNAS_PROMOCION))
         params = []
         
         if cliente_id:
@@ -535,7 +1087,7 @@ class DatabaseRepository:
                 cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_promocion(row) for row in rows]
+                return [self._row_to_promocion_lectura(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al obtener promociones activas: {e}")
             raise
@@ -559,56 +1111,196 @@ class DatabaseRepository:
                     transaccion.puntos_ganados, transaccion.metodo_pago,
                     transaccion.numero_referencia, transaccion.empleado_id, transaccion.notas
                 ))
+                self._acumular_resumen_diario(cursor, [transaccion])
                 conn.commit()
                 
                 cursor.execute("SELECT @@IDENTITY")
                 transaccion_id = cursor.fetchone()[0]
                 
-                # Actualizar puntos del cliente si es necesario
-                if transaccion.puntos_ganados > 0:
-                    self._actualizar_puntos_cliente(conn, transaccion.cliente_id, transaccion.puntos_ganados)
-                
                 self.logger.info(f"Transacción creada con ID: {transaccion_id}")
                 return transaccion_id
         except Exception as e:
             self.logger.error(f"Error al crear transacción: {e}")
             raise
     
-    def obtener_todas_transacciones(self, limite: int = 100) -> List[Transaccion]:
-        """Obtiene todas las transacciones"""
+    def crear_transacciones_bulk(self, transacciones: List[Transaccion]) -> int:
+        """Inserta un lote de transacciones con executemany por bloques"""
         sql = """
-        SELECT * FROM transacciones 
-        ORDER BY fecha DESC 
-        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        INSERT INTO transacciones (cliente_id, tipo, monto, descripcion, ubicacion,
+                                 promocion_id, puntos_ganados, metodo_pago,
+                                 numero_referencia, empleado_id, notas)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
+        filas = [(
+            t.cliente_id, t.tipo.value, t.monto, t.descripcion, t.ubicacion, t.promocion_id,
+            t.puntos_ganados, t.metodo_pago, t.numero_referencia, t.empleado_id, t.notas
+        ) for t in transacciones]
+        
+        if not filas:
+            return 0
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if not db_config.IS_PRODUCTION:
+                    # pyodbc envía todos los parámetros del bloque en un solo round trip
+                    cursor.fast_executemany = True
+                
+                tamano_bloque = self.config.BULK_CHUNK_SIZE
+                for inicio in range(0, len(filas), tamano_bloque):
+                    cursor.executemany(sql, filas[inicio:inicio + tamano_bloque])
+                self._acumular_resumen_diario(cursor, transacciones)
+                conn.commit()
+                
+                self.logger.info(f"Lote de {len(filas)} transacciones insertado")
+                return len(filas)
+        except Exception as e:
+            self.logger.error(f"Error al crear lote de transacciones: {e}")
+            raise
+    
+    def _acumular_resumen_diario(self, cursor, transacciones: List[Transaccion]):
+        """Suma las transacciones recién insertadas al resumen diario en la misma transacción"""
+        # Las transacciones toman la fecha por defecto de la base, así que el día también lo decide la base
+        grupos: Dict[Tuple[str, str], List[float]] = {}
+        for t in transacciones:
+            monto = float(t.monto)
+            grupo = grupos.get((t.tipo.value, t.ubicacion or ''))
+            if grupo is None:
+                grupos[(t.tipo.value, t.ubicacion or '')] = [1, monto, monto, monto]
+            else:
+                grupo[0] += 1
+                grupo[1] += monto
+                grupo[2] = min(grupo[2], monto)
+                grupo[3] = max(grupo[3], monto)
+        
+        if db_config.IS_PRODUCTION:
+            sql = """
+            INSERT INTO transacciones_resumen_diario
+                (fecha, tipo, ubicacion, cantidad, total_monto, monto_minimo, monto_maximo)
+            VALUES (CAST(CURRENT_TIMESTAMP AS DATE), ?, ?, ?, ?, ?, ?)
+            ON DUPLICATE KEY UPDATE
+                cantidad = cantidad + VALUES(cantidad),
+                total_monto = total_monto + VALUES(total_monto),
+                monto_minimo = LEAST(COALESCE(monto_minimo, VALUES(monto_minimo)), VALUES(monto_minimo)),
+                monto_maximo = GREATEST(COALESCE(monto_maximo, VALUES(monto_maximo)), VALUES(monto_maximo))
+            """
+        else:
+            sql = """
+            MERGE transacciones_resumen_diario WITH (HOLDLOCK) AS destino
+            USING (SELECT CAST(CURRENT_TIMESTAMP AS DATE) AS fecha, ? AS tipo, ? AS ubicacion,
+                          ? AS cantidad, ? AS total_monto, ? AS monto_minimo, ? AS monto_maximo) AS origen
+            ON destino.fecha = origen.fecha AND destino.tipo = origen.tipo AND destino.ubicacion = origen.ubicacion
+            WHEN MATCHED THEN UPDATE SET
+                cantidad = destino.cantidad + origen.cantidad,
+                total_monto = destino.total_monto + origen.total_monto,
+                monto_minimo = CASE WHEN destino.monto_minimo IS NULL OR origen.monto_minimo < destino.monto_minimo
+                                    THEN origen.monto_minimo ELSE destino.monto_minimo END,
+                monto_maximo = CASE WHEN destino.monto_maximo IS NULL OR origen.monto_maximo > destino.monto_maximo
+                                    THEN origen.monto_maximo ELSE destino.monto_maximo END
+            WHEN NOT MATCHED THEN
+                INSERT (fecha, tipo, ubicacion, cantidad, total_monto, monto_minimo, monto_maximo)
+                VALUES (origen.fecha, origen.tipo, origen.ubicacion, origen.cantidad,
+                        origen.total_monto, origen.monto_minimo, origen.monto_maximo);
+            """
+        
+        # Orden fijo de claves para que escritores concurrentes bloqueen filas en el mismo orden
+        for (tipo, ubicacion), (cantidad, total, minimo, maximo) in sorted(grupos.items()):
+            cursor.execute(sql, (tipo, ubicacion, cantidad, total, minimo, maximo))
+    
+    def reconstruir_resumen_diario(self, fecha_inicio: date, fecha_fin: date) -> int:
+        """Recalcula el resumen diario desde transacciones para los días [fecha_inicio, fecha_fin]"""
+        desde = datetime.combine(fecha_inicio, datetime.min.time())
+        hasta = datetime.combine(fecha_fin + timedelta(days=1), datetime.min.time())
+        
+        try:
+            with self.unidad_de_trabajo() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "DELETE FROM transacciones_resumen_diario WHERE fecha >= ? AND fecha < ?",
+                    (desde.date(), hasta.date())
+                )
+                cursor.execute("""
+                INSERT INTO transacciones_resumen_diario
+                    (fecha, tipo, ubicacion, cantidad, total_monto, monto_minimo, monto_maximo)
+                SELECT CAST(fecha AS DATE), tipo, COALESCE(ubicacion, ''),
+                       COUNT(*), SUM(monto), MIN(monto), MAX(monto)
+                FROM transacciones
+                WHERE fecha >= ? AND fecha < ?
+                GROUP BY CAST(fecha AS DATE), tipo, COALESCE(ubicacion, '')
+                """, (desde, hasta))
+                filas = cursor.rowcount
+            
+            self.logger.info(f"Resumen diario reconstruido del {fecha_inicio} al {fecha_fin}: {filas} filas")
+            return filas
+        except Exception as e:
+            self.logger.error(f"Error al reconstruir resumen diario: {e}")
+            raise
+    
+    def obtener_ids_clientes_existentes(self, cliente_ids: List[int]) -> set:
+        """Retorna el subconjunto de IDs que corresponde a clientes existentes"""
+        ids = list(set(cliente_ids))
+        existentes = set()
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, (limite,))
+                # SQL Server admite como máximo 2100 parámetros por sentencia
+                for inicio in range(0, len(ids), 1000):
+                    bloque = ids[inicio:inicio + 1000]
+                    marcadores = ", ".join("?" for _ in bloque)
+                    cursor.execute(f"SELECT id FROM clientes WHERE id IN ({marcadores})", bloque)
+                    existentes.update(row[0] for row in cursor.fetchall())
+                return existentes
+        except Exception as e:
+            self.logger.error(f"Error al verificar clientes existentes: {e}")
+            raise
+    
+    def obtener_todas_transacciones(self, limite: int = 100,
+                                    despues_de: Optional[Tuple[datetime, int]] = None) -> List[TransaccionLectura]:
+        """Obtiene todas las transacciones, paginando por (fecha, id)"""
+        sql = f"SELECT {_proyeccion(COLUMNAS_TRANSACCION)} FROM transacciones"
+        params = []
+        
+        if despues_de:
+            condicion, params_condicion = _despues_de('fecha', *despues_de)
+            sql += f" WHERE {condicion}"
+            params.extend(params_condicion)
+        
+        sql += " ORDER BY fecha DESC, id DESC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+        params.append(limite)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_transaccion(row) for row in rows]
+                return [self._row_to_transaccion_lectura(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al obtener todas las transacciones: {e}")
             raise
     
-    def obtener_transacciones_cliente(self, cliente_id: int, limite: int = 50) -> List[Transaccion]:
-        """Obtiene las transacciones de un cliente"""
-        sql = """
-        SELECT * FROM transacciones 
-        WHERE cliente_id = ? 
-        ORDER BY fecha DESC 
-        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
-        """
+    def obtener_transacciones_cliente(self, cliente_id: int, limite: int = 50,
+                                      despues_de: Optional[Tuple[datetime, int]] = None) -> List[TransaccionLectura]:
+        """Obtiene las transacciones de un cliente, paginando por (fecha, id)"""
+        sql = f"SELECT {_proyeccion(COLUMNAS_TRANSACCION)} FROM transacciones WHERE cliente_id = ?"
+        params = [cliente_id]
+        
+        if despues_de:
+            condicion, params_condicion = _despues_de('fecha', *despues_de)
+            sql += f" AND {condicion}"
+            params.extend(params_condicion)
+        
+        sql += " ORDER BY fecha DESC, id DESC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+        params.append(limite)
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, (cliente_id, limite))
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_transaccion(row) for row in rows]
+                return [self._row_to_transaccion_lectura(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al obtener transacciones del cliente: {e}")
             raise
@@ -640,131 +1332,644 @@ class DatabaseRepository:
             self.logger.error(f"Error al crear ticket: {e}")
             raise
     
-    def obtener_tickets_abiertos(self, limite: int = 100) -> List[Ticket]:
-        """Obtiene tickets abiertos"""
-        sql = """
-        SELECT * FROM tickets 
-        WHERE estado IN ('abierto', 'en_proceso') 
-        ORDER BY 
-            CASE prioridad 
+    def obtener_tickets_abiertos(self, limite: int = 100,
+                                 despues_de: Optional[Tuple[int, datetime, int]] = None,
+                                 resumen: bool = False) -> List[Union[TicketLectura, TicketResumen]]:
+        """Obtiene tickets abiertos, paginando por (prioridad, fecha_creacion, id).
+        
+        Con resumen=True solo se leen las columnas de listado y se retornan TicketResumen.
+        """
+        columnas = COLUMNAS_TICKET_RESUMEN if resumen else COLUMNAS_TICKET
+        mapear = self._row_to_ticket_resumen if resumen else self._row_to_ticket_lectura
+        orden_prioridad = """
+            CASE UPPER(prioridad)
                 WHEN 'CRITICA' THEN 1 
                 WHEN 'ALTA' THEN 2 
                 WHEN 'MEDIA' THEN 3 
                 WHEN 'BAJA' THEN 4 
-            END,
-            fecha_creacion ASC
-        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
-        """
+                ELSE 5
+            END"""
+        sql = f"SELECT {_proyeccion(columnas)} FROM tickets WHERE estado IN ('abierto', 'en_proceso')"
+        params = []
+        
+        if despues_de:
+            condicion, params_condicion = _despues_de('fecha_creacion', despues_de[1], despues_de[2], descendente=False)
+            sql += f" AND ({orden_prioridad} > ? OR ({orden_prioridad} = ? AND {condicion}))"
+            params.extend([despues_de[0], despues_de[0], *params_condicion])
+        
+        sql += f" ORDER BY {orden_prioridad}, fecha_creacion ASC, id ASC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+        params.append(limite)
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, (limite,))
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_ticket(row) for row in rows]
+                return [mapear(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al obtener tickets abiertos: {e}")
             raise
     
-    def obtener_tickets_por_cliente(self, cliente_id: int, limite: int = 50) -> List[Ticket]:
-        """Obtiene tickets de un cliente específico"""
+    def contar_tickets_abiertos(self) -> Dict[str, int]:
+        """Cuenta tickets abiertos y críticos sin traer las filas"""
         sql = """
-        SELECT * FROM tickets 
-        WHERE cliente_id = ?
-        ORDER BY fecha_creacion DESC
-        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+        SELECT 
+            COUNT(*) as abiertos,
+            COUNT(CASE WHEN prioridad = 'CRITICA' THEN 1 END) as criticos
+        FROM tickets 
+        WHERE estado IN ('abierto', 'en_proceso')
         """
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, (cliente_id, limite))
+                cursor.execute(sql)
+                row = cursor.fetchone()
+                
+                return {'abiertos': row[0] or 0, 'criticos': row[1] or 0}
+        except Exception as e:
+            self.logger.error(f"Error al contar tickets abiertos: {e}")
+            raise
+    
+    def obtener_tickets_por_cliente(self, cliente_id: int, limite: int = 50,
+                                    despues_de: Optional[Tuple[datetime, int]] = None) -> List[TicketLectura]:
+        """Obtiene tickets de un cliente específico, paginando por (fecha_creacion, id)"""
+        sql = f"SELECT {_proyeccion(COLUMNAS_TICKET)} FROM tickets WHERE cliente_id = ?"
+        params = [cliente_id]
+        
+        if despues_de:
+            condicion, params_condicion = _despues_de('fecha_creacion', *despues_de)
+            sql += f" AND {condicion}"
+            params.extend(params_condicion)
+        
+        sql += " ORDER BY fecha_creacion DESC, id DESC OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+        params.append(limite)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
                 rows = cursor.fetchall()
                 
-                return [self._row_to_ticket(row) for row in rows]
+                return [self._row_to_ticket_lectura(row) for row in rows]
         except Exception as e:
             self.logger.error(f"Error al obtener tickets del cliente: {e}")
             raise
     
+    # Lectura en streaming para exportaciones
+    def iterar_clientes(self, filtros: Dict[str, Any] = None,
+                        tamano_lote: Optional[int] = None) -> Iterator[List[tuple]]:
+        """Recorre clientes en bloques de filas con COLUMNAS_EXPORTACION_CLIENTES"""
+        sql = f"SELECT {', '.join(COLUMNAS_EXPORTACION_CLIENTES)} FROM clientes WHERE 1=1"
+        params = []
+        
+        if filtros:
+            if 'activo' in filtros:
+                sql += " AND activo = ?"
+                params.append(filtros['activo'])
+            if 'tipo_cliente' in filtros:
+                sql += " AND tipo_cliente = ?"
+                params.append(filtros['tipo_cliente'])
+            if 'ciudad' in filtros:
+                sql += " AND ciudad LIKE ?"
+                params.append(f"%{filtros['ciudad']}%")
+        
+        sql += " ORDER BY id"
+        return self._iterar_consulta(sql, params, tamano_lote)
+    
+    def _filtro_segmento_clientes(self, segmento: Dict[str, Any],
+                                  excluir_creado_por: Optional[str] = None) -> Tuple[str, list]:
+        """WHERE de un segmento de campaña: tipo_cliente, ciudad, activo y ventana de última visita"""
+        sql = " WHERE c.activo = ?"
+        params: list = [segmento.get('activo', True)]
+        
+        tipos = segmento.get('tipo_cliente')
+        if tipos:
+            tipos = [tipos] if isinstance(tipos, str) else list(tipos)
+            sql += f" AND c.tipo_cliente IN ({', '.join('?' * len(tipos))})"
+            params.extend(tipos)
+        if segmento.get('ciudad'):
+            # Ciudad exacta sin distinguir mayúsculas: un LIKE '%x%' sumaba ciudades que solo la contienen
+            sql += " AND UPPER(c.ciudad) = ?"
+            params.append(segmento['ciudad'].strip().upper())
+        if segmento.get('ultima_visita_desde'):
+            sql += " AND c.fecha_ultima_visita >= ?"
+            params.append(segmento['ultima_visita_desde'])
+        if segmento.get('ultima_visita_hasta'):
+            sql += " AND c.fecha_ultima_visita <= ?"
+            params.append(segmento['ultima_visita_hasta'])
+        if excluir_creado_por:
+            # Reanudar una campaña no duplica las promociones de los clientes ya cubiertos
+            sql += " AND NOT EXISTS (SELECT 1 FROM promociones p WHERE p.cliente_id = c.id AND p.creado_por = ?)"
+            params.append(excluir_creado_por)
+        return sql, params
+    
+    def contar_clientes_segmento(self, segmento: Dict[str, Any], excluir_creado_por: Optional[str] = None) -> int:
+        """Cantidad de clientes que cumplen el segmento"""
+        filtro, params = self._filtro_segmento_clientes(segmento, excluir_creado_por)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM clientes c{filtro}", params)
+                return cursor.fetchone()[0] or 0
+        except Exception as e:
+            self.logger.error(f"Error al contar segmento de clientes: {e}")
+            raise
+    
+    def iterar_ids_clientes_segmento(self, segmento: Dict[str, Any], excluir_creado_por: Optional[str] = None,
+                                     tamano_lote: Optional[int] = None) -> Iterator[List[tuple]]:
+        """Recorre en bloques los ids de los clientes del segmento"""
+        filtro, params = self._filtro_segmento_clientes(segmento, excluir_creado_por)
+        return self._iterar_consulta(f"SELECT c.id FROM clientes c{filtro} ORDER BY c.id", params, tamano_lote)
+    
+    @staticmethod
+    def _filtro_transacciones(fecha_inicio: Optional[datetime], fecha_fin: Optional[datetime],
+                              cliente_id: Optional[int]) -> Tuple[str, list]:
+        sql = " WHERE 1=1"
+        params = []
+        if fecha_inicio:
+            sql += " AND fecha >= ?"
+            params.append(fecha_inicio)
+        if fecha_fin:
+            sql += " AND fecha <= ?"
+            params.append(fecha_fin)
+        if cliente_id:
+            sql += " AND cliente_id = ?"
+            params.append(cliente_id)
+        return sql, params
+    
+    def contar_transacciones(self, fecha_inicio: Optional[datetime] = None, fecha_fin: Optional[datetime] = None,
+                             cliente_id: Optional[int] = None) -> int:
+        """Cantidad de transacciones del filtro; sirve de total para informar el avance de una exportación"""
+        filtro, params = self._filtro_transacciones(fecha_inicio, fecha_fin, cliente_id)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM transacciones{filtro}", params)
+                return cursor.fetchone()[0] or 0
+        except Exception as e:
+            self.logger.error(f"Error al contar transacciones: {e}")
+            raise
+    
+    def iterar_transacciones(self, fecha_inicio: Optional[datetime] = None, fecha_fin: Optional[datetime] = None,
+                             cliente_id: Optional[int] = None, tamano_lote: Optional[int] = None,
+                             progreso: Optional[Callable[[int], None]] = None) -> Iterator[List[tuple]]:
+        """Recorre transacciones en bloques de filas con COLUMNAS_EXPORTACION_TRANSACCIONES"""
+        filtro, params = self._filtro_transacciones(fecha_inicio, fecha_fin, cliente_id)
+        sql = f"SELECT {', '.join(COLUMNAS_EXPORTACION_TRANSACCIONES)} FROM transacciones{filtro} ORDER BY id"
+        return self._iterar_consulta(sql, params, tamano_lote, progreso)
+    
+    def iterar_transacciones_analitica(self, fecha_inicio: datetime, fecha_fin: datetime,
+                                       tamano_lote: Optional[int] = None,
+                                       progreso: Optional[Callable[[int], None]] = None) -> Iterator[List[tuple]]:
+        """Recorre las transacciones del período con el tipo y la fecha de registro del cliente.
+        
+        Las filas siguen analytics.COLUMNAS_ANALITICA; no se ordenan porque el motor analítico
+        agrega en memoria.
+        """
+        sql = """
+        SELECT t.fecha, t.monto, t.tipo, t.ubicacion, t.metodo_pago, t.cliente_id,
+               c.tipo_cliente, c.fecha_registro
+        FROM transacciones t
+        JOIN clientes c ON c.id = t.cliente_id
+        WHERE t.fecha >= ? AND t.fecha <= ?
+        """
+        return self._iterar_consulta(
+            sql, [fecha_inicio, fecha_fin], tamano_lote or self.config.ANALYTICS_FETCH_SIZE, progreso
+        )
+    
+    def _iterar_consulta(self, sql: str, params: list, tamano_lote: Optional[int] = None,
+                         progreso: Optional[Callable[[int], None]] = None) -> Iterator[List[tuple]]:
+        """Ejecuta una consulta con cursor del lado del servidor y entrega bloques con fetchmany.
+        
+        progreso(filas_leidas) se llama tras cada bloque. La conexión queda tomada mientras se consume
+        el iterador, así que sale de pool_exportaciones salvo dentro de una unidad de trabajo.
+        """
+        tamano_lote = tamano_lote or self.config.EXPORT_FETCH_SIZE
+        
+        if self._en_unidad_de_trabajo():
+            with self.get_connection() as conn:
+                yield from self._leer_por_bloques(conn, sql, params, tamano_lote, progreso)
+            return
+        
+        pool = self.pool_exportaciones
+        entrada = pool.acquire()
+        try:
+            yield from self._leer_por_bloques(entrada.conexion, sql, params, tamano_lote, progreso)
+        finally:
+            pool.release(entrada)
+    
+    @staticmethod
+    def _leer_por_bloques(conn, sql: str, params: list, tamano_lote: int,
+                          progreso: Optional[Callable[[int], None]]) -> Iterator[List[tuple]]:
+        if db_config.IS_PRODUCTION:
+            # Cursor sin buffer: pymysql no descarga todo el resultado a memoria
+            import pymysql.cursors
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+        else:
+            cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            leidas = 0
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                leidas += len(filas)
+                if progreso:
+                    progreso(leidas)
+                yield filas
+        finally:
+            cursor.close()
+    
+    # Estado de trabajos en segundo plano, compartido entre workers
+    def guardar_trabajo(self, tipo: str, trabajo_id: str, estado: str, datos: Dict[str, Any],
+                        archivo: Optional[str] = None, reiniciar: bool = False):
+        """Inserta o actualiza el estado de un trabajo; fecha_actualizacion sirve de latido.
+        
+        Un trabajo ya 'completado' o 'fallido' no se sobrescribe: un avance escrito tarde por otro hilo
+        no lo devuelve a en curso. reiniciar lo reemplaza igual, para volver a ejecutar el mismo id.
+        """
+        valores = (estado, json.dumps(datos, ensure_ascii=False, default=str), archivo, datetime.now())
+        terminado = "estado IN ('completado', 'fallido')"
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if db_config.IS_PRODUCTION:
+                    if reiniciar:
+                        actualizar = """estado = VALUES(estado), datos = VALUES(datos),
+                        archivo = VALUES(archivo), fecha_actualizacion = VALUES(fecha_actualizacion)"""
+                    else:
+                        # estado al final: MySQL evalúa el SET de izquierda a derecha con los valores ya asignados
+                        actualizar = ", ".join(
+                            f"{c} = IF({terminado}, {c}, VALUES({c}))"
+                            for c in ('datos', 'archivo', 'fecha_actualizacion', 'estado')
+                        )
+                    cursor.execute(f"""
+                    INSERT INTO trabajos (tipo, id, estado, datos, archivo, fecha_actualizacion)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON DUPLICATE KEY UPDATE {actualizar}
+                    """, (tipo, trabajo_id, *valores))
+                else:
+                    cursor.execute(
+                        "UPDATE trabajos SET estado = ?, datos = ?, archivo = ?, fecha_actualizacion = ? "
+                        "WHERE tipo = ? AND id = ?" + ("" if reiniciar else f" AND NOT {terminado}"),
+                        (*valores, tipo, trabajo_id)
+                    )
+                    if cursor.rowcount == 0:
+                        # Sin filas: el trabajo no existe o ya terminó; solo en el primer caso se inserta
+                        cursor.execute(
+                            "INSERT INTO trabajos (tipo, id, estado, datos, archivo, fecha_actualizacion) "
+                            "SELECT ?, ?, ?, ?, ?, ? "
+                            "WHERE NOT EXISTS (SELECT 1 FROM trabajos WHERE tipo = ? AND id = ?)",
+                            (tipo, trabajo_id, *valores, tipo, trabajo_id)
+                        )
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error al guardar estado del trabajo {trabajo_id}: {e}")
+            raise
+    
+    def obtener_trabajo(self, tipo: str, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Estado guardado de un trabajo: estado, datos, archivo y fecha_actualizacion"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT estado, datos, archivo, fecha_actualizacion FROM trabajos WHERE tipo = ? AND id = ?",
+                    (tipo, trabajo_id)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                return {
+                    'estado': row[0],
+                    'datos': _cargar_json(row[1], {}),
+                    'archivo': row[2],
+                    'fecha_actualizacion': row[3]
+                }
+        except Exception as e:
+            self.logger.error(f"Error al obtener trabajo {trabajo_id}: {e}")
+            raise
+    
+    def contar_trabajos(self, tipo: str, estados: Tuple[str, ...], actualizados_desde: datetime) -> int:
+        """Trabajos del tipo en alguno de los estados con latido posterior a actualizados_desde"""
+        marcadores = ', '.join('?' * len(estados))
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM trabajos WHERE tipo = ? AND estado IN ({marcadores}) "
+                    f"AND fecha_actualizacion >= ?",
+                    (tipo, *estados, actualizados_desde)
+                )
+                return cursor.fetchone()[0] or 0
+        except Exception as e:
+            self.logger.error(f"Error al contar trabajos: {e}")
+            raise
+    
+    def purgar_trabajos(self, tipo: str, antes_de: datetime) -> List[str]:
+        """Borra los trabajos sin actualizar desde antes_de; retorna sus archivos para eliminarlos"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT archivo FROM trabajos WHERE tipo = ? AND fecha_actualizacion < ?", (tipo, antes_de)
+                )
+                archivos = [row[0] for row in cursor.fetchall() if row[0]]
+                cursor.execute("DELETE FROM trabajos WHERE tipo = ? AND fecha_actualizacion < ?", (tipo, antes_de))
+                conn.commit()
+                return archivos
+        except Exception as e:
+            self.logger.error(f"Error al purgar trabajos: {e}")
+            raise
+    
     # Métodos de utilidad para conversión de datos
     def _row_to_cliente(self, row) -> Cliente:
-        """Convierte una fila de base de datos a objeto Cliente"""
-        import json
-        
-        preferencias = {}
-        if row[18]:  # preferencias
-            try:
-                preferencias = json.loads(row[18]) if isinstance(row[18], str) else {}
-            except:
-                preferencias = {}
+        """Convierte una fila proyectada con COLUMNAS_CLIENTE a objeto Cliente"""
+        fila = dict(zip(COLUMNAS_CLIENTE, row))
+        preferencias = _cargar_json(fila['preferencias'], {})
         
         return Cliente(
-            id=row[0], numero_documento=row[1], tipo_documento=row[2],
-            nombres=row[3], apellidos=row[4], email=row[5], telefono=row[6],
-            fecha_nacimiento=row[7], direccion=row[8], ciudad=row[9],
-            tipo_cliente=TipoCliente(row[10]), fecha_registro=row[11],
-            fecha_ultima_visita=row[12], total_visitas=row[13],
-            total_gastado=float(row[14]) if row[14] else 0.0,
-            saldo=float(row[20]) if row[20] else 0.0,
-            puntos_acumulados=row[15], activo=bool(row[16]),
-            preferencias=preferencias, notas=row[18] or ""
+            id=fila['id'], numero_documento=fila['numero_documento'], tipo_documento=fila['tipo_documento'],
+            nombres=fila['nombres'], apellidos=fila['apellidos'], email=fila['email'], telefono=fila['telefono'],
+            fecha_nacimiento=fila['fecha_nacimiento'], direccion=fila['direccion'], ciudad=fila['ciudad'],
+            tipo_cliente=TipoCliente(fila['tipo_cliente']), fecha_registro=fila['fecha_registro'],
+            fecha_ultima_visita=fila['fecha_ultima_visita'], total_visitas=fila['total_visitas'] or 0,
+            total_gastado=float(fila['total_gastado']) if fila['total_gastado'] else 0.0,
+            saldo=float(fila['saldo']) if fila['saldo'] else 0.0,
+            puntos_acumulados=fila['puntos_acumulados'] or 0, activo=bool(fila['activo']),
+            preferencias=preferencias, notas=fila['notas'] or ""
+        )
+    
+    def _row_to_cliente_resumen(self, row) -> ClienteResumen:
+        """Convierte una fila proyectada con COLUMNAS_CLIENTE_RESUMEN a ClienteResumen"""
+        fila = dict(zip(COLUMNAS_CLIENTE_RESUMEN, row))
+        return ClienteResumen(
+            id=fila['id'], numero_documento=fila['numero_documento'],
+            nombres=fila['nombres'], apellidos=fila['apellidos'], email=fila['email'],
+            tipo_cliente=_TIPOS_CLIENTE[fila['tipo_cliente']], fecha_registro=fila['fecha_registro'],
+            total_visitas=fila['total_visitas'] or 0,
+            total_gastado=float(fila['total_gastado']) if fila['total_gastado'] else 0.0,
+            saldo=float(fila['saldo']) if fila['saldo'] else 0.0,
+            puntos_acumulados=fila['puntos_acumulados'] or 0, activo=bool(fila['activo'])
         )
     
     def _row_to_promocion(self, row) -> Promocion:
-        """Convierte una fila de base de datos a objeto Promocion"""
+        """Convierte una fila proyectada con COLUMNAS_PROMOCION a objeto Promocion"""
+        fila = dict(zip(COLUMNAS_PROMOCION, row))
         return Promocion(
-            id=row[0], codigo=row[1], titulo=row[2], descripcion=row[3],
-            tipo=TipoPromocion(row[4]), valor=float(row[5]) if row[5] else 0.0,
-            fecha_inicio=row[6], fecha_fin=row[7],
-            estado=EstadoPromocion(row[8]), cliente_id=row[9],
-            usos_maximos=row[10], usos_actuales=row[11],
-            condiciones=row[12] or "", qr_code=row[13],
-            fecha_creacion=row[14], creado_por=row[15]
+            id=fila['id'], codigo=fila['codigo'], titulo=fila['titulo'], descripcion=fila['descripcion'],
+            tipo=TipoPromocion(fila['tipo']), valor=float(fila['valor']) if fila['valor'] else 0.0,
+            fecha_inicio=fila['fecha_inicio'], fecha_fin=fila['fecha_fin'],
+            estado=EstadoPromocion(fila['estado']), cliente_id=fila['cliente_id'],
+            usos_maximos=fila['usos_maximos'], usos_actuales=fila['usos_actuales'],
+            condiciones=fila['condiciones'] or "", qr_code=fila['qr_code'],
+            fecha_creacion=fila['fecha_creacion'], creado_por=fila['creado_por']
         )
     
     def _row_to_transaccion(self, row) -> Transaccion:
-        """Convierte una fila de base de datos a objeto Transaccion"""
+        """Convierte una fila proyectada con COLUMNAS_TRANSACCION a objeto Transaccion"""
+        fila = dict(zip(COLUMNAS_TRANSACCION, row))
         return Transaccion(
-            id=row[0], cliente_id=row[1], tipo=TipoTransaccion(row[2]),
-            monto=float(row[3]) if row[3] else 0.0, descripcion=row[4],
-            fecha=row[5], ubicacion=row[6], promocion_id=row[7],
-            puntos_ganados=row[8], metodo_pago=row[9],
-            numero_referencia=row[10], empleado_id=row[11], notas=row[12] or ""
+            id=fila['id'], cliente_id=fila['cliente_id'], tipo=TipoTransaccion(fila['tipo']),
+            monto=float(fila['monto']) if fila['monto'] else 0.0, descripcion=fila['descripcion'],
+            fecha=fila['fecha'], ubicacion=fila['ubicacion'], promocion_id=fila['promocion_id'],
+            puntos_ganados=fila['puntos_ganados'], metodo_pago=fila['metodo_pago'],
+            numero_referencia=fila['numero_referencia'], empleado_id=fila['empleado_id'],
+            notas=fila['notas'] or ""
         )
     
     def _row_to_ticket(self, row) -> Ticket:
-        """Convierte una fila de base de datos a objeto Ticket"""
-        import json
-        
-        seguimientos = []
-        if row[18]:  # seguimientos
-            try:
-                seguimientos = json.loads(row[18]) if isinstance(row[18], str) else []
-            except:
-                seguimientos = []
+        """Convierte una fila proyectada con COLUMNAS_TICKET a objeto Ticket"""
+        fila = dict(zip(COLUMNAS_TICKET, row))
+        seguimientos = _cargar_json(fila['seguimientos'], [])
         
         return Ticket(
-            id=row[0], numero_ticket=row[1], cliente_id=row[2],
-            tipo=TipoTicket(row[3]), estado=EstadoTicket(row[4]),
-            prioridad=row[5], asunto=row[6], descripcion=row[7],
-            fecha_creacion=row[8], fecha_actualizacion=row[9],
-            fecha_resolucion=row[10], asignado_a=row[11],
-            categoria=row[12], subcategoria=row[13], resolucion=row[14] or "",
-            satisfaccion_cliente=row[15], tiempo_resolucion_horas=row[16],
+            id=fila['id'], numero_ticket=fila['numero_ticket'], cliente_id=fila['cliente_id'],
+            tipo=TipoTicket(fila['tipo']), estado=EstadoTicket(fila['estado']),
+            prioridad=fila['prioridad'], asunto=fila['asunto'], descripcion=fila['descripcion'],
+            fecha_creacion=fila['fecha_creacion'], fecha_actualizacion=fila['fecha_actualizacion'],
+            fecha_resolucion=fila['fecha_resolucion'], asignado_a=fila['asignado_a'],
+            categoria=fila['categoria'], subcategoria=fila['subcategoria'], resolucion=fila['resolucion'] or "",
+            satisfaccion_cliente=fila['satisfaccion_cliente'],
+            tiempo_resolucion_horas=fila['tiempo_resolucion_horas'],
             seguimientos=seguimientos
         )
     
-    def _actualizar_puntos_cliente(self, conn, cliente_id: int, puntos: int):
-        """Actualiza los puntos acumulados de un cliente"""
+    def _row_to_ticket_resumen(self, row) -> TicketResumen:
+        """Convierte una fila proyectada con COLUMNAS_TICKET_RESUMEN a TicketResumen"""
+        fila = dict(zip(COLUMNAS_TICKET_RESUMEN, row))
+        return TicketResumen(
+            id=fila['id'], numero_ticket=fila['numero_ticket'], cliente_id=fila['cliente_id'],
+            tipo=TipoTicket(fila['tipo']), estado=EstadoTicket(fila['estado']),
+            prioridad=fila['prioridad'], asunto=fila['asunto'],
+            fecha_creacion=fila['fecha_creacion'], asignado_a=fila['asignado_a']
+        )
+    
+    # Hidratación rápida de listados: desempaquetado directo de la proyección, sin dict intermedio
+    def _row_to_cliente_lectura(self, row) -> ClienteLectura:
+        """Convierte una fila proyectada con COLUMNAS_CLIENTE a ClienteLectura"""
+        (id_, numero_documento, tipo_documento, nombres, apellidos, email, telefono,
+         fecha_nacimiento, direccion, ciudad, tipo_cliente, fecha_registro,
+         fecha_ultima_visita, total_visitas, total_gastado, saldo, puntos_acumulados,
+         activo, preferencias, notas) = row
+        return ClienteLectura(
+            id_, numero_documento, tipo_documento, nombres, apellidos, email, telefono,
+            fecha_nacimiento, direccion, ciudad, _TIPOS_CLIENTE[tipo_cliente], fecha_registro,
+            fecha_ultima_visita, total_visitas or 0,
+            float(total_gastado) if total_gastado else 0.0,
+            float(saldo) if saldo else 0.0,
+            puntos_acumulados or 0, bool(activo), _cargar_json(preferencias, {}), notas or ""
+        )
+    
+    def _row_to_promocion_lectura(self, row) -> PromocionLectura:
+        """Convierte una fila proyectada con COLUMNAS_PROMOCION a PromocionLectura"""
+        (id_, codigo, titulo, descripcion, tipo, valor, fecha_inicio, fecha_fin, estado,
+         cliente_id, usos_maximos, usos_actuales, condiciones, qr_code, fecha_creacion,
+         creado_por) = row
+        return PromocionLectura(
+            id_, codigo, titulo, descripcion, _TIPOS_PROMOCION[tipo], float(valor) if valor else 0.0,
+            fecha_inicio, fecha_fin, _ESTADOS_PROMOCION[estado], cliente_id, usos_maximos,
+            usos_actuales, condiciones or "", qr_code, fecha_creacion, creado_por
+        )
+    
+    def _row_to_transaccion_lectura(self, row) -> TransaccionLectura:
+        """Convierte una fila proyectada con COLUMNAS_TRANSACCION a TransaccionLectura"""
+        (id_, cliente_id, tipo, monto, descripcion, fecha, ubicacion, promocion_id,
+         puntos_ganados, metodo_pago, numero_referencia, empleado_id, notas) = row
+        return TransaccionLectura(
+            id_, cliente_id, _TIPOS_TRANSACCION[tipo], float(monto) if monto else 0.0, descripcion,
+            fecha, ubicacion, promocion_id, puntos_ganados, metodo_pago, numero_referencia,
+            empleado_id, notas or ""
+        )
+    
+    def _row_to_ticket_lectura(self, row) -> TicketLectura:
+        """Convierte una fila proyectada con COLUMNAS_TICKET a TicketLectura"""
+        (id_, numero_ticket, cliente_id, tipo, estado, prioridad, asunto, descripcion,
+         fecha_creacion, fecha_actualizacion, fecha_resolucion, asignado_a, categoria,
+         subcategoria, resolucion, satisfaccion_cliente, tiempo_resolucion_horas,
+         seguimientos) = row
+        return TicketLectura(
+            id_, numero_ticket, cliente_id, _TIPOS_TICKET[tipo], _ESTADOS_TICKET[estado], prioridad,
+            asunto, descripcion, fecha_creacion, fecha_actualizacion, fecha_resolucion, asignado_a,
+            categoria, subcategoria, resolucion or "", satisfaccion_cliente, tiempo_resolucion_horas,
+            _cargar_json(seguimientos, [])
+        )
+    
+    def incrementar_contadores_cliente(self, cliente_id: int, visitas: int = 0, gastado: float = 0.0,
+                                       puntos: int = 0, saldo: float = 0.0,
+                                       fecha_ultima_visita: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Aplica deltas a los contadores del cliente en una sola sentencia y retorna los valores nuevos"""
+        try:
+            with self.get_connection() as conn:
+                nuevos = self._incrementar_contadores_cliente(
+                    conn, cliente_id, visitas, gastado, puntos, saldo, fecha_ultima_visita
+                )
+                conn.commit()
+                self._invalidar_cliente_cache(cliente_id)
+                return nuevos
+        except Exception as e:
+            self.logger.error(f"Error al incrementar contadores del cliente: {e}")
+            raise
+    
+    def _incrementar_contadores_cliente(self, conn, cliente_id: int, visitas: int = 0, gastado: float = 0.0,
+                                        puntos: int = 0, saldo: float = 0.0,
+                                        fecha_ultima_visita: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Actualiza contadores con x = x + ? sin reescribir el resto de columnas"""
+        columnas_retorno = "total_visitas, total_gastado, puntos_acumulados, saldo, tipo_cliente"
         sql = """
-        UPDATE clientes 
-        SET puntos_acumulados = puntos_acumulados + ?,
-            fecha_actualizacion = GETDATE()
+        UPDATE clientes SET
+            total_visitas = COALESCE(total_visitas, 0) + ?,
+            total_gastado = COALESCE(total_gastado, 0) + ?,
+            puntos_acumulados = COALESCE(puntos_acumulados, 0) + ?,
+            saldo = COALESCE(saldo, 0) + ?,
+            fecha_ultima_visita = COALESCE(?, fecha_ultima_visita),
+            fecha_actualizacion = CURRENT_TIMESTAMP
+        {output}
         WHERE id = ?
         """
+        params = (visitas, gastado, puntos, saldo, fecha_ultima_visita, cliente_id)
         cursor = conn.cursor()
-        cursor.execute(sql, (puntos, cliente_id))
+        
+        if db_config.IS_PRODUCTION:
+            # MySQL no soporta OUTPUT: la fila queda bloqueada por el UPDATE hasta el commit
+            cursor.execute(sql.format(output=""), params)
+            cursor.execute(f"SELECT {columnas_retorno} FROM clientes WHERE id = ?", (cliente_id,))
+        else:
+            output = "OUTPUT " + ", ".join(f"inserted.{c.strip()}" for c in columnas_retorno.split(","))
+            cursor.execute(sql.format(output=output), params)
+        
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        return {
+            'total_visitas': row[0] or 0,
+            'total_gastado': float(row[1]) if row[1] else 0.0,
+            'puntos_acumulados': row[2] or 0,
+            'saldo': float(row[3]) if row[3] else 0.0,
+            'tipo_cliente': TipoCliente(row[4])
+        }
+    
+    def actualizar_tipo_cliente(self, cliente_id: int, tipo_cliente: TipoCliente,
+                                tipo_anterior: Optional[TipoCliente] = None) -> bool:
+        """Actualiza únicamente el tipo de un cliente.
+        
+        Con tipo_anterior el cambio es condicional: si otra operación ya cambió el tipo no afecta filas.
+        """
+        sql = """
+        UPDATE clientes
+        SET tipo_cliente = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """
+        params = [tipo_cliente.value, cliente_id]
+        if tipo_anterior is not None:
+            sql += " AND tipo_cliente = ?"
+            params.append(tipo_anterior.value)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                conn.commit()
+                self._invalidar_cliente_cache(cliente_id)
+                return cursor.rowcount > 0
+        except Exception as e:
+            self.logger.error(f"Error al actualizar tipo de cliente: {e}")
+            raise
+    
+    def obtener_rango_ids_clientes(self) -> Tuple[Optional[int], Optional[int]]:
+        """Menor y mayor id de clientes, para recorrer la tabla por rangos"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT MIN(id), MAX(id) FROM clientes")
+                row = cursor.fetchone()
+                return (row[0], row[1]) if row else (None, None)
+        except Exception as e:
+            self.logger.error(f"Error al obtener rango de clientes: {e}")
+            raise
+    
+    def reclasificar_tipos_clientes(self, desde_id: int, hasta_id: int, umbral_vip: float,
+                                    umbral_frecuente: int, umbral_regular: int) -> List[Tuple[int, TipoCliente, TipoCliente]]:
+        """Recalcula con un UPDATE ... CASE el tipo de los clientes con id en [desde_id, hasta_id].
+        
+        Retorna (cliente_id, tipo_anterior, tipo_nuevo) de los clientes que cambiaron. Los clientes
+        marcados 'inactivo' se respetan: ese tipo se asigna a mano, no por actividad.
+        """
+        tipo_calculado = """
+            CASE
+                WHEN COALESCE(total_gastado, 0) >= ? THEN 'vip'
+                WHEN COALESCE(total_visitas, 0) >= ? THEN 'frecuente'
+                WHEN COALESCE(total_visitas, 0) >= ? THEN 'regular'
+                ELSE 'nuevo'
+            END"""
+        umbrales = [umbral_vip, umbral_frecuente, umbral_regular]
+        filtro = f"""
+        WHERE id >= ? AND id <= ? AND COALESCE(tipo_cliente, '') <> 'inactivo'
+          AND COALESCE(tipo_cliente, '') <> {tipo_calculado}"""
+        params_filtro = [desde_id, hasta_id, *umbrales]
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if db_config.IS_PRODUCTION:
+                    # MySQL no soporta OUTPUT: se bloquean y leen primero las filas que cambiarán
+                    cursor.execute(
+                        f"SELECT id, tipo_cliente, {tipo_calculado} FROM clientes {filtro} FOR UPDATE",
+                        umbrales + params_filtro
+                    )
+                    filas = cursor.fetchall()
+                    if filas:
+                        cursor.execute(
+                            f"UPDATE clientes SET tipo_cliente = {tipo_calculado}, "
+                            f"fecha_actualizacion = CURRENT_TIMESTAMP {filtro}",
+                            umbrales + params_filtro
+                        )
+                else:
+                    cursor.execute(
+                        f"UPDATE clientes SET tipo_cliente = {tipo_calculado}, fecha_actualizacion = CURRENT_TIMESTAMP "
+                        f"OUTPUT inserted.id, deleted.tipo_cliente, inserted.tipo_cliente {filtro}",
+                        umbrales + params_filtro
+                    )
+                    filas = cursor.fetchall()
+                conn.commit()
+                
+                cambios = [
+                    (fila[0], _TIPOS_CLIENTE.get(fila[1], TipoCliente.NUEVO), _TIPOS_CLIENTE[fila[2]])
+                    for fila in filas
+                ]
+                if cambios:
+                    # Un rango puede tocar miles de clientes: se vacía la caché completa
+                    self._invalidar_cliente_cache()
+                return cambios
+        except Exception as e:
+            self.logger.error(f"Error al reclasificar clientes: {e}")
+            raise
     
     # Métodos de reportes y estadísticas
     def obtener_estadisticas_clientes(self) -> Dict[str, Any]:
@@ -797,31 +2002,66 @@ class DatabaseRepository:
             raise
     
     def obtener_transacciones_periodo(self, fecha_inicio: datetime, fecha_fin: datetime) -> List[Dict[str, Any]]:
-        """Obtiene resumen de transacciones por período"""
-        sql = """
-        SELECT 
-            tipo,
-            COUNT(*) as cantidad,
-            SUM(monto) as total_monto,
-            AVG(monto) as promedio_monto
+        """Obtiene resumen de transacciones por período.
+        
+        Los días completos anteriores a hoy se leen del resumen diario; los bordes
+        parciales del rango y el día en curso se agregan desde transacciones.
+        """
+        medianoche_inicio = datetime.combine(fecha_inicio.date(), datetime.min.time())
+        primer_dia = fecha_inicio.date() if fecha_inicio == medianoche_inicio else fecha_inicio.date() + timedelta(days=1)
+        # fecha_fin es inclusiva: el día que la contiene solo cuenta completo si llega a su último instante
+        fin_dias = min((fecha_fin + timedelta(microseconds=1)).date(), date.today())
+        
+        tramos_crudos = []
+        if primer_dia < fin_dias:
+            inicio_resumen = datetime.combine(primer_dia, datetime.min.time())
+            fin_resumen = datetime.combine(fin_dias, datetime.min.time())
+            if fecha_inicio < inicio_resumen:
+                tramos_crudos.append((fecha_inicio, inicio_resumen))
+            tramos_crudos.append((fin_resumen, fecha_fin + timedelta(microseconds=1)))
+        else:
+            tramos_crudos.append((fecha_inicio, fecha_fin + timedelta(microseconds=1)))
+        
+        sql_crudo = """
+        SELECT tipo, COUNT(*), SUM(monto)
         FROM transacciones 
-        WHERE fecha BETWEEN ? AND ?
+        WHERE fecha >= ? AND fecha < ?
+        GROUP BY tipo
+        """
+        sql_resumen = """
+        SELECT tipo, SUM(cantidad), SUM(total_monto)
+        FROM transacciones_resumen_diario
+        WHERE fecha >= ? AND fecha < ?
         GROUP BY tipo
-        ORDER BY total_monto DESC
         """
         
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(sql, (fecha_inicio, fecha_fin))
-                rows = cursor.fetchall()
+                totales: Dict[str, List[float]] = {}
+                
+                def acumular(rows):
+                    for tipo, cantidad, monto in rows:
+                        total = totales.setdefault(tipo, [0, 0.0])
+                        total[0] += int(cantidad or 0)
+                        total[1] += float(monto) if monto else 0.0
+                
+                if primer_dia < fin_dias:
+                    cursor.execute(sql_resumen, (primer_dia, fin_dias))
+                    acumular(cursor.fetchall())
+                for desde, hasta in tramos_crudos:
+                    if desde < hasta:
+                        cursor.execute(sql_crudo, (desde, hasta))
+                        acumular(cursor.fetchall())
                 
-                return [{
-                    'tipo': row[0],
-                    'cantidad': row[1],
-                    'total_monto': float(row[2]) if row[2] else 0.0,
-                    'promedio_monto': float(row[3]) if row[3] else 0.0
-                } for row in rows]
+                resultado = [{
+                    'tipo': tipo,
+                    'cantidad': cantidad,
+                    'total_monto': monto,
+                    'promedio_monto': monto / cantidad if cantidad else 0.0
+                } for tipo, (cantidad, monto) in totales.items()]
+                resultado.sort(key=lambda r: r['total_monto'], reverse=True)
+                return resultado
         except Exception as e:
             self.logger.error(f"Error al obtener transacciones por período: {e}")
             raise
\ No newline at end of file
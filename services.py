@@ -1,22 +1,35 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator, Callable
 from datetime import datetime, date, timedelta
+from decimal import Decimal
 import logging
+import os
 import uuid
 import json
+import csv
+import io
 from models import (
     Cliente, Promocion, Transaccion, Ticket, Empleado,
     TipoCliente, EstadoPromocion, TipoPromocion, EstadoTicket, TipoTicket, TipoTransaccion,
     validar_email, validar_telefono, validar_documento
 )
-from repository import DatabaseRepository
-from config import CasinoConfig
+from repository import (
+    DatabaseRepository, CanjeRechazadoError, COLUMNAS_EXPORTACION_CLIENTES, COLUMNAS_EXPORTACION_TRANSACCIONES
+)
+from config import CasinoConfig, app_config
+from cache import CacheAgregados, CLAVE_CLIENTES, CLAVE_TICKETS, CLAVE_TRANSACCIONES_HOY
+from codes import LONGITUD_CODIGO, codigo_valido
+
+# Tope de cambios listados en el resultado de una reclasificación; los totales cuentan todos
+MAX_CAMBIOS_INFORMADOS = 1000
 
 class ClienteService:
     """Servicio para gestión de clientes del casino"""
     
-    def __init__(self, repository: DatabaseRepository, casino_config: CasinoConfig):
+    def __init__(self, repository: DatabaseRepository, casino_config: CasinoConfig,
+                 cache: Optional[CacheAgregados] = None):
         self.repository = repository
         self.casino_config = casino_config
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
     
     def registrar_cliente(self, datos_cliente: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
@@ -32,31 +45,35 @@ class ClienteService:
             if datos_cliente.get('telefono') and not validar_telefono(datos_cliente['telefono']):
                 return False, "Teléfono inválido", None
             
-            # Verificar si ya existe
-            cliente_existente = self.repository.obtener_cliente_por_documento(datos_cliente['numero_documento'])
-            if cliente_existente:
-                return False, "Ya existe un cliente con este documento", None
-            
-            # Crear cliente
-            cliente = Cliente(
-                numero_documento=datos_cliente['numero_documento'],
-                tipo_documento=datos_cliente.get('tipo_documento', 'CC'),
-                nombres=datos_cliente['nombres'],
-                apellidos=datos_cliente['apellidos'],
-                email=datos_cliente.get('email', ''),
-                telefono=datos_cliente.get('telefono', ''),
-                fecha_nacimiento=datos_cliente.get('fecha_nacimiento'),
-                direccion=datos_cliente.get('direccion', ''),
-                ciudad=datos_cliente.get('ciudad', ''),
-                tipo_cliente=TipoCliente.NUEVO,
-                puntos_acumulados=self.casino_config.puntos_bienvenida
-            )
-            
-            cliente_id = self.repository.crear_cliente(cliente)
+            with self.repository.unidad_de_trabajo():
+                # Verificar si ya existe
+                cliente_existente = self.repository.obtener_cliente_por_documento(datos_cliente['numero_documento'])
+                if cliente_existente:
+                    return False, "Ya existe un cliente con este documento", None
+                
+                # Crear cliente
+                cliente = Cliente(
+                    numero_documento=datos_cliente['numero_documento'],
+                    tipo_documento=datos_cliente.get('tipo_documento', 'CC'),
+                    nombres=datos_cliente['nombres'],
+                    apellidos=datos_cliente['apellidos'],
+                    email=datos_cliente.get('email', ''),
+                    telefono=datos_cliente.get('telefono', ''),
+                    fecha_nacimiento=datos_cliente.get('fecha_nacimiento'),
+                    direccion=datos_cliente.get('direccion', ''),
+                    ciudad=datos_cliente.get('ciudad', ''),
+                    tipo_cliente=TipoCliente.NUEVO,
+                    puntos_acumulados=self.casino_config.puntos_bienvenida
+                )
+                
+                cliente_id = self.repository.crear_cliente(cliente)
+                
+                # Crear promoción de bienvenida si está configurada
+                if self.casino_config.promocion_bienvenida_activa:
+                    self._crear_promocion_bienvenida(cliente_id)
             
-            # Crear promoción de bienvenida si está configurada
-            if self.casino_config.promocion_bienvenida_activa:
-                self._crear_promocion_bienvenida(cliente_id)
+            if self.cache:
+                self.cache.invalidar(CLAVE_CLIENTES)
             
             self.logger.info(f"Cliente registrado exitosamente: {cliente_id}")
             return True, "Cliente registrado exitosamente", cliente_id
@@ -65,23 +82,35 @@ class ClienteService:
             self.logger.error(f"Error al registrar cliente: {e}")
             return False, f"Error interno: {str(e)}", None
     
-    def actualizar_tipo_cliente(self, cliente_id: int) -> bool:
-        """Actualiza automáticamente el tipo de cliente basado en su actividad"""
+    def actualizar_tipo_cliente(self, cliente_id: int, contadores: Optional[Dict[str, Any]] = None) -> bool:
+        """Actualiza automáticamente el tipo de cliente basado en su actividad.
+        
+        contadores son los valores que retorna incrementar_contadores_cliente; con ellos no se relee el cliente.
+        """
         try:
-            cliente = self.repository.obtener_cliente(cliente_id)
-            if not cliente:
-                return False
-            
-            nuevo_tipo = self._calcular_tipo_cliente(cliente)
-            
-            if nuevo_tipo != cliente.tipo_cliente:
-                cliente.tipo_cliente = nuevo_tipo
-                self.repository.actualizar_cliente(cliente)
+            with self.repository.unidad_de_trabajo():
+                if contadores is None:
+                    cliente = self.repository.obtener_cliente(cliente_id)
+                    if not cliente:
+                        return False
+                    contadores = {
+                        'total_visitas': cliente.total_visitas,
+                        'total_gastado': cliente.total_gastado,
+                        'tipo_cliente': cliente.tipo_cliente
+                    }
                 
-                # Crear promociones automáticas según el nuevo tipo
-                self._crear_promociones_automaticas(cliente)
+                tipo_actual = contadores['tipo_cliente']
+                if tipo_actual == TipoCliente.INACTIVO:
+                    # Tipo asignado a mano: la actividad no lo cambia, igual que en la reclasificación masiva
+                    return True
+                nuevo_tipo = self._tipo_por_actividad(contadores['total_gastado'], contadores['total_visitas'])
                 
-                self.logger.info(f"Tipo de cliente actualizado a {nuevo_tipo.value} para cliente {cliente_id}")
+                # Condicional sobre el tipo leído: si otra visita ya lo cambió no se duplican las promociones
+                if nuevo_tipo != tipo_actual and self.repository.actualizar_tipo_cliente(cliente_id, nuevo_tipo, tipo_actual):
+                    # Crear promociones automáticas según el nuevo tipo
+                    self._crear_promociones_automaticas([(cliente_id, nuevo_tipo)])
+                    
+                    self.logger.info(f"Tipo de cliente actualizado a {nuevo_tipo.value} para cliente {cliente_id}")
             
             return True
             
@@ -89,25 +118,85 @@ class ClienteService:
             self.logger.error(f"Error al actualizar tipo de cliente: {e}")
             return False
     
+    def reclasificar_clientes(self, tamano_lote: int = 5000,
+                              progreso: Optional[Callable[[int, int], None]] = None) -> Tuple[bool, str, Dict[str, Any]]:
+        """Recalcula el tipo de todos los clientes con los umbrales vigentes, por rangos de id.
+        
+        Cada rango se reclasifica con un UPDATE ... CASE y sus promociones automáticas se insertan
+        en lote dentro de la misma transacción. progreso(ids_recorridos, total_ids) se llama por rango.
+        El resultado lista a lo sumo MAX_CAMBIOS_INFORMADOS cambios; los conteos incluyen todos.
+        """
+        try:
+            minimo, maximo = self.repository.obtener_rango_ids_clientes()
+            desde = minimo
+            total_ids = maximo - minimo + 1 if minimo is not None else 0
+            cambios: List[Tuple[int, TipoCliente, TipoCliente]] = []
+            total_cambios = 0
+            por_tipo: Dict[str, int] = {}
+            promociones_creadas = 0
+            
+            while desde is not None and desde <= maximo:
+                hasta = desde + tamano_lote - 1
+                with self.repository.unidad_de_trabajo():
+                    cambios_rango = self.repository.reclasificar_tipos_clientes(
+                        desde, hasta,
+                        self.casino_config.umbral_vip,
+                        self.casino_config.umbral_frecuente,
+                        self.casino_config.umbral_regular
+                    )
+                    promociones_creadas += self._crear_promociones_automaticas(
+                        [(cliente_id, nuevo) for cliente_id, _, nuevo in cambios_rango]
+                    )
+                total_cambios += len(cambios_rango)
+                for _, _, nuevo in cambios_rango:
+                    por_tipo[nuevo.value] = por_tipo.get(nuevo.value, 0) + 1
+                cambios.extend(cambios_rango[:MAX_CAMBIOS_INFORMADOS - len(cambios)])
+                desde = hasta + 1
+                if progreso:
+                    progreso(min(desde - minimo, total_ids), total_ids)
+            
+            if total_cambios and self.cache:
+                self.cache.invalidar(CLAVE_CLIENTES)
+            
+            self.logger.info(f"Reclasificación de clientes: {total_cambios} cambios, {promociones_creadas} promociones")
+            return True, f"{total_cambios} clientes reclasificados", {
+                'total_cambios': total_cambios,
+                'por_tipo_nuevo': por_tipo,
+                'promociones_creadas': promociones_creadas,
+                'cambios_omitidos': total_cambios - len(cambios),
+                'cambios': [
+                    {'cliente_id': cliente_id, 'tipo_anterior': anterior.value, 'tipo_nuevo': nuevo.value}
+                    for cliente_id, anterior, nuevo in cambios
+                ]
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error al reclasificar clientes: {e}")
+            return False, f"Error interno: {str(e)}", {}
+    
     def registrar_visita(self, cliente_id: int, monto_gastado: float = 0.0) -> bool:
         """Registra una visita del cliente y actualiza sus estadísticas"""
         try:
-            cliente = self.repository.obtener_cliente(cliente_id)
-            if not cliente:
-                return False
-            
-            cliente.total_visitas += 1
-            cliente.total_gastado += monto_gastado
-            cliente.fecha_ultima_visita = datetime.now()
-            
-            # Calcular puntos ganados
-            puntos_ganados = int(monto_gastado * self.casino_config.puntos_por_peso)
-            cliente.puntos_acumulados += puntos_ganados
-            
-            self.repository.actualizar_cliente(cliente)
+            with self.repository.unidad_de_trabajo():
+                # Calcular puntos ganados
+                puntos_ganados = int(monto_gastado * self.casino_config.puntos_por_peso)
+                
+                # Incrementos atómicos en base de datos, sin leer ni reescribir el cliente
+                nuevos = self.repository.incrementar_contadores_cliente(
+                    cliente_id,
+                    visitas=1,
+                    gastado=monto_gastado,
+                    puntos=puntos_ganados,
+                    fecha_ultima_visita=datetime.now()
+                )
+                if not nuevos:
+                    return False
+                
+                # Actualizar tipo de cliente si es necesario, con los contadores ya retornados por el UPDATE
+                self.actualizar_tipo_cliente(cliente_id, nuevos)
             
-            # Actualizar tipo de cliente si es necesario
-            self.actualizar_tipo_cliente(cliente_id)
+            if self.cache:
+                self.cache.invalidar(CLAVE_CLIENTES)
             
             self.logger.info(f"Visita registrada para cliente {cliente_id}: ${monto_gastado}, {puntos_ganados} puntos")
             return True
@@ -118,11 +207,15 @@ class ClienteService:
     
     def _calcular_tipo_cliente(self, cliente: Cliente) -> TipoCliente:
         """Calcula el tipo de cliente basado en su actividad"""
-        if cliente.total_gastado >= self.casino_config.umbral_vip:
+        return self._tipo_por_actividad(cliente.total_gastado, cliente.total_visitas)
+    
+    def _tipo_por_actividad(self, total_gastado: float, total_visitas: int) -> TipoCliente:
+        """Misma regla que el CASE de DatabaseRepository.reclasificar_tipos_clientes; no aplica a 'inactivo'"""
+        if (total_gastado or 0) >= self.casino_config.umbral_vip:
             return TipoCliente.VIP
-        elif cliente.total_visitas >= self.casino_config.umbral_frecuente:
+        elif (total_visitas or 0) >= self.casino_config.umbral_frecuente:
             return TipoCliente.FRECUENTE
-        elif cliente.total_visitas >= self.casino_config.umbral_regular:
+        elif (total_visitas or 0) >= self.casino_config.umbral_regular:
             return TipoCliente.REGULAR
         else:
             return TipoCliente.NUEVO
@@ -142,57 +235,59 @@ class ClienteService:
         
         self.repository.crear_promocion(promocion)
     
-    def _crear_promociones_automaticas(self, cliente: Cliente):
-        """Crea promociones automáticas basadas en el tipo de cliente"""
+    def _crear_promociones_automaticas(self, cambios: List[Tuple[int, TipoCliente]]) -> int:
+        """Crea en lote las promociones automáticas de los clientes que pasaron a un nuevo tipo"""
         promociones = []
+        ahora = datetime.now()
         
-        if cliente.tipo_cliente == TipoCliente.VIP:
-            promociones.extend([
-                Promocion(
-                    titulo="Descuento VIP",
-                    descripcion="20% de descuento en consumos",
-                    tipo=TipoPromocion.DESCUENTO,
-                    valor=20.0,
-                    fecha_inicio=datetime.now(),
-                    fecha_fin=datetime.now() + timedelta(days=90),
-                    cliente_id=cliente.id,
-                    creado_por="SISTEMA"
-                ),
-                Promocion(
-                    titulo="Bebida VIP Gratis",
-                    descripcion="Bebida premium gratuita",
-                    tipo=TipoPromocion.BEBIDA_GRATIS,
-                    valor=1.0,
-                    fecha_inicio=datetime.now(),
-                    fecha_fin=datetime.now() + timedelta(days=30),
-                    cliente_id=cliente.id,
-                    usos_maximos=5,
-                    creado_por="SISTEMA"
-                )
-            ])
-        
-        elif cliente.tipo_cliente == TipoCliente.FRECUENTE:
-            promociones.append(
-                Promocion(
-                    titulo="Puntos Bonus Frecuente",
-                    descripcion="Puntos adicionales por ser cliente frecuente",
-                    tipo=TipoPromocion.PUNTOS_BONUS,
-                    valor=500.0,
-                    fecha_inicio=datetime.now(),
-                    fecha_fin=datetime.now() + timedelta(days=60),
-                    cliente_id=cliente.id,
-                    creado_por="SISTEMA"
+        for cliente_id, tipo_cliente in cambios:
+            if tipo_cliente == TipoCliente.VIP:
+                promociones.extend([
+                    Promocion(
+                        titulo="Descuento VIP",
+                        descripcion="20% de descuento en consumos",
+                        tipo=TipoPromocion.DESCUENTO,
+                        valor=20.0,
+                        fecha_inicio=ahora,
+                        fecha_fin=ahora + timedelta(days=90),
+                        cliente_id=cliente_id,
+                        creado_por="SISTEMA"
+                    ),
+                    Promocion(
+                        titulo="Bebida VIP Gratis",
+                        descripcion="Bebida premium gratuita",
+                        tipo=TipoPromocion.BEBIDA_GRATIS,
+                        valor=1.0,
+                        fecha_inicio=ahora,
+                        fecha_fin=ahora + timedelta(days=30),
+                        cliente_id=cliente_id,
+                        usos_maximos=5,
+                        creado_por="SISTEMA"
+                    )
+                ])
+            
+            elif tipo_cliente == TipoCliente.FRECUENTE:
+                promociones.append(
+                    Promocion(
+                        titulo="Puntos Bonus Frecuente",
+                        descripcion="Puntos adicionales por ser cliente frecuente",
+                        tipo=TipoPromocion.PUNTOS_BONUS,
+                        valor=500.0,
+                        fecha_inicio=ahora,
+                        fecha_fin=ahora + timedelta(days=60),
+                        cliente_id=cliente_id,
+                        creado_por="SISTEMA"
+                    )
                 )
-            )
         
-        for promocion in promociones:
-            self.repository.crear_promocion(promocion)
+        return self.repository.crear_promociones_bulk(promociones)
 
 class PromocionService:
     """Servicio para gestión de promociones"""
     
-    def __init__(self, repository: DatabaseRepository):
+    def __init__(self, repository: DatabaseRepository, cache: Optional[CacheAgregados] = None):
         self.repository = repository
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
     
     def crear_promocion_personalizada(self, datos_promocion: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
@@ -222,46 +317,65 @@ class PromocionService:
     
     def canjear_promocion(self, codigo_promocion: str, cliente_id: int) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
         """Canjea una promoción por código"""
+        codigo = codigo_promocion.strip().upper()
+        if len(codigo) == LONGITUD_CODIGO and not codigo_valido(codigo):
+            # Error de tipeo detectado por el dígito verificador: no hace falta consultar la base
+            return False, "Código de promoción inválido", None
         try:
-            # Buscar promoción por código
-            promocion = self._obtener_promocion_por_codigo(codigo_promocion)
-            if not promocion:
-                return False, "Código de promoción no válido", None
-            
-            # Verificar si puede canjearse
-            if not promocion.puede_canjearse:
-                return False, "La promoción no puede canjearse (expirada o agotada)", None
-            
-            # Verificar si es para un cliente específico
-            if promocion.cliente_id and promocion.cliente_id != cliente_id:
-                return False, "Esta promoción no está disponible para este cliente", None
-            
-            # Canjear promoción
-            if promocion.canjear():
-                self._actualizar_promocion(promocion)
-                
-                # Aplicar beneficio según el tipo
+            # El uso de la promoción y su beneficio se confirman o revierten juntos
+            with self.repository.unidad_de_trabajo():
+                promocion = self.repository.registrar_canje_promocion(codigo, cliente_id)
                 beneficio = self._aplicar_beneficio_promocion(promocion, cliente_id)
-                
-                self.logger.info(f"Promoción canjeada: {codigo_promocion} por cliente {cliente_id}")
-                return True, "Promoción canjeada exitosamente", beneficio
-            else:
-                return False, "Error al canjear la promoción", None
-                
+            
+            if self.cache:
+                self.cache.invalidar(CLAVE_CLIENTES)
+            
+            self.logger.info(f"Promoción canjeada: {codigo} por cliente {cliente_id}")
+            return True, "Promoción canjeada exitosamente", beneficio
+            
+        except CanjeRechazadoError as e:
+            return False, str(e), None
         except Exception as e:
             self.logger.error(f"Error al canjear promoción: {e}")
             return False, f"Error interno: {str(e)}", None
     
-    def _obtener_promocion_por_codigo(self, codigo: str) -> Optional[Promocion]:
-        """Obtiene una promoción por su código"""
-        # Implementar búsqueda en base de datos
-        # Por ahora retornamos None, se implementaría con el repository
-        return None
-    
-    def _actualizar_promocion(self, promocion: Promocion):
-        """Actualiza el estado de una promoción"""
-        # Implementar actualización en base de datos
-        pass
+    def crear_campana(self, campana_id: str, segmento: Dict[str, Any], plantilla: Dict[str, Any],
+                      tamano_lote: int = 1000,
+                      progreso: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Crea una promoción por cliente del segmento, en lotes de inserción de tamano_lote filas.
+        
+        Las promociones llevan creado_por = 'CAMPANA <campana_id>'; volver a ejecutar la misma campaña
+        solo cubre a los clientes que aún no la recibieron. progreso(creadas, total) se llama por lote.
+        """
+        creado_por = f"CAMPANA {campana_id}"
+        tipo = TipoPromocion(plantilla['tipo'])
+        total = self.repository.contar_clientes_segmento(segmento, creado_por)
+        if progreso:
+            progreso(0, total)
+        
+        creadas = 0
+        for filas in self.repository.iterar_ids_clientes_segmento(segmento, creado_por, tamano_lote):
+            # Sin código: crear_promociones_bulk los toma del generador en un solo tramo por lote
+            creadas += self.repository.crear_promociones_bulk([
+                Promocion(
+                    titulo=plantilla['titulo'],
+                    descripcion=plantilla.get('descripcion') or '',
+                    tipo=tipo,
+                    valor=plantilla.get('valor', 0.0),
+                    fecha_inicio=plantilla['fecha_inicio'],
+                    fecha_fin=plantilla['fecha_fin'],
+                    cliente_id=fila[0],
+                    usos_maximos=plantilla.get('usos_maximos', 1),
+                    condiciones=plantilla.get('condiciones') or '',
+                    creado_por=creado_por
+                )
+                for fila in filas
+            ])
+            if progreso:
+                progreso(creadas, total)
+        
+        self.logger.info(f"Campaña {campana_id}: {creadas} promociones creadas de {total} clientes del segmento")
+        return {'campana_id': campana_id, 'clientes_segmento': total, 'promociones_creadas': creadas}
     
     def _aplicar_beneficio_promocion(self, promocion: Promocion, cliente_id: int) -> Dict[str, Any]:
         """Aplica el beneficio de la promoción al cliente"""
@@ -273,63 +387,71 @@ class PromocionService:
         
         if promocion.tipo == TipoPromocion.PUNTOS_BONUS:
             # Agregar puntos al cliente
-            cliente = self.repository.obtener_cliente(cliente_id)
-            if cliente:
-                cliente.puntos_acumulados += int(promocion.valor)
-                self.repository.actualizar_cliente(cliente)
-                beneficio['puntos_agregados'] = int(promocion.valor)
+            nuevos = self.repository.incrementar_contadores_cliente(cliente_id, puntos=int(promocion.valor))
+            if not nuevos:
+                # Revierte también el uso consumido de la promoción
+                raise CanjeRechazadoError("Cliente no encontrado")
+            beneficio['puntos_agregados'] = int(promocion.valor)
         
         return beneficio
 
 class TransaccionService:
     """Servicio para gestión de transacciones"""
     
-    def __init__(self, repository: DatabaseRepository, casino_config: CasinoConfig):
+    def __init__(self, repository: DatabaseRepository, casino_config: CasinoConfig,
+                 cache: Optional[CacheAgregados] = None):
         self.repository = repository
         self.casino_config = casino_config
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
     
+    def _construir_transaccion(self, datos_transaccion: Dict[str, Any]) -> Transaccion:
+        """Construye la transacción calculando los puntos ganados"""
+        puntos_ganados = 0
+        if datos_transaccion['tipo'] in ['juego', 'consumo']:
+            puntos_ganados = int(datos_transaccion['monto'] * self.casino_config.puntos_por_peso)
+        
+        return Transaccion(
+            cliente_id=datos_transaccion['cliente_id'],
+            tipo=TipoTransaccion(datos_transaccion['tipo']),
+            monto=datos_transaccion['monto'],
+            descripcion=datos_transaccion.get('descripcion', ''),
+            ubicacion=datos_transaccion.get('ubicacion', ''),
+            promocion_id=datos_transaccion.get('promocion_id'),
+            puntos_ganados=puntos_ganados,
+            metodo_pago=datos_transaccion.get('metodo_pago', ''),
+            numero_referencia=datos_transaccion.get('numero_referencia'),
+            empleado_id=datos_transaccion.get('empleado_id'),
+            notas=datos_transaccion.get('notas', '')
+        )
+    
     def procesar_transaccion(self, datos_transaccion: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
         """Procesa una nueva transacción"""
         try:
-            # Calcular puntos ganados
-            puntos_ganados = 0
-            if datos_transaccion['tipo'] in ['juego', 'consumo']:
-                puntos_ganados = int(datos_transaccion['monto'] * self.casino_config.puntos_por_peso)
-            
-            transaccion = Transaccion(
-                cliente_id=datos_transaccion['cliente_id'],
-                tipo=TipoTransaccion(datos_transaccion['tipo']),
-                monto=datos_transaccion['monto'],
-                descripcion=datos_transaccion.get('descripcion', ''),
-                ubicacion=datos_transaccion.get('ubicacion', ''),
-                promocion_id=datos_transaccion.get('promocion_id'),
-                puntos_ganados=puntos_ganados,
-                metodo_pago=datos_transaccion.get('metodo_pago', ''),
-                numero_referencia=datos_transaccion.get('numero_referencia'),
-                empleado_id=datos_transaccion.get('empleado_id'),
-                notas=datos_transaccion.get('notas', '')
-            )
-            
-            transaccion_id = self.repository.crear_transaccion(transaccion)
-            
-            # Actualizar estadísticas del cliente
-            if datos_transaccion['tipo'] in ['juego', 'consumo']:
-                cliente_service = ClienteService(self.repository, self.casino_config)
-                cliente_service.registrar_visita(datos_transaccion['cliente_id'], datos_transaccion['monto'])
-            
-            # Actualizar saldo del cliente para recargas
-            if datos_transaccion['tipo'] == 'ingreso':
-                self.logger.info(f"Procesando recarga para cliente {datos_transaccion['cliente_id']}, monto: {datos_transaccion['monto']}")
-                cliente = self.repository.obtener_cliente(datos_transaccion['cliente_id'])
-                if cliente:
-                    saldo_anterior = cliente.saldo
-                    cliente.saldo += datos_transaccion['monto']
-                    self.logger.info(f"Actualizando saldo: {saldo_anterior} -> {cliente.saldo}")
-                    resultado = self.repository.actualizar_cliente(cliente)
-                    self.logger.info(f"Resultado actualización cliente: {resultado}")
-                else:
-                    self.logger.error(f"Cliente {datos_transaccion['cliente_id']} no encontrado para actualizar saldo")
+            transaccion = self._construir_transaccion(datos_transaccion)
+            
+            # Toda la operación corre en una sola conexión con un único commit
+            with self.repository.unidad_de_trabajo():
+                transaccion_id = self.repository.crear_transaccion(transaccion)
+            
+                # Actualizar estadísticas del cliente
+                if datos_transaccion['tipo'] in ['juego', 'consumo']:
+                    cliente_service = ClienteService(self.repository, self.casino_config, self.cache)
+                    cliente_service.registrar_visita(datos_transaccion['cliente_id'], datos_transaccion['monto'])
+            
+                # Actualizar saldo del cliente para recargas
+                if datos_transaccion['tipo'] == 'ingreso':
+                    self.logger.info(f"Procesando recarga para cliente {datos_transaccion['cliente_id']}, monto: {datos_transaccion['monto']}")
+                    nuevos = self.repository.incrementar_contadores_cliente(
+                        datos_transaccion['cliente_id'], saldo=datos_transaccion['monto']
+                    )
+                    if nuevos:
+                        self.logger.info(f"Saldo actualizado: {nuevos['saldo']}")
+                    else:
+                        self.logger.error(f"Cliente {datos_transaccion['cliente_id']} no encontrado para actualizar saldo")
+            
+            if self.cache:
+                self.cache.invalidar(CLAVE_TRANSACCIONES_HOY, CLAVE_CLIENTES)
             
             self.logger.info(f"Transacción procesada: {transaccion_id}")
             return True, "Transacción procesada exitosamente", transaccion_id
@@ -338,6 +460,74 @@ class TransaccionService:
             self.logger.error(f"Error al procesar transacción: {e}")
             return False, f"Error interno: {str(e)}", None
     
+    def procesar_lote(self, lote: List[Dict[str, Any]]) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        """Procesa un lote de transacciones con inserción masiva y deltas agregados por cliente"""
+        resultados = []
+        validas = []
+        
+        for indice, datos_transaccion in enumerate(lote):
+            try:
+                transaccion = self._construir_transaccion(datos_transaccion)
+                validas.append((indice, transaccion))
+            except (KeyError, ValueError) as e:
+                resultados.append({'indice': indice, 'success': False, 'message': f"Transacción inválida: {e}"})
+        
+        try:
+            existentes = self.repository.obtener_ids_clientes_existentes([t.cliente_id for _, t in validas])
+            
+            aceptadas = []
+            for indice, transaccion in validas:
+                if transaccion.cliente_id in existentes:
+                    aceptadas.append((indice, transaccion))
+                else:
+                    resultados.append({'indice': indice, 'success': False, 'message': "Cliente no encontrado"})
+            
+            # Agregar los deltas de cada cliente para aplicarlos una sola vez por lote
+            deltas: Dict[int, Dict[str, Any]] = {}
+            for _, transaccion in aceptadas:
+                delta = deltas.setdefault(transaccion.cliente_id, {'visitas': 0, 'gastado': 0.0, 'puntos': 0, 'saldo': 0.0})
+                if transaccion.tipo in [TipoTransaccion.JUEGO, TipoTransaccion.CONSUMO]:
+                    delta['visitas'] += 1
+                    delta['gastado'] += transaccion.monto
+                    delta['puntos'] += transaccion.puntos_ganados
+                elif transaccion.tipo == TipoTransaccion.INGRESO:
+                    delta['saldo'] += transaccion.monto
+            
+            with self.repository.unidad_de_trabajo():
+                self.repository.crear_transacciones_bulk([t for _, t in aceptadas])
+                
+                ahora = datetime.now()
+                cliente_service = ClienteService(self.repository, self.casino_config, self.cache)
+                for cliente_id, delta in deltas.items():
+                    nuevos = self.repository.incrementar_contadores_cliente(
+                        cliente_id,
+                        visitas=delta['visitas'],
+                        gastado=delta['gastado'],
+                        puntos=delta['puntos'],
+                        saldo=delta['saldo'],
+                        fecha_ultima_visita=ahora if delta['visitas'] else None
+                    )
+                    if delta['visitas'] and nuevos:
+                        cliente_service.actualizar_tipo_cliente(cliente_id, nuevos)
+            
+            if self.cache:
+                self.cache.invalidar(CLAVE_TRANSACCIONES_HOY, CLAVE_CLIENTES)
+            
+            resultados.extend({
+                'indice': indice,
+                'success': True,
+                'message': "Transacción procesada",
+                'puntos_ganados': transaccion.puntos_ganados
+            } for indice, transaccion in aceptadas)
+            resultados.sort(key=lambda r: r['indice'])
+            
+            self.logger.info(f"Lote procesado: {len(aceptadas)} aceptadas, {len(lote) - len(aceptadas)} rechazadas, {len(deltas)} clientes")
+            return True, f"Lote procesado: {len(aceptadas)} de {len(lote)} transacciones", resultados
+            
+        except Exception as e:
+            self.logger.error(f"Error al procesar lote de transacciones: {e}")
+            return False, f"Error interno: {str(e)}", []
+    
     def obtener_resumen_diario(self, fecha: date = None) -> Dict[str, Any]:
         """Obtiene resumen de transacciones del día"""
         if not fecha:
@@ -359,14 +549,16 @@ class TransaccionService:
             return resumen
             
         except Exception as e:
+            # Se propaga: un {} quedaría en la caché del dashboard durante todo su TTL
             self.logger.error(f"Error al obtener resumen diario: {e}")
-            return {}
+            raise
 
 class TicketService:
     """Servicio para gestión de tickets de atención al cliente"""
     
-    def __init__(self, repository: DatabaseRepository):
+    def __init__(self, repository: DatabaseRepository, cache: Optional[CacheAgregados] = None):
         self.repository = repository
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
     
     def crear_ticket(self, datos_ticket: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
@@ -389,6 +581,8 @@ class TicketService:
                 ticket.asignado_a = self._obtener_agente_disponible('agente')
             
             ticket_id = self.repository.crear_ticket(ticket)
+            if self.cache:
+                self.cache.invalidar(CLAVE_TICKETS)
             
             self.logger.info(f"Ticket creado: {ticket_id}")
             return True, "Ticket creado exitosamente", ticket_id
@@ -406,6 +600,8 @@ class TicketService:
             
             ticket.resolver(resolucion, usuario)
             self.repository.actualizar_ticket(ticket)
+            if self.cache:
+                self.cache.invalidar(CLAVE_TICKETS)
             
             self.logger.info(f"Ticket resuelto: {ticket_id}")
             return True, "Ticket resuelto exitosamente"
@@ -426,11 +622,11 @@ class TicketService:
     def obtener_metricas_atencion(self) -> Dict[str, Any]:
         """Obtiene métricas de atención al cliente"""
         try:
-            tickets_abiertos = self.repository.obtener_tickets_abiertos()
+            conteo = self.repository.contar_tickets_abiertos()
             
             metricas = {
-                'tickets_abiertos': len(tickets_abiertos),
-                'tickets_criticos': len([t for t in tickets_abiertos if t.prioridad == 'CRITICA']),
+                'tickets_abiertos': conteo['abiertos'],
+                'tickets_criticos': conteo['criticos'],
                 'tiempo_promedio_respuesta': self._calcular_tiempo_promedio_respuesta(),
                 'satisfaccion_promedio': self._calcular_satisfaccion_promedio()
             }
@@ -438,8 +634,9 @@ class TicketService:
             return metricas
             
         except Exception as e:
+            # Se propaga: un {} quedaría en la caché del dashboard durante todo su TTL
             self.logger.error(f"Error al obtener métricas: {e}")
-            return {}
+            raise
     
     def _calcular_tiempo_promedio_respuesta(self) -> float:
         """Calcula el tiempo promedio de respuesta"""
@@ -513,11 +710,111 @@ class ReporteService:
             self.logger.error(f"Error al generar reporte de transacciones: {e}")
             return {}
     
-    def exportar_reporte(self, reporte: Dict[str, Any], formato: str = 'JSON') -> Tuple[bool, str, Optional[str]]:
-        """Exporta un reporte en el formato especificado"""
+    def generar_reporte_analitica(self, fecha_inicio: datetime, fecha_fin: datetime,
+                                  dimensiones: Optional[List[str]] = None, ventana: int = 7,
+                                  progreso: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Genera desgloses vectorizados de transacciones (hora, ubicación, método de pago, tipo de cliente, cohorte)"""
+        # NumPy se carga con el primer reporte analítico, no al arrancar la API
+        from analytics import MotorAnalitica
+        
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            nombre_archivo = f"reporte_{reporte['tipo']}_{timestamp}"
+            analitica = MotorAnalitica(self.repository).analizar(fecha_inicio, fecha_fin, dimensiones, ventana, progreso)
+            
+            return {
+                'tipo': 'analitica_transacciones',
+                'fecha_generacion': datetime.now().isoformat(),
+                **analitica
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error al generar reporte analítico: {e}")
+            return {}
+    
+    def exportar_clientes_stream(self, filtros: Dict[str, Any] = None, formato: str = 'ndjson') -> Iterator[str]:
+        """Genera la exportación de clientes en bloques NDJSON o CSV con memoria constante"""
+        bloques = self.repository.iterar_clientes(filtros)
+        return self._serializar_stream(COLUMNAS_EXPORTACION_CLIENTES, bloques, formato)
+    
+    def exportar_transacciones_stream(self, fecha_inicio: Optional[datetime] = None, fecha_fin: Optional[datetime] = None,
+                                      cliente_id: Optional[int] = None, formato: str = 'ndjson') -> Iterator[str]:
+        """Genera la exportación de transacciones en bloques NDJSON o CSV con memoria constante"""
+        bloques = self.repository.iterar_transacciones(fecha_inicio, fecha_fin, cliente_id)
+        return self._serializar_stream(COLUMNAS_EXPORTACION_TRANSACCIONES, bloques, formato)
+    
+    def exportar_clientes_parquet(self, destino: str, filtros: Dict[str, Any] = None) -> int:
+        """Escribe la exportación de clientes a un archivo Parquet por grupos de filas"""
+        bloques = self.repository.iterar_clientes(filtros)
+        return self._escribir_parquet(COLUMNAS_EXPORTACION_CLIENTES, bloques, destino)
+    
+    def exportar_transacciones_parquet(self, destino: str, fecha_inicio: Optional[datetime] = None,
+                                       fecha_fin: Optional[datetime] = None, cliente_id: Optional[int] = None,
+                                       progreso: Optional[Callable[[int], None]] = None) -> int:
+        """Escribe la exportación de transacciones a un archivo Parquet por grupos de filas"""
+        bloques = self.repository.iterar_transacciones(fecha_inicio, fecha_fin, cliente_id, progreso=progreso)
+        return self._escribir_parquet(COLUMNAS_EXPORTACION_TRANSACCIONES, bloques, destino)
+    
+    def _escribir_parquet(self, columnas: Tuple[str, ...], bloques: Iterable[List[tuple]], destino: str) -> int:
+        """Acumula bloques del cursor hasta completar un grupo de filas y lo escribe; retorna el total de filas"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        esquema = _esquema_parquet(columnas)
+        filas_por_grupo = app_config.PARQUET_ROW_GROUP_SIZE
+        total = 0
+        pendientes: List[tuple] = []
+        
+        def escribir_grupo(writer, filas):
+            valores = list(zip(*filas))
+            arreglos = [
+                pa.array(_normalizar_columna_parquet(campo.type, valores[i]), type=campo.type)
+                for i, campo in enumerate(esquema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arreglos, schema=esquema), row_group_size=len(filas))
+        
+        with pq.ParquetWriter(destino, esquema, compression=app_config.PARQUET_COMPRESSION) as writer:
+            for filas in bloques:
+                pendientes.extend(filas)
+                if len(pendientes) >= filas_por_grupo:
+                    escribir_grupo(writer, pendientes)
+                    total += len(pendientes)
+                    pendientes = []
+            if pendientes:
+                escribir_grupo(writer, pendientes)
+                total += len(pendientes)
+        
+        self.logger.info(f"Exportación Parquet escrita: {destino} ({total} filas)")
+        return total
+    
+    def _serializar_stream(self, columnas: Tuple[str, ...], bloques: Iterable[List[tuple]], formato: str) -> Iterator[str]:
+        """Serializa cada bloque de filas a texto sin acumular el resultado completo"""
+        if formato.lower() == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columnas)
+            yield buffer.getvalue()
+            
+            for filas in bloques:
+                buffer.seek(0)
+                buffer.truncate(0)
+                writer.writerows([_valor_exportable(v) for v in fila] for fila in filas)
+                yield buffer.getvalue()
+        else:
+            for filas in bloques:
+                yield ''.join(
+                    json.dumps(dict(zip(columnas, map(_valor_exportable, fila))), ensure_ascii=False) + '\n'
+                    for fila in filas
+                )
+    
+    def exportar_reporte(self, reporte: Dict[str, Any], formato: str = 'JSON', directorio: Optional[str] = None,
+                         nombre: Optional[str] = None) -> Tuple[bool, str, Optional[str]]:
+        """Exporta un reporte en el formato especificado dentro del directorio de reportes"""
+        try:
+            directorio = directorio or app_config.REPORTS_DIRECTORY
+            os.makedirs(directorio, exist_ok=True)
+            if not nombre:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                nombre = f"reporte_{reporte['tipo']}_{timestamp}"
+            nombre_archivo = os.path.join(directorio, nombre)
             
             if formato.upper() == 'JSON':
                 archivo_path = f"{nombre_archivo}.json"
@@ -525,15 +822,26 @@ class ReporteService:
                     json.dump(reporte, f, indent=2, ensure_ascii=False, default=str)
             
             elif formato.upper() == 'CSV':
-                import pandas as pd
                 archivo_path = f"{nombre_archivo}.csv"
                 
-                if reporte['tipo'] == 'clientes':
-                    df = pd.DataFrame(reporte['clientes'])
-                    df.to_csv(archivo_path, index=False, encoding='utf-8')
-                elif reporte['tipo'] == 'transacciones':
-                    df = pd.DataFrame(reporte['resumen_por_tipo'])
-                    df.to_csv(archivo_path, index=False, encoding='utf-8')
+                filas = _filas_reporte(reporte)
+                if filas is None:
+                    return False, f"El reporte {reporte['tipo']} no admite formato CSV", None
+                columnas = list(dict.fromkeys(clave for fila in filas for clave in fila))
+                with open(archivo_path, 'w', encoding='utf-8', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=columnas)
+                    writer.writeheader()
+                    writer.writerows(filas)
+            
+            elif formato.upper() == 'PARQUET':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                archivo_path = f"{nombre_archivo}.parquet"
+                
+                filas = _filas_reporte(reporte)
+                if filas is None:
+                    return False, f"El reporte {reporte['tipo']} no admite formato Parquet", None
+                pq.write_table(pa.Table.from_pylist(filas), archivo_path, compression=app_config.PARQUET_COMPRESSION)
             
             else:
                 return False, "Formato no soportado", None
@@ -543,4 +851,55 @@ class ReporteService:
             
         except Exception as e:
             self.logger.error(f"Error al exportar reporte: {e}")
-            return False, f"Error interno: {str(e)}", None
\ No newline at end of file
+            return False, f"Error interno: {str(e)}", None
+
+def _filas_reporte(reporte: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Filas tabulares de un reporte para los formatos CSV y Parquet"""
+    if reporte['tipo'] == 'clientes':
+        return reporte['clientes']
+    if reporte['tipo'] == 'transacciones':
+        return reporte['resumen_por_tipo']
+    return None
+
+# Tipo Arrow de cada columna exportada; se traduce a pyarrow solo al exportar
+TIPOS_PARQUET = {
+    'id': 'int64', 'cliente_id': 'int64', 'promocion_id': 'int64', 'empleado_id': 'int64',
+    'total_visitas': 'int32', 'puntos_acumulados': 'int64', 'puntos_ganados': 'int32',
+    'monto': 'decimal', 'total_gastado': 'decimal', 'saldo': 'decimal',
+    'fecha': 'timestamp', 'fecha_registro': 'timestamp', 'fecha_ultima_visita': 'timestamp',
+    'activo': 'bool'
+}
+
+def _esquema_parquet(columnas: Tuple[str, ...]):
+    """Esquema Arrow tipado para las columnas de una exportación (texto por defecto)"""
+    import pyarrow as pa
+    
+    tipos = {
+        'int64': pa.int64(),
+        'int32': pa.int32(),
+        'decimal': pa.decimal128(15, 2),
+        'timestamp': pa.timestamp('us'),
+        'bool': pa.bool_(),
+        'string': pa.string()
+    }
+    return pa.schema([pa.field(c, tipos[TIPOS_PARQUET.get(c, 'string')]) for c in columnas])
+
+def _normalizar_columna_parquet(tipo, valores: Tuple[Any, ...]) -> List[Any]:
+    """Ajusta los valores del driver que pyarrow no convierte solo (float a Decimal, 0/1 a bool)"""
+    import pyarrow as pa
+    
+    if pa.types.is_decimal(tipo):
+        return [v if v is None or isinstance(v, Decimal) else Decimal(str(v)) for v in valores]
+    if pa.types.is_boolean(tipo):
+        return [None if v is None else bool(v) for v in valores]
+    if pa.types.is_string(tipo):
+        return [None if v is None else str(v) for v in valores]
+    return list(valores)
+
+def _valor_exportable(valor: Any) -> Any:
+    """Convierte valores del driver a tipos serializables en JSON/CSV"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Lock con nombre de la base: con varios workers o instancias solo uno barre a la vez
+LOCK_BARREDOR = 'casino_barredor_promociones'
+
+
+class BarredorPromociones:
+    """Tarea periódica que pasa a 'expirada' las promociones vencidas en lotes acotados"""
+
+    def __init__(self, repository, intervalo_segundos: float = 60.0, tamano_lote: int = 500,
+                 max_lotes: int = 20):
+        self.repository = repository
+        self.intervalo_segundos = intervalo_segundos
+        self.tamano_lote = tamano_lote
+        self.max_lotes = max_lotes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._estadisticas = {
+            'ejecuciones': 0,
+            'omitidas': 0,
+            'con_lock': False,
+            'filas_barridas': 0,
+            'errores': 0,
+            'ultima_ejecucion': None,
+            'ultima_duracion_ms': 0.0,
+            'ultimas_filas': 0,
+            'pendientes': 0,
+            'retraso_segundos': 0.0
+        }
+
+    def iniciar(self):
+        """Arranca el hilo del barredor; la primera pasada corre de inmediato si obtiene el lock.
+
+        El proceso que obtiene el lock lo retiene, con una conexión del pool, mientras siga barriendo.
+        """
+        if self._hilo is not None:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name='barredor-promociones', daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 10.0):
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo.join(timeout=timeout)
+        self._hilo = None
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                with self.repository.lock_exclusivo(LOCK_BARREDOR) as obtenido:
+                    if obtenido:
+                        self._barrer_con_lock()
+                    else:
+                        # Otro proceso tiene el lock y barre; se vuelve a intentar en el próximo intervalo
+                        with self._lock:
+                            self._estadisticas['omitidas'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._estadisticas['errores'] += 1
+                self.logger.error(f"Error en el barrido de promociones: {e}")
+            self._detener.wait(self.intervalo_segundos)
+
+    def _barrer_con_lock(self):
+        """Barre cada intervalo sin soltar el lock, hasta detenerse o fallar una pasada"""
+        with self._lock:
+            self._estadisticas['con_lock'] = True
+        try:
+            while True:
+                self.barrer()
+                if self._detener.wait(self.intervalo_segundos):
+                    return
+        finally:
+            with self._lock:
+                self._estadisticas['con_lock'] = False
+
+    def barrer(self) -> int:
+        """Ejecuta una pasada de hasta max_lotes lotes; retorna las filas expiradas"""
+        inicio = time.monotonic()
+        total = 0
+        for _ in range(self.max_lotes):
+            if self._detener.is_set():
+                break
+            codigos = self.repository.expirar_promociones_vencidas(self.tamano_lote)
+            total += len(codigos)
+            if len(codigos) < self.tamano_lote:
+                break
+
+        # El retraso es la antigüedad de la promoción vencida más vieja que sigue figurando activa
+        pendientes, mas_antigua = self.repository.obtener_pendientes_expiracion()
+        retraso = (datetime.now() - mas_antigua).total_seconds() if mas_antigua else 0.0
+
+        with self._lock:
+            self._estadisticas['ejecuciones'] += 1
+            self._estadisticas['filas_barridas'] += total
+            self._estadisticas['ultima_ejecucion'] = datetime.now().isoformat()
+            self._estadisticas['ultima_duracion_ms'] = round((time.monotonic() - inicio) * 1000, 1)
+            self._estadisticas['ultimas_filas'] = total
+            self._estadisticas['pendientes'] = pendientes
+            self._estadisticas['retraso_segundos'] = round(retraso, 1)
+
+        if total:
+            self.logger.info(f"Promociones expiradas: {total} (pendientes: {pendientes})")
+        if pendientes:
+            self.logger.warning(f"Quedan {pendientes} promociones vencidas sin expirar; retraso {retraso:.0f} s")
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna métricas de filas barridas y retraso"""
+        with self._lock:
+            return {
+                'activo': self._hilo is not None,
+                'intervalo_segundos': self.intervalo_segundos,
+                'tamano_lote': self.tamano_lote,
+                **self._estadisticas
+            }